@@ -0,0 +1 @@
+"""Banc d'essai reproductible des traitements de MyHealth (voir benchmarks/run.py)."""
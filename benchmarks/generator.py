@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+
+# --- Durées d'historique prédéfinies ---
+SIZES = {
+    "1m": 30,
+    "6m": 182,
+    "1y": 365,
+    "3y": 3 * 365,
+    "10y": 10 * 365,
+}
+
+# Abréviations utilisées par les exports du lecteur de glycémie
+FRENCH_MONTHS = ["janv.", "févr.", "mars", "avr.", "mai", "juin",
+                 "juill.", "août", "sept.", "oct.", "nov.", "déc."]
+
+
+def _days(size):
+    return SIZES[size] if isinstance(size, str) else int(size)
+
+
+def generate_blood(size="1y", start="2020-01-01", seed=0):
+    """
+    Historique de pression artérielle (format de blood.csv) : deux séances par
+    jour (matin et soir) de 2 à 3 mesures à quelques minutes d'intervalle.
+    """
+    rng = np.random.default_rng(seed)
+    days = _days(size)
+    day_starts = pd.date_range(start, periods=days, freq="D")
+
+    sessions = np.concatenate([
+        day_starts + pd.to_timedelta(rng.normal(7 * 60, 30, days), unit="min"),
+        day_starts + pd.to_timedelta(rng.normal(21 * 60, 30, days), unit="min"),
+    ])
+    readings = rng.integers(2, 4, len(sessions))
+    session_times = np.repeat(sessions, readings)
+    offsets = np.concatenate([np.arange(n) * 2 for n in readings])
+    times = pd.DatetimeIndex(session_times).floor("min") + pd.to_timedelta(offsets, unit="min")
+    times = times.sort_values().unique()
+
+    n = len(times)
+    drift = np.linspace(0, rng.normal(0, 8), n)
+    systolic = np.round(125 + drift + rng.normal(0, 9, n)).astype(int)
+    diastolic = np.round(80 + drift / 2 + rng.normal(0, 6, n)).astype(int)
+    pulse = np.round(66 + rng.normal(0, 7, n)).astype(int)
+    notes = np.where(rng.random(n) < 0.05, "Après effort", "")
+    return pd.DataFrame({
+        "Date-Heure": times,
+        "Systolique (mmHg)": systolic,
+        "Diastolique (mmHg)": diastolic,
+        "Pouls (bpm)": pulse,
+        "Notes": notes,
+    })
+
+
+def generate_glycemie(size="1y", start="2020-01-01", seed=0, interval_minutes=5):
+    """
+    Historique de glycémie à la densité d'un capteur en continu (une mesure toutes
+    les 5 minutes par défaut), avec un profil quotidien et des pics après les repas.
+    """
+    rng = np.random.default_rng(seed)
+    periods = _days(size) * 24 * 60 // interval_minutes
+    times = pd.date_range(start, periods=periods, freq=f"{interval_minutes}min")
+
+    hours = (times.hour + times.minute / 60).to_numpy()
+    meals = sum(2.5 * np.exp(-((hours - meal) % 24) / 1.5) * (((hours - meal) % 24) < 4)
+                for meal in (7.5, 12.5, 19))
+    noise = np.cumsum(rng.normal(0, 0.05, periods))
+    noise -= np.convolve(noise, np.ones(289) / 289, mode="same")
+    glucose = np.round(np.clip(5.5 + meals + noise + rng.normal(0, 0.2, periods), 2.2, 22), 1)
+    return pd.DataFrame({
+        "Date-Heure": times,
+        "Glycémie (mmol/L)": glucose,
+        "Note-1": "",
+        "Note-2": "",
+    })
+
+
+def to_french_export(df_glycemie):
+    """
+    Reproduit l'export CSV du lecteur : dates au format `J MMM AAAA, HH "h" MM`
+    et toutes les colonnes en texte.
+    """
+    times = df_glycemie["Date-Heure"]
+    months = np.array(FRENCH_MONTHS)[times.dt.month.to_numpy() - 1]
+    text = (times.dt.day.astype(str) + " " + months + " " + times.dt.year.astype(str) + ", "
+            + times.dt.strftime("%H") + " h " + times.dt.strftime("%M"))
+    export = df_glycemie.astype(str)
+    export["Date-Heure"] = text
+    return export
+
+
+def generate_poids(size="1y", start="2020-01-01", seed=0):
+    """
+    Historique de poids : une pesée quasi quotidienne avec des phases de perte,
+    de stabilité et de reprise (pour la détection des ruptures).
+    """
+    rng = np.random.default_rng(seed)
+    days = _days(size)
+    day_starts = pd.date_range(start, periods=days, freq="D")
+    kept = rng.random(days) < 0.85
+    times = day_starts[kept] + pd.to_timedelta(rng.normal(7 * 60, 20, kept.sum()), unit="min")
+
+    # Pente (kg/jour) constante par phase d'environ 2 mois
+    phases = np.repeat(rng.normal(0, 0.03, days // 60 + 1), 60)[:days][kept]
+    weight = 82 + np.cumsum(phases) + rng.normal(0, 0.4, kept.sum())
+    weight_kg = np.round(weight, 1)
+    return pd.DataFrame({
+        "Date": times.floor("min"),
+        "Poids_kg": weight_kg,
+        "Poids_lbs": np.round(weight_kg * 2.20462, 1),
+    })
+
+
+def generate_all(size="1y", start="2020-01-01", seed=0):
+    """Les trois historiques (blood, glycemie, poids) pour une même durée."""
+    return {
+        "blood": generate_blood(size, start, seed),
+        "glycemie": generate_glycemie(size, start, seed),
+        "poids": generate_poids(size, start, seed),
+    }
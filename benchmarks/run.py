@@ -0,0 +1,368 @@
+"""
+Mesure, sans Streamlit, le temps de chaque étape des traitements de l'application.
+
+Exemple :
+    python -m benchmarks.run --sizes 1m,1y --repeat 3 --output benchmark-results.jsonl
+
+Chaque mesure est ajoutée au fichier de sortie sous forme d'une ligne JSON
+(étape, durée d'historique, nombre de lignes, temps min/médian, commit git),
+pour pouvoir comparer les résultats d'un commit à l'autre.
+"""
+import argparse
+import ast
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+import plotly.express as px
+
+import bocpd
+import cgm
+import chart_payload
+import changepoints
+import data_loader
+import date_parsing
+import figure_cache
+import pipeline
+import rollups
+import storage
+import synthesis
+import trendlines
+from benchmarks import generator
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _timed(func, repeat, setup=None):
+    """Exécute `func` `repeat` fois (après `setup` si fourni) et retourne les durées."""
+    durations = []
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        start = time.perf_counter()
+        func(arg) if setup else func()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+class Recorder:
+    """Accumule les mesures et les écrit en JSON lines."""
+
+    def __init__(self, output, size):
+        self.output = output
+        self.size = size
+        self.context = {
+            "commit": _git_commit(),
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+        }
+
+    def record(self, stage, rows, durations, **extra):
+        result = {
+            "stage": stage,
+            "size": self.size,
+            "rows": int(rows),
+            "repeat": len(durations),
+            "best_s": min(durations),
+            "median_s": statistics.median(durations),
+            **extra,
+            **self.context,
+        }
+        print(f"{self.size:>4} {stage:<28} {rows:>9} lignes  {result['best_s']:.4f} s "
+              f"(médiane {result['median_s']:.4f} s)")
+        if self.output:
+            with open(self.output, "a", encoding="utf-8") as f:
+                f.write(json.dumps(result, ensure_ascii=False, default=str) + "\n")
+        return result
+
+
+def _fresh_db(workdir):
+    fd, path = tempfile.mkstemp(suffix=".db", dir=workdir)
+    os.close(fd)
+    os.remove(path)
+    return path
+
+
+def _ingest(df, name, db_path):
+    """Même traitement que process_and_save_data : conversion des dates puis écriture."""
+    df = df.copy()
+    time_col = storage.DATASETS[name]["time_col"]
+    df[time_col] = date_parsing.parse_datetimes(df[time_col])
+    df = df.dropna(subset=[time_col])
+    return storage.write(name, df, db_path=db_path)
+
+
+# Pages de l'application (démarrage à froid) et bibliothèques lourdes chargées au premier besoin
+PAGES = ["streamlit_app.py", "main.py", "page2.py", "page3.py", "page4B.py"]
+HEAVY_MODULES = ["statsmodels", "ruptures"]
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_IMPORT_TIMER = """
+import json, sys, time
+start = time.perf_counter()
+for name in sys.argv[1:]:
+    __import__(name)
+print(json.dumps({"seconds": time.perf_counter() - start,
+                  "heavy": sorted(m for m in %r if m in sys.modules)}))
+"""
+
+
+def _page_imports(page):
+    """Modules importés au chargement d'une page (imports de premier niveau)."""
+    with open(os.path.join(ROOT, page), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+
+def run_startup(recorder, repeat):
+    """
+    Temps d'importation de chaque page dans un interpréteur neuf (démarrage à
+    froid d'un conteneur), et bibliothèques lourdes chargées à cette occasion.
+    """
+    for page in PAGES:
+        modules = _page_imports(page)
+        results = []
+        for _ in range(repeat):
+            out = subprocess.run([sys.executable, "-c", _IMPORT_TIMER % HEAVY_MODULES, *modules],
+                                 cwd=ROOT, capture_output=True, text=True, check=True).stdout
+            results.append(json.loads(out.splitlines()[-1]))
+        recorder.record(f"startup_imports:{page}", len(modules), [r["seconds"] for r in results],
+                        heavy_loaded=results[-1]["heavy"])
+
+
+def run_size(size, recorder, repeat, models, workdir):
+    data = generator.generate_all(size)
+    blood, glycemie, poids = data["blood"], data["glycemie"], data["poids"]
+
+    # --- Importation complète puis ajout d'un lot qui recouvre la fin de l'historique ---
+    for name, df in data.items():
+        recorder.record(f"ingest_full:{name}", len(df),
+                        _timed(lambda db: _ingest(df, name, db), repeat, setup=lambda: _fresh_db(workdir)))
+
+    db_path = _fresh_db(workdir)
+    for name, df in data.items():
+        _ingest(df, name, db_path)
+    for name, df in data.items():
+        time_col = storage.DATASETS[name]["time_col"]
+        batch = df[df[time_col] >= df[time_col].max() - pd.Timedelta(days=2)]
+        recorder.record(f"ingest_append:{name}", len(batch),
+                        _timed(lambda: _ingest(batch, name, db_path), repeat), history_rows=len(df))
+
+    # --- Réimportation d'un export qui recouvre tout l'historique (lignes identiques ignorées) ---
+    for name, df in data.items():
+        version = storage.version(name, db_path=db_path)
+        recorder.record(f"ingest_reimport:{name}", len(df), _timed(lambda: _ingest(df, name, db_path), repeat),
+                        version_bumped=storage.version(name, db_path=db_path) != version)
+
+    # --- Chaîne complète sans interface : un répertoire d'exports, importé en parallèle ---
+    exports = os.path.join(workdir, f"exports-{size}")
+    os.makedirs(exports, exist_ok=True)
+    data["blood"].to_csv(os.path.join(exports, "blood.csv"), index=False)
+    generator.to_french_export(glycemie).to_csv(os.path.join(exports, "glycemie.csv"), index=False)
+    data["poids"].to_csv(os.path.join(exports, "poids.csv"), index=False)
+    total_rows = sum(len(df) for df in data.values())
+    recorder.record("pipeline_full", total_rows,
+                    _timed(lambda db: pipeline.run([exports], db_path=db), repeat, setup=lambda: _fresh_db(workdir)))
+    pipeline_db = _fresh_db(workdir)
+    pipeline.run([exports], db_path=pipeline_db)
+    recorder.record("pipeline_rerun", total_rows, _timed(lambda: pipeline.run([exports], db_path=pipeline_db), repeat))
+
+    # --- Export cumulatif : tout l'historique, dont seul le dernier mois n'a pas encore été importé ---
+    # Avec le registre des importations (voir ledger.py, politique "keep"), seules les lignes inédites
+    # sont préparées ; "reprocess" retraite tout l'export (les lignes déjà présentes sont ignorées à l'écriture).
+    cumulative = generator.to_french_export(glycemie)
+    previous = cumulative[glycemie["Date-Heure"] < glycemie["Date-Heure"].max() - pd.Timedelta(days=30)]
+
+    def _previous_month_imported():
+        db = _fresh_db(workdir)
+        pipeline.ingest("glycemie", previous, policy="keep", db_path=db)
+        return db
+
+    for label, reprocess in [("ingest_cumulative", False), ("ingest_cumulative_reprocess", True)]:
+        recorder.record(f"{label}:glycemie", len(cumulative),
+                        _timed(lambda db: pipeline.ingest("glycemie", cumulative, policy="keep", db_path=db,
+                                                          reprocess=reprocess),
+                               repeat, setup=_previous_month_imported),
+                        new_rows=len(cumulative) - len(previous))
+
+    # --- Lecture complète et lecture d'une plage (30 derniers jours, lecture indexée) ---
+    for name, df in data.items():
+        time_col = storage.DATASETS[name]["time_col"]
+        last = df[time_col].max()
+        recorder.record(f"read_full:{name}", len(df), _timed(lambda: storage.read(name, db_path=db_path), repeat))
+        recent = df[time_col] >= last - pd.Timedelta(days=30)
+        recorder.record(f"read_last30d:{name}", int(recent.sum()),
+                        _timed(lambda: storage.read(name, start=last - pd.Timedelta(days=30), db_path=db_path),
+                               repeat), history_rows=len(df))
+
+    # --- Conversion aux types compacts (mémoire occupée avant/après, en octets) ---
+    for name in data:
+        full = storage.read(name, db_path=db_path)
+        compacted = data_loader.compact(full, name)
+        recorder.record(f"compact:{name}", len(full), _timed(lambda: data_loader.compact(full, name), repeat),
+                        bytes_before=int(full.memory_usage(deep=True).sum()),
+                        bytes_after=int(compacted.memory_usage(deep=True).sum()))
+
+    # --- Synthèse (complète puis incrémentale après une nouvelle séance) ---
+    recorder.record("synthesis_full", len(blood),
+                    _timed(lambda: synthesis.update_synthesis(full=True, db_path=db_path), repeat))
+
+    last_session = [blood["Date-Heure"].max()]
+
+    def _new_session():
+        last_session[0] += pd.Timedelta(hours=12)
+        session = blood.tail(3).copy()
+        session["Date-Heure"] = last_session[0] + pd.to_timedelta([0, 2, 4], unit="min")
+        storage.write("blood", session, db_path=db_path)
+
+    recorder.record("synthesis_incremental", 3,
+                    _timed(lambda _: synthesis.update_synthesis(db_path=db_path), repeat, setup=_new_session),
+                    history_rows=len(blood))
+    synthese = storage.read("synthese", db_path=db_path)
+
+    # --- Agrégats par jour/semaine/mois (complets, puis après une nouvelle séance) ---
+    for name in ("synthese", "glycemie", "poids"):
+        recorder.record(f"rollups_full:{name}", storage.count(name, db_path=db_path),
+                        _timed(lambda: rollups.update_rollups(name, full=True, db_path=db_path), repeat))
+
+    def _new_synthesis():
+        _new_session()
+        synthesis.update_synthesis(db_path=db_path)
+
+    recorder.record("rollups_incremental:synthese", 1,
+                    _timed(lambda _: rollups.update_rollups("synthese", db_path=db_path), repeat,
+                           setup=_new_synthesis), history_rows=len(synthese))
+
+    # --- Indicateurs CGM : sommes horaires complètes, puis après un jour de capteur ---
+    recorder.record("cgm_hourly_full", len(glycemie),
+                    _timed(lambda: cgm.update_hourly(full=True, db_path=db_path), repeat))
+    last_reading = [glycemie["Date-Heure"].max()]
+
+    def _new_day():
+        day = glycemie.tail(288).copy()
+        day["Date-Heure"] = last_reading[0] + pd.to_timedelta(range(5, 5 * 289, 5), unit="min")
+        last_reading[0] = day["Date-Heure"].max()
+        storage.write("glycemie", day, db_path=db_path)
+
+    recorder.record("cgm_hourly_incremental", 288,
+                    _timed(lambda _: cgm.update_hourly(db_path=db_path), repeat, setup=_new_day),
+                    history_rows=len(glycemie))
+
+    # --- Ruptures en ligne : tout l'historique, puis un jour de capteur (coût indépendant de l'historique) ---
+    recorder.record("bocpd_full:glycemie", len(glycemie),
+                    _timed(lambda: bocpd.update("glycemie", full=True, db_path=db_path), repeat))
+    recorder.record("bocpd_incremental:glycemie", 288,
+                    _timed(lambda _: bocpd.update("glycemie", db_path=db_path), repeat, setup=_new_day),
+                    history_rows=len(glycemie))
+
+    # --- Conversion des dates françaises de l'export de glycémie ---
+    export = generator.to_french_export(glycemie)
+    recorder.record("parse_french_dates", len(export),
+                    _timed(lambda: date_parsing.parse_french_datetimes(export["Date-Heure"]), repeat))
+
+    # --- Courbes de tendance LOWESS ---
+    series = [("synthese", synthese, "Systolique (mmHg)"), ("glycemie", glycemie, "Glycémie (mmol/L)"),
+              ("poids", poids, "Poids_lbs")]
+    for name, df, col in series:
+        time_col = storage.DATASETS[name]["time_col"]
+        for mode in ("auto", "exact"):
+            if mode == "exact" and len(df) > 20_000:
+                continue  # LOWESS exacte trop longue sur les données de capteur
+            recorder.record(f"lowess_{mode}:{name}", len(df),
+                            _timed(lambda: trendlines.lowess_curve(df[time_col], df[col], mode=mode), repeat))
+
+    # --- Détection des ruptures sur le poids (toutes les pénalités) ---
+    for model in models:
+        recorder.record(f"pelt_{model}:poids", len(poids),
+                        _timed(lambda: changepoints.penalty_path(poids["Date"], poids["Poids_kg"], model=model),
+                               repeat))
+
+    # --- Construction et sérialisation des graphiques du tableau de bord ---
+    def _figures():
+        payload = 0
+        df_pressure = synthese.melt(id_vars=["Date-Heure"], value_vars=["Systolique (mmHg)", "Diastolique (mmHg)"],
+                                    var_name="Mesure", value_name="Pression")
+        figures = [
+            px.scatter(df_pressure, x="Date-Heure", y="Pression", color="Mesure"),
+            px.scatter(synthese, x="Date-Heure", y="Pouls (bpm)"),
+            px.scatter(glycemie, x="Date-Heure", y="Glycémie (mmol/L)"),
+            px.scatter(poids, x="Date", y="Poids_lbs"),
+        ]
+        for fig in figures:
+            payload += len(fig.to_json())
+        return payload
+
+    payload = _figures()
+    recorder.record("figures_dashboard", len(synthese) + len(glycemie) + len(poids),
+                    _timed(_figures, repeat), payload_bytes=payload)
+
+    # --- Mêmes graphiques relus depuis le cache partagé (une session de plus, mêmes données) ---
+    builders = {
+        "pression": lambda: px.scatter(
+            synthese.melt(id_vars=["Date-Heure"], value_vars=["Systolique (mmHg)", "Diastolique (mmHg)"],
+                          var_name="Mesure", value_name="Pression"),
+            x="Date-Heure", y="Pression", color="Mesure"),
+        "pouls": lambda: px.scatter(synthese, x="Date-Heure", y="Pouls (bpm)"),
+        "glycemie": lambda: px.scatter(glycemie, x="Date-Heure", y="Glycémie (mmol/L)"),
+        "poids": lambda: px.scatter(poids, x="Date", y="Poids_lbs"),
+    }
+    figure_cache.clear()
+    for key, build in builders.items():
+        figure_cache.get((size, key), build)  # premier visiteur : construction
+
+    def _cached_figures():
+        return sum(len(figure_cache.get((size, key), build).to_json()) for key, build in builders.items())
+
+    recorder.record("figures_cached", len(synthese) + len(glycemie) + len(poids),
+                    _timed(_cached_figures, repeat), cache=figure_cache.stats())
+
+    # --- Données des graphiques envoyées au navigateur : texte (dates ISO) ou tableaux binaires compacts ---
+    for key, build in builders.items():
+        for encoding, make in [("text", build), ("binary", lambda: chart_payload.compact(build()))]:
+            fig = make()
+            results = [chart_payload.measure(fig) for _ in range(repeat)]
+            recorder.record(f"chart_payload_{encoding}:{key}", sum(len(trace.x) for trace in fig.data),
+                            [r["serialize_s"] + r["parse_s"] for r in results], payload_bytes=results[0]["bytes"],
+                            serialize_s=min(r["serialize_s"] for r in results),
+                            parse_s=min(r["parse_s"] for r in results))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banc d'essai des traitements MyHealth (sans Streamlit).")
+    parser.add_argument("--sizes", default="1m,1y",
+                        help=f"durées d'historique séparées par des virgules parmi {', '.join(generator.SIZES)}")
+    parser.add_argument("--repeat", type=int, default=3, help="nombre de répétitions par étape")
+    parser.add_argument("--models", default="l2,rbf", help="modèles de ruptures à mesurer")
+    parser.add_argument("--output", default="benchmark-results.jsonl",
+                        help="fichier JSON lines où ajouter les résultats (vide pour ne rien écrire)")
+    args = parser.parse_args(argv)
+
+    run_startup(Recorder(args.output, "cold"), args.repeat)
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes.split(","):
+            recorder = Recorder(args.output, size)
+            run_size(size, recorder, args.repeat, args.models.split(","), workdir)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+import json
+import numpy as np
+import pandas as pd
+import storage
+
+# --- Détection des ruptures en ligne ---
+# Détection bayésienne des ruptures en ligne (BOCPD, Adams et MacKay 2007) sur la
+# moyenne quotidienne de chaque mesure : pression systolique et diastolique et
+# pouls (jeu de synthèse), glycémie. Pour chaque jour, le détecteur tient la loi
+# de la « durée du régime en cours » (nombre de jours depuis la dernière rupture),
+# avec un modèle normal de moyenne et de variance inconnues pour chaque durée.
+#
+# L'état du détecteur est enregistré dans la base après chaque mise à jour : une
+# importation ne traite que les nouveaux jours, sans réajuster l'historique. Le
+# coût d'une mise à jour dépend du nombre de nouveaux jours, pas de la longueur
+# de l'historique (les durées au-delà de MAX_RUN_DAYS sont regroupées).
+#
+# Seuls les jours complets sont traités : le dernier jour de mesures attend
+# qu'un jour suivant apparaisse. Une écriture antérieure au dernier jour traité
+# (correction d'une ancienne mesure) relance le détecteur depuis le début.
+
+# Mesures suivies, par jeu de données
+METRICS = {
+    "synthese": ["Systolique (mmHg)", "Diastolique (mmHg)", "Pouls (bpm)"],
+    "glycemie": ["Glycémie (mmol/L)"],
+}
+
+# Durée moyenne attendue d'un régime (en jours de mesures) : probabilité a priori
+# d'une rupture chaque jour = 1 / HAZARD_DAYS
+HAZARD_DAYS = 90
+# Durée maximale de régime suivie : au-delà, les durées sont regroupées
+MAX_RUN_DAYS = 365
+# Un nouveau régime n'est signalé qu'après avoir été le plus probable, avec le
+# même premier jour, pendant ce nombre de jours
+CONFIRM_DAYS = 7
+# Jours utilisés pour fixer la loi a priori (niveau et dispersion de la mesure)
+PRIOR_DAYS = 14
+
+
+def _watermark_key(name):
+    return f"bocpd:{name}"
+
+
+def _state_key(name, metric):
+    return f"bocpd:{name}:{metric}"
+
+
+def daily_means(df, time_col, metric):
+    """Moyenne quotidienne de `metric` (jours sans mesure exclus)."""
+    values = pd.Series(pd.to_numeric(df[metric], errors="coerce").to_numpy(),
+                       index=df[time_col].dt.normalize().to_numpy())
+    return values.dropna().groupby(level=0).mean()
+
+
+# --- Détecteur ---
+
+def new_state(values):
+    """
+    État initial du détecteur. La loi a priori (normale-gamma) est centrée sur la
+    moyenne des premiers jours, avec leur dispersion (au moins 1 % du niveau).
+    """
+    values = np.asarray(values, dtype=float)
+    mu0 = float(values.mean())
+    sigma0 = max(float(values.std()), 0.01 * abs(mu0), 1e-6)
+    return {
+        "next_day": None,  # premier jour pas encore traité
+        "count": 0,        # jours traités
+        "prior": [mu0, 1.0, 1.0, sigma0 ** 2],  # mu, kappa, alpha, beta
+        "log_r": [0.0],    # log-probabilité de chaque durée du régime en cours
+        "mu": [mu0], "kappa": [1.0], "alpha": [1.0], "beta": [sigma0 ** 2],
+        "regime_start": 0,  # indice du premier jour du régime signalé en dernier
+        "candidate": 0,     # premier jour du régime le plus probable, et depuis combien de jours
+        "candidate_days": 0,
+        "history": [],      # dernières moyennes quotidiennes (au plus MAX_RUN_DAYS)
+        "days": [],         # et leurs dates
+    }
+
+
+def _log_predictive(x, mu, kappa, alpha, beta):
+    """Log-densité de x selon la loi prédictive (Student) de chaque durée."""
+    from scipy.special import gammaln  # chargé au premier besoin (voir warmup.py)
+    scale2 = beta * (kappa + 1) / (alpha * kappa)
+    df = 2 * alpha
+    return (gammaln((df + 1) / 2) - gammaln(df / 2) - 0.5 * np.log(np.pi * df * scale2)
+            - (df + 1) / 2 * np.log1p((x - mu) ** 2 / (df * scale2)))
+
+
+def step(state, day, x):
+    """
+    Ajoute la moyenne `x` du jour `day` à l'état. Retourne la rupture confirmée
+    par ce jour (dict "ts", "before", "after") ou None.
+    """
+    log_r = np.asarray(state["log_r"])
+    mu, kappa = np.asarray(state["mu"]), np.asarray(state["kappa"])
+    alpha, beta = np.asarray(state["alpha"]), np.asarray(state["beta"])
+    hazard = 1.0 / HAZARD_DAYS
+
+    # Probabilité de chaque durée : le régime continue (durée + 1) ou s'arrête (durée 0)
+    log_joint = log_r + _log_predictive(x, mu, kappa, alpha, beta)
+    log_r = np.r_[np.logaddexp.reduce(log_joint) + np.log(hazard), log_joint + np.log1p(-hazard)]
+    log_r -= np.logaddexp.reduce(log_r)
+
+    # Loi a posteriori de chaque durée, la durée 0 repartant de la loi a priori
+    mu0, kappa0, alpha0, beta0 = state["prior"]
+    beta = np.r_[beta0, beta + kappa * (x - mu) ** 2 / (2 * (kappa + 1))]
+    mu = np.r_[mu0, (kappa * mu + x) / (kappa + 1)]
+    kappa, alpha = np.r_[kappa0, kappa + 1], np.r_[alpha0, alpha + 0.5]
+
+    # Troncature : les deux durées les plus longues sont regroupées (la plus probable garde sa loi)
+    if len(log_r) > MAX_RUN_DAYS + 1:
+        keep = -1 if log_r[-1] >= log_r[-2] else -2
+        for params in (mu, kappa, alpha, beta):
+            params[-2] = params[keep]
+        log_r[-2] = np.logaddexp(log_r[-2], log_r[-1])
+        log_r, mu, kappa, alpha, beta = log_r[:-1], mu[:-1], kappa[:-1], alpha[:-1], beta[:-1]
+
+    state.update(log_r=log_r.tolist(), mu=mu.tolist(), kappa=kappa.tolist(), alpha=alpha.tolist(),
+                 beta=beta.tolist())
+    index = state["count"]
+    state["count"] += 1
+    state["history"] = (state["history"] + [float(x)])[-MAX_RUN_DAYS:]
+    state["days"] = (state["days"] + [pd.Timestamp(day).isoformat()])[-MAX_RUN_DAYS:]
+    state["next_day"] = (pd.Timestamp(day) + pd.Timedelta(days=1)).isoformat()
+
+    # Régime le plus probable : il dure depuis `run` jours (jour courant compris)
+    run = int(np.argmax(log_r))
+    start = index + 1 - run
+    if start == state["candidate"]:
+        state["candidate_days"] += 1
+    else:
+        state["candidate"], state["candidate_days"] = start, 1
+    if state["candidate_days"] < CONFIRM_DAYS or start < state["regime_start"] + CONFIRM_DAYS:
+        return None
+    first = state["count"] - len(state["history"])  # indice du plus ancien jour gardé
+    history = state["history"]
+    before = history[max(state["regime_start"] - first, 0):start - first]
+    state["regime_start"] = start
+    if not before:
+        return None
+    return {"ts": pd.Timestamp(state["days"][start - first]), "before": float(np.mean(before)),
+            "after": float(np.mean(history[start - first:]))}
+
+
+# --- Mise à jour à l'importation ---
+
+def _load_states(name, db_path=None):
+    states = {}
+    for metric in METRICS[name]:
+        raw = storage.get_meta(_state_key(name, metric), None, db_path=db_path)
+        states[metric] = json.loads(raw) if raw else None
+    return states
+
+
+def update(name, full=False, db_path=None):
+    """
+    Met à jour le détecteur de chaque mesure de `name` avec les jours complets
+    pas encore traités. Comme pour les agrégats, un filigrane enregistre la
+    dernière version traitée. `full=True` (ou une écriture antérieure au dernier
+    jour traité) repart du début de l'historique.
+
+    Retourne le nombre de jours traités (toutes mesures), ou None si rien n'a changé.
+    """
+    with storage.write_lock(db_path):
+        current = storage.version(name, db_path=db_path)
+        watermark = int(storage.get_meta(_watermark_key(name), 0, db_path=db_path))
+        if current == watermark and not full:
+            return None
+
+        states = {} if full else _load_states(name, db_path=db_path)
+        started = [s for s in states.values() if s is not None]
+        if started and len(started) == len(METRICS[name]) and watermark > 0:
+            resume = min(pd.Timestamp(s["next_day"]) for s in started)
+            changed = storage.changes_since(name, watermark, until_version=current, db_path=db_path)
+            if changed is not None and (changed[0] is None or changed[0] < resume):
+                states, resume = {}, None
+        else:
+            states, resume = {}, None
+
+        # Jours complets : tous ceux qui précèdent le jour de la dernière mesure
+        _, last = storage.time_bounds(name, db_path=db_path)
+        time_col = storage.DATASETS[name]["time_col"]
+        df = storage.read(name, start=resume, end=last.normalize() - pd.Timedelta(1, unit="ns"),
+                          db_path=db_path) if last is not None else None
+
+        processed, found = 0, []
+        for metric in METRICS[name]:
+            state = states.get(metric)
+            means = daily_means(df, time_col, metric) if df is not None and not df.empty else pd.Series(dtype=float)
+            if state is None:
+                if len(means) < PRIOR_DAYS:
+                    continue  # pas encore assez de jours pour fixer la loi a priori
+                state = states[metric] = new_state(means.iloc[:PRIOR_DAYS])
+            means = means[means.index >= pd.Timestamp(state["next_day"])] if state["next_day"] else means
+            for day, x in means.items():
+                point = step(state, day, x)
+                if point is not None:
+                    found.append((metric, point))
+            processed += len(means)
+
+        with storage.transaction(db_path) as con:
+            if resume is None:
+                con.execute("DELETE FROM changepoints WHERE dataset = ?", (name,))
+            con.executemany(
+                "INSERT OR REPLACE INTO changepoints (dataset, metric, ts, before, after) VALUES (?, ?, ?, ?, ?)",
+                [(name, metric, int(p["ts"].value), p["before"], p["after"]) for metric, p in found],
+            )
+            values = [(_state_key(name, metric), json.dumps(state)) for metric, state in states.items()]
+            values.append((_watermark_key(name), str(current)))
+            con.executemany("INSERT INTO meta (key, value) VALUES (?, ?) "
+                            "ON CONFLICT(key) DO UPDATE SET value = excluded.value", values)
+        return processed
+
+
+def state_version(name, db_path=None):
+    """Version de `name` déjà traitée par le détecteur (0 si jamais)."""
+    return int(storage.get_meta(_watermark_key(name), 0, db_path=db_path))
+
+
+def catch_up(name, db_path=None):
+    """
+    Rattrape le détecteur de `name` à l'affichage, seulement si aucune écriture
+    n'est en cours : sinon l'état enregistré est servi tel quel, et
+    l'importation en cours le mettra à jour (voir pipeline.update_derived).
+    """
+    if state_version(name, db_path=db_path) == storage.version(name, db_path=db_path):
+        return
+    with storage.try_write_lock(db_path) as acquired:
+        if acquired:
+            update(name, db_path=db_path)
+
+
+def changepoints(name, start=None, end=None, db_path=None):
+    """
+    Ruptures détectées dans `name` entre `start` et `end` : tableau "Mesure",
+    "Date" (premier jour du nouveau régime), "Avant" et "Après" (moyennes
+    quotidiennes de part et d'autre). Le détecteur est d'abord rattrapé si
+    aucune écriture n'est en cours (voir catch_up).
+    """
+    catch_up(name, db_path=db_path)
+    df = storage.read_changepoints(name, start=start, end=end, db_path=db_path)
+    return df.rename(columns={"metric": "Mesure", "ts": "Date", "before": "Avant", "after": "Après"})
+
+
+def add_markers(fig, points, colors=None):
+    """Ajoute à `fig` une ligne verticale pointillée à chaque rupture de `points` (voir changepoints)."""
+    for row in points.itertuples(index=False):
+        fig.add_vline(x=row.Date, line_dash="dot", line_width=1,
+                      line_color=(colors or {}).get(row.Mesure, "gray"))
+    return fig
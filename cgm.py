@@ -0,0 +1,217 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+import data_loader
+import storage
+
+# --- Indicateurs de glycémie en continu (CGM) ---
+# Les mesures de "glycemie" sont résumées par heure dans "glycemie_horaire"
+# (nombre, somme, somme des carrés, nombre de mesures par plage). Ces sommes
+# s'additionnent : moyenne, écart-type, CV, GMI, temps dans les plages et
+# moyennes glissantes de n'importe quelle période se calculent à partir d'elles,
+# sans relire les mesures. Seules les heures touchées par une importation sont
+# recalculées. Le profil AGP, qui demande des centiles, relit les mesures de sa
+# seule période (14 jours par défaut).
+
+SOURCE = "glycemie"
+HOURLY = "glycemie_horaire"
+VALUE_COL = "Glycémie (mmol/L)"
+
+# Plages de glycémie (mmol/L) du consensus international sur le temps dans la cible.
+# Chaque plage contient les valeurs jusqu'à sa borne haute (incluse, sauf pour les plages basses).
+RANGES = {
+    "Très bas": "< 3,0",
+    "Bas": "3,0 – 3,8",
+    "Dans la cible": "3,9 – 10,0",
+    "Haut": "10,1 – 13,9",
+    "Très haut": "> 13,9",
+}
+RANGE_COLORS = {
+    "Très bas": "#8b0000",
+    "Bas": "#e74c3c",
+    "Dans la cible": "#2ecc71",
+    "Haut": "#f1c40f",
+    "Très haut": "#e67e22",
+}
+TARGET_LOW = 3.9
+TARGET_HIGH = 10.0
+
+# Fenêtres des moyennes glissantes (libellé: durée pandas)
+ROLLING_WINDOWS = {"24 h": "24h", "7 jours": "7D", "14 jours": "14D"}
+# Centiles du profil ambulatoire de glucose (AGP)
+AGP_PERCENTILES = [5, 25, 50, 75, 95]
+# Intervalle attendu entre deux mesures du capteur (pour le temps de capture)
+READING_MINUTES = 5
+
+
+def _range_index(values):
+    """Indice de la plage (ordre de RANGES) de chaque valeur."""
+    return np.select(
+        [values < 3.0, values < TARGET_LOW, values <= TARGET_HIGH, values <= 13.9],
+        [0, 1, 2, 3],
+        default=4,
+    )
+
+
+def hourly_sums(df):
+    """Sommes horaires (colonnes de "glycemie_horaire") des mesures de `df`, en une passe groupby."""
+    values = pd.to_numeric(df[VALUE_COL], errors="coerce").to_numpy(dtype=float)
+    valid = ~np.isnan(values)
+    values = values[valid]
+    hours = df[storage.DATASETS[SOURCE]["time_col"]].dt.floor("h").to_numpy()[valid]
+
+    ranges = _range_index(values)
+    columns = {"Mesures": np.ones(len(values), dtype=np.int64), "Somme": values, "Somme des carrés": values ** 2}
+    for i, name in enumerate(RANGES):
+        columns[name] = (ranges == i).astype(np.int64)
+    sums = pd.DataFrame(columns, index=pd.DatetimeIndex(hours, name="Heure")).groupby(level=0).sum()
+    return sums.reset_index()
+
+
+def _watermark_key():
+    return f"cgm:{SOURCE}"
+
+
+def update_hourly(full=False, db_path=None):
+    """
+    Met à jour les sommes horaires. Comme pour la synthèse, un filigrane
+    enregistre la dernière version de "glycemie" déjà résumée : seules les heures
+    qui contiennent des écritures postérieures sont relues et remplacées.
+    `full=True` (ou une première mise à jour) recalcule tout l'historique.
+
+    Retourne le nombre d'heures recalculées, ou None si rien n'a changé.
+    """
+    with storage.write_lock(db_path):
+        current = storage.version(SOURCE, db_path=db_path)
+        watermark = int(storage.get_meta(_watermark_key(), 0, db_path=db_path))
+        if current == watermark and not full:
+            return None
+
+        start = end = None
+        if not full and watermark > 0 and storage.version(HOURLY, db_path=db_path) > 0:
+            changed = storage.changes_since(SOURCE, watermark, until_version=current, db_path=db_path)
+            if changed is None:
+                storage.set_meta(_watermark_key(), current, db_path=db_path)
+                return None
+            start, end = changed
+            # Heures entières qui contiennent les changements
+            start = pd.Timestamp(start).floor("h") if start is not None else None
+            end = pd.Timestamp(end).floor("h") + pd.Timedelta(hours=1) - pd.Timedelta(1, unit="ns") \
+                if end is not None else None
+
+        sums = hourly_sums(storage.read(SOURCE, start=start, end=end, db_path=db_path))
+        storage.replace_range(HOURLY, sums, start=start, end=end, db_path=db_path)
+        storage.set_meta(_watermark_key(), current, db_path=db_path)
+        return len(sums)
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _cached_hourly(version, start, end):
+    return storage.read(HOURLY, start=start, end=end)
+
+
+def catch_up():
+    """
+    Rattrape les sommes horaires à l'affichage, seulement si aucune écriture
+    n'est en cours : sinon la table actuelle est servie telle quelle, et
+    l'importation en cours la mettra à jour (voir pipeline.update_derived).
+    """
+    if int(storage.get_meta(_watermark_key(), 0)) == storage.version(SOURCE):
+        return
+    with storage.try_write_lock() as acquired:
+        if acquired:
+            update_hourly()
+
+
+def hourly(start=None, end=None):
+    """
+    Sommes horaires des heures qui recoupent [start, end], rattrapées si aucune
+    écriture n'est en cours (voir catch_up).
+    """
+    catch_up()
+    start = pd.Timestamp(start).floor("h") if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+    return _cached_hourly(storage.version(HOURLY), start, end)
+
+
+def summary(start=None, end=None):
+    """
+    Indicateurs de la période [start, end] (à l'heure près), ou None sans mesure :
+    nombre de mesures, moyenne, écart-type, coefficient de variation (CV, %),
+    GMI (indicateur de gestion du glucose, %), temps de capture (%) et
+    pourcentage du temps passé dans chaque plage de RANGES.
+    """
+    sums = hourly(start, end)
+    count = sums["Mesures"].sum()
+    if count == 0:
+        return None
+    mean = sums["Somme"].sum() / count
+    variance = max(sums["Somme des carrés"].sum() / count - mean ** 2, 0.0)
+    if count > 1:
+        variance *= count / (count - 1)  # écart-type de l'échantillon
+    sd = float(np.sqrt(variance))
+
+    hours = (sums["Heure"].iloc[-1] - sums["Heure"].iloc[0]) / pd.Timedelta(hours=1) + 1
+    return {
+        "Mesures": int(count),
+        "Moyenne": float(mean),
+        "Écart-type": sd,
+        "CV": float(100 * sd / mean),
+        # GMI (%) = 3,31 + 0,02392 × moyenne en mg/dL (1 mmol/L = 18,016 mg/dL)
+        "GMI": float(3.31 + 0.02392 * 18.016 * mean),
+        "Temps de capture": min(100.0, float(100 * count / (hours * 60 / READING_MINUTES))),
+        "Plages": {name: float(100 * sums[name].sum() / count) for name in RANGES},
+    }
+
+
+def rolling_means(start=None, end=None):
+    """
+    Moyennes glissantes (fenêtres de ROLLING_WINDOWS) à la fin de chaque heure de
+    [start, end], calculées sur les sommes horaires : le coût dépend du nombre
+    d'heures, pas du nombre de mesures.
+    """
+    longest = max(pd.Timedelta(w) for w in ROLLING_WINDOWS.values())
+    warmup = pd.Timestamp(start) - longest if start is not None else None
+    sums = hourly(warmup, end).set_index("Heure")[["Mesures", "Somme"]]
+    means = pd.DataFrame(index=sums.index)
+    for label, window in ROLLING_WINDOWS.items():
+        rolled = sums.rolling(window).sum()
+        means[label] = rolled["Somme"] / rolled["Mesures"]
+    if start is not None:
+        means = means[means.index >= pd.Timestamp(start).floor("h")]
+    return means.reset_index()
+
+
+def agp(start=None, end=None, bin_minutes=15):
+    """
+    Profil ambulatoire de glucose : centiles AGP_PERCENTILES de la glycémie par
+    tranche de `bin_minutes` de la journée, sur les mesures de [start, end].
+    L'index est l'heure du jour (sur une date fictive, pour l'axe des abscisses).
+    """
+    df = data_loader.load_range(SOURCE, start, end)
+    times = df[storage.DATASETS[SOURCE]["time_col"]]
+    minutes = (times - times.dt.normalize()) // pd.Timedelta(minutes=bin_minutes) * bin_minutes
+    values = pd.to_numeric(df[VALUE_COL], errors="coerce")
+    profile = values.groupby(minutes.to_numpy()).quantile([p / 100 for p in AGP_PERCENTILES]).unstack()
+    profile.columns = [f"p{p}" for p in AGP_PERCENTILES]
+    profile.index = pd.Timestamp("2000-01-01") + pd.to_timedelta(profile.index, unit="min")
+    profile.index.name = "Heure du jour"
+    return profile.reset_index()
+
+
+def agp_figure(profile):
+    """Graphique AGP : bandes 5–95 et 25–75, médiane et plage cible."""
+    x = profile["Heure du jour"]
+    fig = go.Figure()
+    for low, high, opacity in [("p5", "p95", 0.15), ("p25", "p75", 0.35)]:
+        fig.add_trace(go.Scatter(x=x, y=profile[high], mode="lines", line_width=0, line_color="#2c7be5",
+                                 showlegend=False, hoverinfo="skip"))
+        fig.add_trace(go.Scatter(x=x, y=profile[low], mode="lines", line_width=0, line_color="#2c7be5",
+                                 fill="tonexty", opacity=opacity, name=f"{low[1:]}–{high[1:]} %"))
+    fig.add_trace(go.Scatter(x=x, y=profile["p50"], mode="lines", line_color="#1a4d8f", name="Médiane"))
+    for level in (TARGET_LOW, TARGET_HIGH):
+        fig.add_hline(y=level, line_dash="dash", line_color="green")
+    fig.update_layout(title="Profil ambulatoire de glucose (AGP)", yaxis_title="Glycémie (mmol/L)",
+                      xaxis=dict(title="Heure du jour", tickformat="%H:%M"))
+    return fig
@@ -0,0 +1,209 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+import jobs
+import storage
+
+# --- Paramètres de la détection des ruptures ---
+# Valeurs proposées par le curseur de sensibilité (pen)
+PENALTIES = list(range(1, 21))
+# Mêmes réglages par défaut que rpt.Pelt
+MIN_SIZE = 2
+JUMP = 5
+# Modèles de coût disponibles : rbf est le plus général mais quadratique en mémoire
+# et en temps ; l2 (changement de moyenne) et normal sont calculés ici à partir
+# de sommes cumulées, sans boucle Python par segment.
+MODELS = {
+    "rbf": "RBF (précis, lent)",
+    "l2": "L2 - changement de moyenne (rapide)",
+    "normal": "Normal - moyenne et variance (rapide)",
+}
+
+
+def _segment_costs(s1, s2, starts, end, model):
+    """Coût des segments [start:end] pour chaque start, à partir des sommes cumulées."""
+    size = end - starts
+    mean = (s1[end] - s1[starts]) / size
+    var = np.maximum((s2[end] - s2[starts]) / size - mean ** 2, 0.0)
+    if model == "l2":
+        return var * size
+    # model == "normal" : même petit biais que ruptures pour les segments constants
+    return np.log(var + 1e-6) * size
+
+
+def pelt_cumsum(signal, pen, model="l2", min_size=MIN_SIZE, jump=JUMP):
+    """
+    Algorithme PELT (même grille de candidats que rpt.Pelt) pour les coûts "l2"
+    et "normal". Chaque étape évalue tous les candidats admissibles d'un coup.
+    Retourne la fin (exclue) de chaque segment, la dernière valant len(signal).
+    """
+    signal = np.asarray(signal, dtype=float)
+    n = len(signal)
+    s1 = np.r_[0.0, np.cumsum(signal)]
+    s2 = np.r_[0.0, np.cumsum(signal ** 2)]
+
+    best = np.full(n + 1, np.inf)  # best[t] : coût optimal de signal[0:t]
+    best[0] = 0.0
+    previous = np.zeros(n + 1, dtype=int)
+    admissible = np.empty(0, dtype=int)
+
+    ends = [k for k in range(0, n, jump) if k >= min_size] + [n]
+    for end in ends:
+        new_point = (end - min_size) // jump * jump
+        admissible = np.unique(np.r_[admissible, new_point])
+        candidates = admissible[np.isfinite(best[admissible]) & (end - admissible >= min_size)]
+        if len(candidates) == 0:
+            continue
+        totals = best[candidates] + _segment_costs(s1, s2, candidates, end, model) + pen
+        i = int(np.argmin(totals))
+        best[end], previous[end] = totals[i], candidates[i]
+        # Élagage : un candidat qui ne peut plus devenir optimal est abandonné
+        admissible = np.r_[candidates[totals <= best[end] + pen],
+                           admissible[~np.isfinite(best[admissible])]]
+
+    breakpoints, t = [], n
+    while t > 0:
+        breakpoints.append(int(t))
+        t = previous[t]
+    return breakpoints[::-1]
+
+
+def penalty_path(dates, values, model="rbf", penalties=PENALTIES, daily=False):
+    """
+    Détecte les ruptures pour toutes les pénalités de `penalties`. Pour "rbf", un
+    seul ajustement de rpt.Pelt sert à toutes les pénalités (la matrice RBF n'est
+    calculée qu'une fois) ; "l2" et "normal" utilisent pelt_cumsum.
+
+    `daily=True` travaille sur la moyenne quotidienne, ce qui réduit fortement la
+    taille du signal pour les longs historiques.
+
+    Retourne un dict {pénalité: liste des dates de début de chaque nouveau segment}.
+    """
+    series = pd.Series(np.asarray(values, dtype=float), index=pd.to_datetime(dates)).dropna()
+    if daily:
+        series = series.resample("D").mean().dropna()
+    if len(series) <= 5:  # éviter erreur si trop peu de points
+        return {pen: [] for pen in penalties}
+
+    signal = series.to_numpy()
+    if model == "rbf":
+        import ruptures as rpt  # chargé au premier besoin (voir warmup.py)
+        algo = rpt.Pelt(model=model, min_size=MIN_SIZE, jump=JUMP).fit(signal)
+        predict = lambda pen: algo.predict(pen=pen)
+    else:
+        predict = lambda pen: pelt_cumsum(signal, pen, model=model)
+
+    path = {}
+    for pen in penalties:
+        # La fin (exclue) de chaque segment, la dernière étant len(signal)
+        ends = predict(pen)[:-1]
+        path[pen] = list(series.index[ends])
+    return path
+
+
+def compute_path(name, y_col, start, end, model, daily, db_path=None):
+    """
+    Lit la plage [start, end] du jeu de données et calcule son chemin de pénalités.
+    Exécutée dans un processus du pool de tâches (voir jobs.py).
+    """
+    df = storage.read(name, start=start, end=end, db_path=db_path)
+    time_col = storage.DATASETS[name]["time_col"]
+    return penalty_path(df[time_col], df[y_col], model=model, daily=daily)
+
+
+def breakpoints_by_penalty(name, y_col, start=None, end=None, model="rbf", daily=False):
+    """
+    Ruptures du jeu de données `name` pour chaque pénalité de PENALTIES, calculées
+    en arrière-plan et partagées entre les sessions. Pendant un nouveau calcul,
+    retourne le dernier chemin terminé pour les mêmes paramètres (ou None).
+    """
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+    path, _ = jobs.run(("ruptures", name, y_col, start, end, model, daily), storage.version(name),
+                       compute_path, name, y_col, start, end, model, daily, storage.DB_PATH,
+                       label=f"Ruptures {y_col} ({MODELS[model]})")
+    return path
+
+
+def piecewise_linear(dates, values, breakpoints):
+    """
+    Ajuste une droite par segment, en une seule passe pour tous les segments :
+    les sommes (x, y, x², xy) de chaque segment sont obtenues par np.add.reduceat.
+    L'abscisse est le temps réel en jours (pas l'indice de la ligne).
+
+    `breakpoints` suit la convention de ruptures (fins de segment, la dernière
+    valant len(dates)).
+
+    Retourne (segments, x, y) : un tableau des segments (dates, nombre de points,
+    pente par semaine, valeurs de début et de fin) et les coordonnées d'une trace
+    unique où chaque segment est séparé du suivant par une valeur manquante.
+    """
+    dates = pd.to_datetime(pd.Series(dates)).reset_index(drop=True)
+    y = np.asarray(values, dtype=float)
+    x = (dates - dates.iloc[0]).dt.total_seconds().to_numpy() / 86400.0
+
+    starts = np.r_[0, breakpoints[:-1]].astype(int)
+    ends = np.asarray(breakpoints, dtype=int)
+    keep = ends > starts
+    starts, ends = starts[keep], ends[keep]
+
+    # Sommes par segment (les valeurs manquantes ne comptent pas)
+    valid = ~np.isnan(y)
+    xv, yv, w = np.where(valid, x, 0.0), np.where(valid, y, 0.0), valid.astype(float)
+    count = np.add.reduceat(w, starts)
+    sx, sy = np.add.reduceat(xv, starts), np.add.reduceat(yv, starts)
+    sxx, sxy = np.add.reduceat(xv * xv, starts), np.add.reduceat(xv * yv, starts)
+
+    denom = count * sxx - sx ** 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = np.where((count > 1) & (denom > 0), (count * sxy - sx * sy) / denom, np.nan)
+        intercept = (sy - slope * sx) / count
+
+    x_start, x_end = x[starts], x[ends - 1]
+    y_start, y_end = intercept + slope * x_start, intercept + slope * x_end
+    segments = pd.DataFrame({
+        "Début": dates.iloc[starts].to_numpy(),
+        "Fin": dates.iloc[ends - 1].to_numpy(),
+        "Points": count.astype(int),
+        "Pente (/semaine)": slope * 7,
+        "Valeur début": y_start,
+        "Valeur fin": y_end,
+    }).dropna(subset=["Pente (/semaine)"]).reset_index(drop=True)
+
+    # Trace unique : début, fin, puis une valeur manquante pour couper la ligne
+    trace_x = np.column_stack([segments["Début"], segments["Fin"], np.full(len(segments), None)]).ravel()
+    trace_y = np.column_stack([segments["Valeur début"], segments["Valeur fin"],
+                               np.full(len(segments), np.nan)]).ravel()
+    return segments, trace_x, trace_y
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _cached_trend(name, version, y_col, start, end, segment_starts):
+    df = storage.read(name, start=start, end=end)
+    time_col = storage.DATASETS[name]["time_col"]
+    breakpoints = breakpoint_indices(df[time_col], list(segment_starts))
+    return piecewise_linear(df[time_col], df[y_col], breakpoints)
+
+
+def piecewise_trend(name, y_col, pen, start=None, end=None, model="rbf", daily=False):
+    """
+    Tendances par segment (voir piecewise_linear) pour la pénalité `pen`, mises en
+    cache. Retourne None tant que les ruptures n'ont jamais été calculées.
+    """
+    path = breakpoints_by_penalty(name, y_col, start=start, end=end, model=model, daily=daily)
+    if path is None:
+        return None
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+    return _cached_trend(name, storage.version(name), y_col, start, end, tuple(path[pen]))
+
+
+def breakpoint_indices(dates, segment_starts):
+    """
+    Convertit des dates de début de segment en indices de fin de segment
+    (même convention que ruptures : la dernière valeur vaut len(dates)).
+    """
+    dates = pd.to_datetime(dates).to_numpy()
+    starts = np.searchsorted(dates, pd.to_datetime(segment_starts).to_numpy(), side="left")
+    ends = [int(i) for i in starts if 0 < i < len(dates)]
+    return sorted(set(ends)) + [len(dates)]
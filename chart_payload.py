@@ -0,0 +1,79 @@
+import base64
+import json
+import time
+import numpy as np
+import pandas as pd
+import plotly.io as pio
+import streamlit as st
+
+# --- Données des graphiques envoyées au navigateur ---
+# st.plotly_chart envoie la figure en JSON (plotly.io.to_json). plotly encode
+# déjà les tableaux numériques en binaire (base64, float64), mais les dates
+# partent en texte ISO ("2024-10-01T08:15:00", 21 caractères par point). Avant
+# l'envoi, les abscisses de dates sont converties en millisecondes depuis
+# l'époque (float64 : exact à la milliseconde, un axe "date" de plotly.js les
+# lit directement) et les mesures en float32 (7 chiffres significatifs, bien
+# plus que la précision des appareils). Le navigateur reçoit des tableaux typés
+# au lieu de milliers de chaînes à analyser.
+
+
+def _is_datetime(values):
+    if values.dtype.kind == "M":
+        return True
+    return values.dtype == object and pd.api.types.infer_dtype(values, skipna=True) in ("datetime64", "datetime", "date")
+
+
+def compact(fig):
+    """
+    Convertit sur place les données de chaque trace de `fig` : abscisses de dates
+    en millisecondes depuis l'époque (l'axe est déclaré de type "date"),
+    ordonnées numériques en float32. Les tableaux déjà encodés (figure relue
+    depuis le cache, voir figure_cache.py) et les valeurs textuelles sont
+    laissés tels quels. Retourne `fig`.
+    """
+    date_axes = set()
+    for trace in fig.data:
+        x, y = trace["x"] if "x" in trace else None, trace["y"] if "y" in trace else None
+        if x is not None and not isinstance(x, dict):
+            x = np.asarray(x)
+            if len(x) and _is_datetime(x):
+                millis = pd.to_datetime(x).as_unit("ms").asi8.astype("float64")
+                millis[pd.isna(x)] = np.nan  # coupures des segments : un trou dans la ligne
+                trace["x"] = millis
+                date_axes.add(trace["xaxis"] or "x")
+        if y is not None and not isinstance(y, dict):
+            y = np.asarray(y)
+            if y.dtype.kind in "fiu" or (y.dtype == object and pd.api.types.infer_dtype(y, skipna=True)
+                                         in ("integer", "floating", "mixed-integer-float")):
+                # plotly ignore une affectation de valeurs égales (72 en float32 == 72.0) : effacer d'abord
+                trace["y"] = None
+                trace["y"] = y.astype("float32")
+    for axis in date_axes:
+        fig.layout["xaxis" + axis[1:]].type = "date"
+    return fig
+
+
+def plotly_chart(fig, **kwargs):
+    """st.plotly_chart avec des données binaires compactes (voir compact)."""
+    return st.plotly_chart(compact(fig), **kwargs)
+
+
+def measure(fig):
+    """
+    Taille de la spécification envoyée au navigateur (en octets) et durées de sa
+    sérialisation (comme st.plotly_chart) et de sa relecture : analyse du JSON,
+    décodage des tableaux binaires et des dates texte (approximation, en Python,
+    du travail du navigateur).
+    """
+    start = time.perf_counter()
+    spec = pio.to_json(fig, validate=False)
+    serialized = time.perf_counter()
+    for trace in json.loads(spec)["data"]:
+        for attr in ("x", "y"):
+            values = trace.get(attr)
+            if isinstance(values, dict) and "bdata" in values:
+                np.frombuffer(base64.b64decode(values["bdata"]), dtype=values["dtype"])
+            elif isinstance(values, list) and values and isinstance(values[0], str):
+                pd.to_datetime(pd.Series(values), errors="coerce")
+    parsed = time.perf_counter()
+    return {"bytes": len(spec.encode("utf-8")), "serialize_s": serialized - start, "parse_s": parsed - serialized}
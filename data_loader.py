@@ -0,0 +1,127 @@
+import pandas as pd
+import streamlit as st
+import storage
+
+# --- Jeux de données connus de l'application ---
+# Le schéma (colonne de date, colonnes de mesures) est défini dans storage.DATASETS.
+DATASETS = storage.DATASETS
+
+# --- Types compacts en mémoire ---
+# Pressions et pouls tiennent sur 16 bits, glycémie et poids en float32 (une
+# décimale), et les notes, très répétitives, sont stockées comme catégories.
+_PRESSURE_DTYPES = {
+    "Systolique (mmHg)": "int16",
+    "Diastolique (mmHg)": "int16",
+    "Pouls (bpm)": "int16",
+    "Notes": "category",
+}
+COMPACT_DTYPES = {
+    "blood": _PRESSURE_DTYPES,
+    "synthese": _PRESSURE_DTYPES,
+    "glycemie": {"Glycémie (mmol/L)": "float32", "Note-1": "category", "Note-2": "category"},
+    "poids": {"Poids_kg": "float32", "Poids_lbs": "float32"},
+}
+
+
+def compact(df, name):
+    """
+    Convertit les colonnes de `df` aux types compacts de COMPACT_DTYPES.
+    Une colonne entière avec des valeurs manquantes passe au type entier nullable (Int16).
+    """
+    dtypes = {}
+    for col, dtype in COMPACT_DTYPES.get(name, {}).items():
+        if col in df.columns:
+            if dtype.startswith("int") and df[col].isna().any():
+                dtype = dtype.capitalize()
+            dtypes[col] = dtype
+    return df.astype(dtypes)
+
+
+# Les jeux de données chargés sont gardés une seule fois pour tout le processus
+# (st.cache_resource : ni copie ni sérialisation par session). Les pages reçoivent
+# des copies superficielles : avec le copy-on-write de pandas, elles partagent
+# les mêmes tableaux, et une modification ne touche que la copie de la page.
+@st.cache_resource(show_spinner=False, max_entries=32)
+def _read_cached(name, db_path, version):
+    """
+    Lit un jeu de données depuis le stockage. Le paramètre `version` ne sert qu'à la
+    clé du cache : chaque écriture incrémente la version et force une relecture.
+    """
+    return compact(storage.read(name, db_path=db_path), name)
+
+
+def load_dataset(name):
+    """
+    Charge un jeu de données (voir DATASETS) avec sa colonne de date convertie.
+    Le résultat est mis en cache entre les sessions tant que les données n'ont pas changé.
+    Lève FileNotFoundError si le jeu de données n'a jamais été enregistré.
+    """
+    version = storage.version(name)
+    if version == 0:
+        raise FileNotFoundError(DATASETS[name]["csv"])
+    return _read_cached(name, storage.DB_PATH, version).copy(deep=False)
+
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def _read_range_cached(name, db_path, version, start, end):
+    """Comme _read_cached, pour une plage de dates (lecture indexée dans la base)."""
+    return compact(storage.read(name, start=start, end=end, db_path=db_path), name)
+
+
+def day_bounds(start_date=None, end_date=None):
+    """
+    Convertit les dates choisies dans l'interface en bornes incluses :
+    début de la journée de `start_date`, fin de la journée de `end_date`.
+    """
+    start = pd.Timestamp(start_date).normalize() if start_date is not None else None
+    end = (pd.Timestamp(end_date).normalize() + pd.Timedelta(days=1) - pd.Timedelta(1, unit="ns")
+           if end_date is not None else None)
+    return start, end
+
+
+def load_range(name, start=None, end=None):
+    """
+    Charge seulement la plage [start, end] (bornes incluses, None = pas de borne)
+    du jeu de données. La plage est lue directement dans la base grâce à l'index
+    sur la date : afficher les 30 derniers jours ne coûte pas le chargement de
+    tout l'historique. Mis en cache par version et par plage.
+    """
+    if start is None and end is None:
+        return load_dataset(name)
+    version = storage.version(name)
+    if version == 0:
+        raise FileNotFoundError(DATASETS[name]["csv"])
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+    return _read_range_cached(name, storage.DB_PATH, version, start, end).copy(deep=False)
+
+
+def slice_range(df, time_col, start=None, end=None):
+    """
+    Sous-ensemble [start, end] (inclus) d'un DataFrame déjà trié par `time_col`,
+    trouvé par recherche dichotomique (searchsorted) au lieu d'un masque sur
+    toutes les lignes. Retourne une vue par positions, sans copie des données.
+    """
+    times = df[time_col].to_numpy()
+    lo = times.searchsorted(pd.Timestamp(start).to_datetime64(), side="left") if start is not None else 0
+    hi = times.searchsorted(pd.Timestamp(end).to_datetime64(), side="right") if end is not None else len(df)
+    return df.iloc[lo:hi]
+
+
+def time_bounds(name):
+    """Première et dernière date du jeu de données, sans le charger."""
+    return storage.time_bounds(name)
+
+
+def dataset_exists(name):
+    """Indique si le jeu de données a déjà été enregistré."""
+    return storage.version(name) > 0
+
+
+def invalidate():
+    """
+    Vide le cache des jeux de données. À appeler après chaque écriture
+    (importation, synthèse) pour libérer immédiatement les anciennes versions.
+    """
+    _read_cached.clear()
+    _read_range_cached.clear()
@@ -0,0 +1,81 @@
+import pandas as pd
+
+# --- Correspondance des noms de mois (abrégés ou complets, avec ou sans accents) ---
+MONTHS = {
+    "janv": 1, "janvier": 1,
+    "févr": 2, "fevr": 2, "février": 2, "fevrier": 2,
+    "mars": 3,
+    "avr": 4, "avril": 4,
+    "mai": 5,
+    "juin": 6,
+    "juil": 7, "juill": 7, "juillet": 7,
+    "août": 8, "aout": 8,
+    "sept": 9, "sep": 9, "septembre": 9,
+    "oct": 10, "octobre": 10,
+    "nov": 11, "novembre": 11,
+    "déc": 12, "dec": 12, "décembre": 12, "decembre": 12,
+}
+
+# Format `J MMM AAAA, HH "h" MM` (ex: `3 sept. 2025, 09 h 51`) : partie date et partie heure
+DATE_PATTERN = r"^\s*(?P<day>\d{1,2})\s+(?P<month>[^\s\d,]+)\s+(?P<year>\d{4})\s*$"
+TIME_PATTERN = r"^\s*(?P<hour>\d{1,2})\s*h\s*(?P<minute>\d{1,2})\s*$"
+
+
+def _parse_days(values):
+    """Convertit des parties date distinctes (`3 sept. 2025`) en dates, NaT si invalide."""
+    parts = pd.Series(values, dtype=str).str.extract(DATE_PATTERN)
+    month = parts["month"].str.lower().str.rstrip(".'").map(MONTHS)
+    return pd.to_datetime(
+        pd.DataFrame({
+            "year": pd.to_numeric(parts["year"]),
+            "month": month,
+            "day": pd.to_numeric(parts["day"]),
+        }),
+        errors="coerce",
+    ).astype("datetime64[ns]")
+
+
+def _parse_times(values):
+    """Convertit des parties heure distinctes (`09 h 51`) en durées, NaT si invalide."""
+    parts = pd.Series(values, dtype=str).str.extract(TIME_PATTERN)
+    hour, minute = pd.to_numeric(parts["hour"]), pd.to_numeric(parts["minute"])
+    valid = (hour < 24) & (minute < 60)
+    return pd.to_timedelta(hour.where(valid) * 60 + minute.where(valid), unit="min")
+
+
+def parse_french_datetimes(series):
+    """
+    Convertit une colonne de dates au format `J MMM AAAA, HH "h" MM`.
+
+    La colonne est coupée à la virgule (partie date / partie heure). Un export
+    couvre quelques centaines de jours et au plus 1440 heures distinctes : seules
+    ces valeurs distinctes (pd.factorize) sont analysées, puis les résultats sont
+    redistribués par indexation. Les dates invalides deviennent NaT.
+    """
+    text = series.astype(str)
+    day_codes, day_uniques = pd.factorize(text.str.replace(r",.*$", "", regex=True))
+    time_codes, time_uniques = pd.factorize(text.str.replace(r"^[^,]*,?", "", regex=True))
+    days = _parse_days(day_uniques).to_numpy()
+    times = _parse_times(time_uniques).to_numpy()
+
+    result = pd.Series(pd.NaT, index=series.index, dtype="datetime64[ns]")
+    valid = (day_codes >= 0) & (time_codes >= 0)
+    result[valid] = days[day_codes[valid]] + times[time_codes[valid]]
+    return result
+
+
+def parse_datetimes(series):
+    """
+    Conversion générique pour les importateurs : formats reconnus par pandas,
+    puis format français pour les valeurs restantes. Chaque chaîne distincte
+    n'est analysée qu'une fois. Les dates invalides deviennent NaT.
+    """
+    codes, uniques = pd.factorize(series)
+    parsed = pd.Series(pd.to_datetime(uniques, errors="coerce")).astype("datetime64[ns]")
+    missing = parsed.isna().to_numpy()
+    if missing.any():
+        parsed[missing] = parse_french_datetimes(pd.Series(uniques[missing]).astype(str)).to_numpy()
+    result = pd.Series(pd.NaT, index=series.index, dtype="datetime64[ns]")
+    valid = codes >= 0
+    result[valid] = parsed.to_numpy()[codes[valid]]
+    return result
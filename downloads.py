@@ -0,0 +1,54 @@
+import gzip
+import io
+import streamlit as st
+import storage
+
+# --- Formats d'exportation proposés ---
+# format: (libellé, extension, type MIME)
+FORMATS = {
+    "csv": ("CSV", ".csv", "text/csv"),
+    "csv.gz": ("CSV compressé (gzip)", ".csv.gz", "application/gzip"),
+    "parquet": ("Parquet", ".parquet", "application/vnd.apache.parquet"),
+}
+
+
+def serialize(df, fmt):
+    """Sérialise `df` dans le format `fmt` (voir FORMATS) et retourne les octets."""
+    if fmt == "csv":
+        return df.to_csv(index=False).encode("utf-8")
+    if fmt == "csv.gz":
+        return gzip.compress(df.to_csv(index=False).encode("utf-8"))
+    if fmt == "parquet":
+        buffer = io.BytesIO()
+        df.to_parquet(buffer, index=False)
+        return buffer.getvalue()
+    raise ValueError(f"Format d'exportation inconnu : {fmt}")
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _export(name, version, fmt):
+    """
+    Export mis en cache entre les sessions. Le paramètre `version` ne sert qu'à la
+    clé : le fichier n'est régénéré qu'après une écriture dans le jeu de données.
+    """
+    return serialize(storage.read(name), fmt)
+
+
+def download_button(name, label=None, key=None):
+    """
+    Bouton de téléchargement du jeu de données `name` avec le choix du format.
+    Les octets ne sont générés qu'au clic (fonction passée à st.download_button),
+    puis gardés en cache pour la version courante des données.
+    """
+    label = label or f"📥 Télécharger {storage.DATASETS[name]['csv']}"
+    key = key or f"download_{name}"
+    version = storage.version(name)
+
+    col_button, col_format = st.columns([3, 1])
+    with col_format:
+        fmt = st.selectbox("Format", list(FORMATS), format_func=lambda f: FORMATS[f][0],
+                           key=f"{key}_format", label_visibility="collapsed")
+    _, extension, mime = FORMATS[fmt]
+    with col_button:
+        st.download_button(label=label, data=lambda: _export(name, version, fmt),
+                           file_name=f"{name}{extension}", mime=mime, key=key)
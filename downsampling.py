@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+
+# --- Paramètres d'affichage ---
+# Nombre de points conservés par série : de l'ordre de la largeur du graphique en pixels
+MAX_POINTS = 2000
+# Au-delà de ce nombre de points, les traces passent en WebGL (scattergl)
+WEBGL_THRESHOLD = 5000
+
+
+def _to_numeric(dates):
+    return pd.to_datetime(dates).to_numpy(dtype="datetime64[ns]").astype("int64").astype(float)
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets : choisit `n_out` points qui conservent la
+    forme visuelle de la courbe. `x` doit être trié. Retourne les indices retenus.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # Premier et dernier points toujours conservés, n_out - 2 intervalles au milieu
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    indices = np.empty(n_out, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+    previous = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        # Point moyen de l'intervalle suivant (ou dernier point)
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean() if next_end > end else x[-1]
+        avg_y = y[end:next_end].mean() if next_end > end else y[-1]
+        # Point de l'intervalle courant qui forme le plus grand triangle
+        area = np.abs((x[previous] - avg_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (avg_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        indices[i + 1] = previous
+    return indices
+
+
+def minmax_indices(x, y, n_buckets):
+    """
+    Min/max par intervalle : découpe l'axe du temps en `n_buckets` intervalles
+    de même durée et garde, pour chacun, la mesure minimale et la maximale.
+    Les pics restent donc visibles. Retourne les indices retenus, triés.
+    """
+    n = len(x)
+    if 2 * n_buckets >= n:
+        return np.arange(n)
+    span = x[-1] - x[0]
+    buckets = np.minimum(((x - x[0]) / span * n_buckets).astype(int), n_buckets - 1) if span > 0 else np.zeros(n, dtype=int)
+    # Tri par intervalle puis par valeur : le premier élément de chaque groupe est
+    # le minimum, le dernier est le maximum.
+    order = np.lexsort((y, buckets))
+    sorted_buckets = buckets[order]
+    first = np.flatnonzero(np.r_[True, sorted_buckets[1:] != sorted_buckets[:-1]])
+    last = np.r_[first[1:] - 1, n - 1]
+    return np.unique(np.r_[order[first], order[last]])
+
+
+def downsample(df, x_col, y_cols, n_out=MAX_POINTS, method="lttb"):
+    """
+    Réduit `df` (trié par `x_col`) à environ `n_out` points par série avant l'envoi
+    au navigateur. Les indices retenus pour chaque colonne de `y_cols` sont réunis,
+    donc chaque série garde ses propres points remarquables.
+    """
+    if isinstance(y_cols, str):
+        y_cols = [y_cols]
+    if len(df) <= n_out:
+        return df
+
+    x = _to_numeric(df[x_col])
+    keep = []
+    for col in y_cols:
+        y = df[col].to_numpy(dtype=float)
+        valid = np.flatnonzero(~np.isnan(y))
+        if method == "minmax":
+            chosen = minmax_indices(x[valid], y[valid], n_out // 2)
+        else:
+            chosen = lttb_indices(x[valid], y[valid], n_out)
+        keep.append(valid[chosen])
+    return df.iloc[np.unique(np.concatenate(keep))]
+
+
+def use_webgl(n_points):
+    """Indique si une trace de `n_points` points doit être rendue en WebGL."""
+    return n_points > WEBGL_THRESHOLD
+
+
+def render_mode(n_points):
+    """Valeur du paramètre `render_mode` de plotly express pour `n_points` points."""
+    return "webgl" if use_webgl(n_points) else "svg"
@@ -0,0 +1,88 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+import plotly.graph_objects as go
+import chart_payload
+import profiling
+
+# --- Cache des graphiques construits ---
+# Les graphiques sont gardés sérialisés (spécification JSON de plotly), partagés
+# entre toutes les sessions du processus : après une importation, le premier
+# visiteur construit chaque graphique, les suivants le relisent. La clé doit
+# contenir tout ce dont dépend le graphique (version des données, période,
+# unité, réglages des tendances...). Les graphiques les moins récemment utilisés
+# sont retirés au-delà du budget mémoire.
+
+# Budget mémoire du cache (en Mo), configurable par variable d'environnement
+MAX_BYTES = int(float(os.environ.get("MYHEALTH_FIGURE_CACHE_MB", "64")) * 1e6)
+
+_lock = threading.Lock()
+_cache = OrderedDict()  # clé -> spécification JSON (str)
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "bytes": 0}
+
+
+def _store(key, spec):
+    size = len(spec)
+    if size > MAX_BYTES:
+        return  # plus gros que tout le budget : jamais gardé
+    with _lock:
+        if key in _cache:
+            _stats["bytes"] -= len(_cache.pop(key))
+        _cache[key] = spec
+        _stats["bytes"] += size
+        while _stats["bytes"] > MAX_BYTES:
+            _, evicted = _cache.popitem(last=False)
+            _stats["bytes"] -= len(evicted)
+            _stats["evictions"] += 1
+
+
+def get(key, build, label=None):
+    """
+    Graphique de la clé `key` : relu depuis le cache s'il y est, sinon construit
+    par `build()` (sans argument, retourne une figure plotly) puis mis en cache.
+    Chaque appel retourne une figure neuve, que la page peut modifier.
+    """
+    with _lock:
+        spec = _cache.get(key)
+        if spec is not None:
+            _cache.move_to_end(key)
+            _stats["hits"] += 1
+        else:
+            _stats["misses"] += 1
+    if label:
+        profiling.record(f"Figure {label}", cache="succès" if spec is not None else "échec")
+    if spec is not None:
+        # La spécification a été validée à la construction : la relire sans la revalider
+        # (plotly.io.from_json revalide chaque point et coûte presque autant que la construction)
+        return go.Figure(json.loads(spec), _validate=False)
+
+    # Données converties en tableaux binaires compacts (voir chart_payload.py) avant la mise
+    # en cache : les relectures les envoient telles quelles, et le cache en garde davantage
+    fig = chart_payload.compact(build())
+    _store(key, fig.to_json())
+    return fig
+
+
+def stats():
+    """Compteurs du cache (succès, échecs, évictions) et mémoire occupée."""
+    with _lock:
+        return {**_stats, "entries": len(_cache), "max_bytes": MAX_BYTES}
+
+
+def clear():
+    """Vide le cache (les compteurs sont conservés)."""
+    with _lock:
+        _cache.clear()
+        _stats["bytes"] = 0
+
+
+def _describe():
+    s = stats()
+    total = s["hits"] + s["misses"]
+    rate = f"{100 * s['hits'] / total:.0f} %" if total else "—"
+    return (f"{s['hits']} succès, {s['misses']} échecs ({rate}), {s['evictions']} évictions, "
+            f"{s['entries']} graphiques, {s['bytes'] / 1e6:.1f} / {s['max_bytes'] / 1e6:.0f} Mo")
+
+
+profiling.register("Cache des graphiques", _describe)
@@ -0,0 +1,148 @@
+import hashlib
+import threading
+from collections import OrderedDict
+import pandas as pd
+import streamlit as st
+import ledger
+
+# --- Paramètres de lecture ---
+# Nombre de lignes lues à la fois dans un CSV
+CSV_CHUNK_ROWS = 50_000
+# Fréquence de mise à jour de la barre de progression pour un XLSX (en lignes)
+XLSX_PROGRESS_ROWS = 10_000
+# Nombre de lignes affichées dans l'aperçu
+PREVIEW_ROWS = 5
+# Nombre d'importations gardées en mémoire (partagé entre les sessions)
+MAX_CACHED_IMPORTS = 4
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def file_digest(uploaded_file):
+    """
+    Empreinte SHA-256 du fichier importé. Elle est mémorisée dans la session
+    (par identifiant de fichier) pour ne pas relire le fichier à chaque rerun.
+    """
+    digests = st.session_state.setdefault("_upload_digests", {})
+    file_id = getattr(uploaded_file, "file_id", None) or uploaded_file.name
+    if file_id not in digests:
+        digests[file_id] = hashlib.sha256(uploaded_file.getbuffer()).hexdigest()
+    return digests[file_id]
+
+
+def file_kind(uploaded_file):
+    """"csv" ou "xlsx" selon l'extension du fichier."""
+    return "csv" if uploaded_file.name.lower().endswith(".csv") else "xlsx"
+
+
+def _rewound(uploaded_file):
+    """Le fichier importé, relu depuis le début (sans copie de son contenu)."""
+    uploaded_file.seek(0)
+    return uploaded_file
+
+
+def _xlsx_rows(source):
+    """Itère sur les lignes de la première feuille (openpyxl en lecture seule)."""
+    from openpyxl import load_workbook
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        yield sheet.max_row
+        yield from sheet.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def _cached_preview(digest, kind, dtype, _uploaded_file):
+    """
+    Aperçu (premières lignes) du fichier, mis en cache par empreinte : le
+    fichier (exclu de la clé) n'est relu qu'en l'absence d'aperçu en cache.
+    """
+    if kind == "csv":
+        return pd.read_csv(_rewound(_uploaded_file), nrows=PREVIEW_ROWS, dtype=dtype)
+    rows = _xlsx_rows(_rewound(_uploaded_file))
+    next(rows)  # nombre de lignes
+    header = [str(col) for col in next(rows)]
+    head = [row for _, row in zip(range(PREVIEW_ROWS), rows)]
+    rows.close()
+    return pd.DataFrame(head, columns=header)
+
+
+def preview(uploaded_file, dtype=None):
+    """
+    Aperçu du fichier importé (colonnes et premières lignes), sans lire tout le
+    fichier. Les reruns du formulaire d'association des colonnes le relisent en cache.
+    """
+    return _cached_preview(file_digest(uploaded_file), file_kind(uploaded_file), dtype, uploaded_file)
+
+
+def _read_csv(uploaded_file, columns, dtype, progress):
+    buffer = _rewound(uploaded_file)
+    chunks = []
+    for chunk in pd.read_csv(buffer, usecols=columns, dtype=dtype, chunksize=CSV_CHUNK_ROWS):
+        chunks.append(chunk)
+        progress(buffer.tell() / max(uploaded_file.size, 1))
+    if not chunks:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def _read_xlsx(uploaded_file, columns, dtype, progress):
+    rows = _xlsx_rows(_rewound(uploaded_file))
+    total = next(rows) or 0
+    header = [str(col) for col in next(rows)]
+    positions = [header.index(col) for col in columns]
+    values = {col: [] for col in columns}
+    for count, row in enumerate(rows, start=1):
+        # Seules les colonnes associées sont conservées
+        for col, pos in zip(columns, positions):
+            values[col].append(row[pos] if pos < len(row) else None)
+        if total and count % XLSX_PROGRESS_ROWS == 0:
+            progress(min(count / total, 1.0))
+    df = pd.DataFrame(values, columns=columns)
+    return df.astype(dtype) if dtype else df
+
+
+def read_columns(uploaded_file, columns, dtype=None, label="Lecture du fichier..."):
+    """
+    Lit uniquement les colonnes `columns` du fichier importé, par morceaux (CSV)
+    ou ligne par ligne avec openpyxl en lecture seule (XLSX), avec une barre de
+    progression. Le résultat est mis en cache par empreinte du fichier et par
+    colonnes : il n'est lu qu'une fois, même si la page est réexécutée.
+    """
+    columns = list(dict.fromkeys(columns))  # une même colonne peut être associée deux fois
+    key = (file_digest(uploaded_file), tuple(columns), dtype)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key].copy()
+
+    bar = st.progress(0.0, text=label)
+    reader = _read_csv if file_kind(uploaded_file) == "csv" else _read_xlsx
+    df = reader(uploaded_file, columns, dtype, lambda done: bar.progress(done, text=label))
+    bar.empty()
+
+    with _cache_lock:
+        _cache[key] = df
+        while len(_cache) > MAX_CACHED_IMPORTS:
+            _cache.popitem(last=False)
+    return df.copy()
+
+
+def ledger_key(uploaded_file, dataset, columns, policy, reprocess=False):
+    """
+    Clé du fichier importé dans le registre des importations (voir ledger.py),
+    ou None s'il a déjà été importé dans `dataset` avec les mêmes colonnes et la
+    même politique : un message l'indique, et la page n'a rien à relire. Avec
+    `reprocess=True` ou la politique "replace", le registre n'est pas consulté.
+    """
+    key = ledger.file_key(file_digest(uploaded_file), [dataset, *columns], policy=policy)
+    previous = None if reprocess or not ledger.consulted(policy) else ledger.imported_file(key)
+    if previous is None:
+        return key
+    st.info(f"Ce fichier a déjà été importé le {previous['imported_at'].replace('T', ' à ')} "
+            f"({previous['rows']} lignes) : rien de nouveau à enregistrer. "
+            "Cochez « Retraiter tout le fichier » pour l'importer à nouveau.")
+    return None
@@ -0,0 +1,252 @@
+import concurrent.futures
+import contextlib
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import types
+from collections import OrderedDict
+import streamlit as st
+import warmup
+
+# --- Exécution des calculs lourds en arrière-plan ---
+# Synthèse, courbes LOWESS et détection des ruptures s'exécutent dans un pool de
+# processus partagé par toutes les sessions. Une tâche est identifiée par un
+# groupe (ce qui est calculé : jeu de données, colonne, paramètres) et une clé
+# (la version des données). Deux demandes identiques en cours ne sont calculées
+# qu'une fois, et pendant un nouveau calcul les pages réutilisent le dernier
+# résultat terminé du même groupe.
+
+# Nombre de processus du pool (par défaut, un par cœur)
+MAX_WORKERS = int(os.environ.get("MYHEALTH_JOB_WORKERS", "0")) or os.cpu_count() or 2
+# Attente maximale d'un résultat avant de répondre avec le précédent (en secondes)
+WAIT_SECONDS = 1.0
+# Fréquence de vérification des tâches en cours par la barre latérale (en secondes)
+POLL_SECONDS = 1.0
+# Nombre de groupes dont le dernier résultat est conservé (partagé entre les sessions)
+MAX_RESULTS = 64
+
+_lock = threading.Lock()
+_executor = None
+_running = {}            # (groupe, clé) -> Job en cours
+_results = OrderedDict()  # groupe -> (clé, résultat) du dernier calcul terminé
+_errors = {}             # (groupe, clé) -> exception du dernier calcul en échec
+_SESSION_KEY = "_jobs_watched"
+
+
+class Job:
+    """Tâche soumise au pool de processus."""
+
+    def __init__(self, group, key, label, future):
+        self.group = group
+        self.key = key
+        self.label = label
+        self.future = future
+        self.submitted = time.monotonic()
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.submitted
+
+
+_main_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def _neutral_main():
+    """
+    Streamlit remplace le module __main__ par la page en cours d'exécution : un
+    processus lancé avec "spawn" réexécuterait cette page à son démarrage.
+    Pendant le lancement d'un processus, __main__ est remplacé par un module vide.
+    Le remplacement est fait sous verrou, et __main__ n'est rétabli que si une
+    page ne l'a pas remplacé entre-temps (rerun d'une autre session).
+    """
+    neutral = types.ModuleType("__main__")
+    with _main_lock:
+        main = sys.modules.get("__main__")
+        sys.modules["__main__"] = neutral
+        try:
+            yield
+        finally:
+            if sys.modules.get("__main__") is neutral:
+                sys.modules["__main__"] = main
+
+
+class _SpawnProcess(multiprocessing.context.SpawnProcess):
+    """Processus du pool : __main__ n'est neutralisé que le temps de son lancement."""
+
+    def start(self):
+        with _neutral_main():
+            super().start()
+
+
+class _SpawnContext(multiprocessing.context.SpawnContext):
+    Process = _SpawnProcess
+
+
+def _pool():
+    """
+    Pool de processus créé au premier besoin. Les processus sont lancés avec
+    "spawn" : le serveur Streamlit a déjà plusieurs threads, un fork n'est pas sûr.
+    Chaque processus précharge les bibliothèques des calculs (voir warmup.py).
+    """
+    global _executor
+    if _executor is None:
+        _executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=MAX_WORKERS, mp_context=_SpawnContext(), initializer=warmup.init_worker)
+    return _executor
+
+
+def _on_done(job):
+    with _lock:
+        if _running.get((job.group, job.key)) is job:
+            del _running[(job.group, job.key)]
+        if job.future.cancelled():
+            return
+        error = job.future.exception()
+        if error is not None:
+            _errors[(job.group, job.key)] = error
+            return
+        _results[job.group] = (job.key, job.future.result())
+        _results.move_to_end(job.group)
+        while len(_results) > MAX_RESULTS:
+            _results.popitem(last=False)
+
+
+def submit(group, key, func, *args, label=None):
+    """
+    Soumet `func(*args)` au pool, sauf si la même tâche (groupe et clé) est déjà
+    en cours : la tâche existante est alors retournée. `func` doit être une
+    fonction de module (elle est exécutée dans un autre processus).
+    """
+    global _executor
+    created = False
+    with _lock:
+        job = _running.get((group, key))
+        if job is None:
+            _errors.pop((group, key), None)
+            # Les processus du pool sont lancés au besoin, pendant submit() (voir _SpawnProcess)
+            try:
+                future = _pool().submit(func, *args)
+            except concurrent.futures.process.BrokenProcessPool:
+                # Un processus du pool s'est arrêté brutalement : on repart d'un pool neuf
+                _executor = None
+                future = _pool().submit(func, *args)
+            job = Job(group, key, label or str(group), future)
+            _running[(group, key)] = job
+            created = True
+    if created:
+        # Hors du verrou : si le calcul est déjà terminé, _on_done est appelé immédiatement
+        job.future.add_done_callback(lambda _: _on_done(job))
+    _watch(job, True)
+    return job
+
+
+def warm_pool():
+    """
+    Lance tous les processus du pool sans attendre une première tâche : une tâche
+    vide par processus (ils ne sont créés qu'à la soumission d'une tâche).
+    """
+    with _lock:
+        for _ in range(MAX_WORKERS):
+            _pool().submit(warmup.worker_timings)
+
+
+def poll(group, key):
+    """
+    État de la tâche : ("done", résultat), ("running", None), ("error", exception)
+    ou ("unknown", None) si elle n'a jamais été soumise (ou a été oubliée).
+    """
+    with _lock:
+        if (group, key) in _running:
+            return "running", None
+        if (group, key) in _errors:
+            return "error", _errors[(group, key)]
+        cached = _results.get(group)
+        if cached is not None and cached[0] == key:
+            _results.move_to_end(group)
+            return "done", cached[1]
+    return "unknown", None
+
+
+def run(group, key, func, *args, label=None, wait=WAIT_SECONDS):
+    """
+    Résultat de la tâche (groupe, clé), calculé en arrière-plan si nécessaire.
+
+    Attend au plus `wait` secondes. Retourne (résultat, état) : état "done" si le
+    résultat correspond à la clé demandée, "running" sinon ; le résultat est alors
+    le dernier calcul terminé du même groupe (ou None), et la barre latérale
+    réexécute la page dès que le nouveau calcul est terminé (voir status_panel).
+    Une erreur du calcul est levée ici, et à nouveau à chaque appel avec la même
+    clé sans relancer le calcul : il ne sera recalculé que pour une autre clé.
+    """
+    state, result = poll(group, key)
+    if state == "done":
+        return result, state
+    if state == "error":
+        raise result
+    job = submit(group, key, func, *args, label=label)
+    timed_out = False
+    try:
+        return job.future.result(timeout=wait), "done"
+    except concurrent.futures.TimeoutError:
+        timed_out = True
+        with _lock:
+            previous = _results.get(group)
+        return (previous[1] if previous is not None else None), "running"
+    finally:
+        if not timed_out:
+            _watch(job, False)
+
+
+def running():
+    """Tâches en cours (toutes sessions confondues)."""
+    with _lock:
+        return list(_running.values())
+
+
+def _watch(job, watched):
+    """
+    Ajoute (ou retire) la tâche de celles que suit la session : la page est
+    réexécutée quand elles sont terminées.
+    """
+    try:
+        jobs = st.session_state.setdefault(_SESSION_KEY, {})
+    except Exception:  # hors d'une session Streamlit (tâche lancée sans interface)
+        return
+    if watched:
+        jobs[(job.group, job.key)] = job.label
+    else:
+        jobs.pop((job.group, job.key), None)
+
+
+@st.fragment(run_every=POLL_SECONDS)
+def _status_fragment():
+    watched = st.session_state.get(_SESSION_KEY, {})
+    with _lock:
+        pending = [_running[k] for k in watched if k in _running]
+    if not pending:
+        # Toutes les tâches suivies sont terminées : la page est réexécutée avec les résultats
+        st.session_state[_SESSION_KEY] = {}
+        st.rerun()
+    for job in pending:
+        st.caption(f"⏳ {job.label} : calcul en cours ({job.elapsed:.0f} s)")
+
+
+def status_panel():
+    """
+    À appeler à la fin d'une page : affiche dans la barre latérale les calculs en
+    cours lancés par cette session, et réexécute la page quand ils sont terminés.
+    """
+    if st.session_state.get(_SESSION_KEY):
+        with st.sidebar:
+            _status_fragment()
+
+
+# --- Tâches ---
+
+def synthesis_task(source, target, full, db_path):
+    """Synthèse incrémentale puis agrégats de `target` (voir pipeline.synthesize)."""
+    import pipeline
+    return pipeline.synthesize(source, target, full=full, db_path=db_path)
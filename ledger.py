@@ -0,0 +1,134 @@
+import datetime
+import hashlib
+import numpy as np
+import pandas as pd
+import storage
+
+# --- Registre des importations ---
+# Les exports des appareils sont cumulatifs : chaque nouvel export contient à
+# nouveau tous les mois précédents. Le registre garde, dans la base, l'empreinte
+# de chaque fichier importé et celle de chaque bloc de lignes importé :
+# - un fichier déjà importé est reconnu sans être relu ;
+# - dans un nouvel export, les blocs déjà importés sont écartés avant la
+#   conversion des dates et la fusion : seules les lignes inédites sont traitées.
+#
+# Les blocs sont découpés d'après leur contenu (une ligne termine un bloc quand
+# son empreinte est multiple de BLOCK_ROWS) et non tous les N lignes : des lignes
+# ajoutées au début, au milieu ou à la fin d'un export ne décalent pas les
+# autres blocs, qui restent reconnus. Un bloc inconnu est traité en entier, et
+# storage.upsert ignore ses lignes déjà présentes.
+#
+# Écarter un bloc déjà importé ne change le résultat que si ses lignes ont été
+# modifiées depuis par un autre fichier. Avec la politique "keep", elles ne
+# seraient de toute façon pas écrasées ; avec "fill", seules les valeurs effacées
+# depuis (par une importation "replace") ne sont pas recomplétées. Avec
+# "replace", le fichier réimporté doit pouvoir écraser les valeurs d'un autre :
+# le registre n'est pas consulté (voir consulted), les blocs sont seulement
+# enregistrés. La politique fait partie de la clé d'un fichier.
+# Les empreintes sont calculées sur les valeurs brutes du fichier (avant toute
+# conversion) ; si elles changent (autre version de pandas, autre lecture du
+# fichier), les blocs ne sont simplement plus reconnus.
+
+# Taille moyenne d'un bloc (en lignes)
+BLOCK_ROWS = 64
+
+
+def consulted(policy):
+    """Indique si le registre écarte les fichiers et blocs déjà importés pour la politique `policy`."""
+    return policy != "replace"
+
+
+def file_key(digest, columns=(), policy=None):
+    """
+    Clé d'un fichier dans le registre : son empreinte SHA-256, la politique de
+    conflit et, pour les pages, les colonnes associées (un même fichier associé
+    ou fusionné autrement n'est pas le même import).
+    """
+    parts = [*([policy] if policy is not None else []), *map(str, columns)]
+    if not parts:
+        return digest
+    return hashlib.sha256("\x1f".join([digest, *parts]).encode("utf-8")).hexdigest()
+
+
+def file_digest(path):
+    """Empreinte SHA-256 d'un fichier sur disque."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def imported_file(key, db_path=None):
+    """
+    Importation déjà enregistrée pour la clé `key` (voir file_key) : dict
+    "dataset", "rows" et "imported_at", ou None si le fichier est nouveau.
+    """
+    con = storage.connect(db_path)
+    try:
+        row = con.execute("SELECT dataset, rows, imported_at FROM ingested_files WHERE key = ?", (key,)).fetchone()
+    finally:
+        con.close()
+    if row is None:
+        return None
+    return {"dataset": row[0], "rows": row[1], "imported_at": row[2]}
+
+
+def block_digests(df):
+    """
+    Découpe les lignes de `df` en blocs d'après leur contenu. Retourne (empreinte
+    de chaque bloc, numéro du bloc de chaque ligne).
+    """
+    if df.empty:
+        return [], np.zeros(0, dtype=np.int64)
+    rows = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    ends = np.flatnonzero(rows % BLOCK_ROWS == 0) + 1  # une ligne "frontière" termine son bloc
+    block_of_row = np.zeros(len(rows), dtype=np.int64)
+    block_of_row[ends[ends < len(rows)]] = 1
+    block_of_row = np.cumsum(block_of_row)
+    # Empreinte d'un bloc : ses lignes, dans l'ordre (entier signé de 64 bits, comme SQLite)
+    digests = [int.from_bytes(hashlib.blake2b(chunk.tobytes(), digest_size=8).digest(), "little", signed=True)
+               for chunk in np.split(rows, ends[ends < len(rows)])]
+    return digests, block_of_row
+
+
+def _known_blocks(name, db_path=None):
+    con = storage.connect(db_path)
+    try:
+        return {row[0] for row in con.execute("SELECT digest FROM ingested_blocks WHERE dataset = ?", (name,))}
+    finally:
+        con.close()
+
+
+def new_rows(name, df, db_path=None):
+    """
+    Lignes de `df` (valeurs brutes de l'export) qui ne font partie d'aucun bloc
+    déjà importé dans `name`. Retourne (lignes à traiter, empreintes des blocs à
+    enregistrer après l'écriture, nombre de lignes écartées).
+    """
+    digests, block_of_row = block_digests(df)
+    known = _known_blocks(name, db_path=db_path)
+    is_new = np.array([digest not in known for digest in digests], dtype=bool)
+    keep = is_new[block_of_row]
+    pending = [digest for digest, new in zip(digests, is_new) if new]
+    return df[keep], pending, int(len(df) - keep.sum())
+
+
+def record(name, digests, key=None, rows=0, db_path=None):
+    """
+    Enregistre les blocs `digests` importés dans `name` et, si `key` est donnée,
+    le fichier (voir file_key) et son nombre de lignes. À appeler une fois
+    l'écriture validée : si elle échoue, rien n'est enregistré et le fichier
+    sera retraité.
+    """
+    with storage.transaction(db_path) as con:
+        con.executemany("INSERT OR IGNORE INTO ingested_blocks (dataset, digest) VALUES (?, ?)",
+                        [(name, digest) for digest in digests])
+        if key is not None:
+            con.execute(
+                "INSERT INTO ingested_files (key, dataset, rows, imported_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET dataset = excluded.dataset, rows = excluded.rows, "
+                "imported_at = excluded.imported_at",
+                (key, name, int(rows), datetime.datetime.now().isoformat(timespec="seconds")),
+            )
+
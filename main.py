@@ -1,8 +1,16 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
-import statsmodels.api as sm
 import datetime
+import bocpd
+import chart_payload
+import data_loader
+import downloads
+import downsampling
+import figure_cache
+import profiling
+import rollups
+import storage
+import trendlines
 
 
 
@@ -14,225 +22,346 @@ st.title("📈 Tableau de Bord Interactif des Données de Santé")
 st.sidebar.header("🔍 Filtrage des données")
 #date_debut = st.sidebar.date_input("Date de début", value=None)
 date_debut = st.sidebar.date_input("Date de début", value=datetime.date(2024, 10, 1))
+date_fin = st.sidebar.date_input("Date de fin", value=None)
+
+# Bornes incluses de la période affichée : seule cette plage est lue dans la base
+# (voir data_loader.load_range), au lieu de tout charger puis de filtrer.
+date_debut, date_fin = data_loader.day_bounds(date_debut, date_fin)
+
+# --- Sections du tableau de bord ---
+# Chaque section est un fragment : une interaction avec ses contrôles ne réexécute
+# que cette section. Les données, agrégats et tendances viennent des caches
+# partagés (data_loader, rollups, trendlines) : changer la période ne fait que
+# relire ces caches pour chaque section. Les ruptures (changements de régime)
+# viennent du détecteur en ligne, mis à jour à l'importation (voir bocpd.py).
+
+def regime_table(points):
+    """Liste des changements de régime de la période (moyennes quotidiennes avant et après)."""
+    if points.empty:
+        return
+    with st.expander(f"Changements de régime détectés ({len(points)})"):
+        st.dataframe(points.assign(Date=points['Date'].dt.date), hide_index=True,
+                     column_config={col: st.column_config.NumberColumn(format="%.1f") for col in ['Avant', 'Après']})
+
+
+@st.fragment
+def pressure_section(date_debut, date_fin):
+    st.write("### Pression")
+    # Contrôle propre à la section : le changer ne réexécute que ce fragment
+    show_trend = st.checkbox("Courbe de tendance (LOWESS)", value=True, key="trend_pression")
+
+    # --- Chargement des données ---
+    try:
+        # On essaie de lire le fichier CSV qui contient les données synthétisées
+        # (chargement partagé et mis en cache, la colonne 'Date-Heure' est déjà convertie en date)
+        # Sur une longue période, les graphiques affichent les agrégats par jour, semaine
+        # ou mois (voir rollups.py) : les mesures brutes ne sont alors pas chargées.
+        resolution = rollups.choose_resolution('synthese', date_debut, date_fin)
+        if resolution is None:
+            with profiling.stage("Chargement synthese"):
+                df_synthese = data_loader.load_range('synthese', date_debut, date_fin)
+
+        st.success("Fichier `synthese.csv` chargé avec succès.")
+        # Ruptures de la période, déjà détectées à l'importation (aucun réajustement ici)
+        with profiling.stage("Ruptures synthese"):
+            ruptures = bocpd.changepoints('synthese', date_debut, date_fin)
+        #st.write("### Aperçu des données utilisées pour les graphiques :")
+        #st.dataframe(df_synthese.head())
+        # Le fichier n'est généré qu'au clic, puis gardé en cache (voir downloads.py)
+        downloads.download_button('synthese')
+
+
+
+        # --- Création des graphiques ---
+
+
+        # Graphiques partagés entre les sessions (voir figure_cache.py) : construits une fois
+        # par version des données, période et réglage des tendances, puis relus par tous
+
+
+        # === GRAPHIQUE 1 : PRESSION SYSTOLIQUE ET DIASTOLIQUE ===
+
+        def build_pressure():
+            if resolution is not None:
+                # Moyenne et bande p10–p90 par période au lieu d'un point par mesure
+                with profiling.stage("Pression : agrégats"):
+                    fig_pressure = rollups.figure(
+                        'synthese', ['Systolique (mmHg)', 'Diastolique (mmHg)'], resolution, date_debut, date_fin,
+                        colors={'Systolique (mmHg)': 'red', 'Diastolique (mmHg)': 'blue'},
+                        title='Suivi de la Pression Artérielle', y_label='Pression (mmHg)'
+                    )
+            else:
+                # Pour tracer Systolique et Diastolique sur le même graphique avec des couleurs différentes,
+                # on transforme les données en format "long" avec la fonction melt de Pandas.
+                with profiling.stage("Pression : melt"):
+                    df_pressure = df_synthese.melt(
+                        id_vars=['Date-Heure'], 
+                        value_vars=['Systolique (mmHg)', 'Diastolique (mmHg)'],
+                        var_name='Mesure', 
+                        value_name='Pression'
+                    )
+
+                # Création de la figure avec Plotly Express. 
+                # 'color="Mesure"' assigne automatiquement une couleur à 'Systolique' et une autre à 'Diastolique'.
+                with profiling.stage("Pression : figure"):
+                    fig_pressure = px.scatter(
+                        df_pressure, 
+                        x='Date-Heure', 
+                        y='Pression', 
+                        color='Mesure',
+                        #markers=True, # Ajoute des points sur la ligne pour chaque mesure
+                        title='Suivi de la Pression Artérielle (Systolique et Diastolique)',
+                        labels={
+                            "Date-Heure": "Date et Heure",
+                            "Pression": "Pression (mmHg)",
+                            "Mesure": "Type de Mesure"
+                        },
+                        color_discrete_map={
+                            'Systolique (mmHg)': 'red',
+                            'Diastolique (mmHg)': 'blue'
+                        }
+                    )
+
+            # Courbes de tendance précalculées et mises en cache (voir trendlines.py)
+            if show_trend:
+                with profiling.stage("Pression : LOWESS"):
+                    for mesure, couleur in [('Systolique (mmHg)', 'red'), ('Diastolique (mmHg)', 'blue')]:
+                        trendlines.add_trendline(fig_pressure, 'synthese', mesure, start=date_debut, end=date_fin, color=couleur)
+            bocpd.add_markers(fig_pressure, ruptures[ruptures['Mesure'] != 'Pouls (bpm)'],
+                              colors={'Systolique (mmHg)': 'red', 'Diastolique (mmHg)': 'blue'})
+            return fig_pressure
+
+        cle = ('main:pression', storage.version('synthese'), rollups.state_version('synthese'),
+               bocpd.state_version('synthese'), date_debut, date_fin,
+               show_trend, show_trend and trendlines.ready('synthese', ['Systolique (mmHg)', 'Diastolique (mmHg)'],
+                                                           date_debut, date_fin))
+        fig_pressure = figure_cache.get(cle, build_pressure, label='Pression')
+
+        # Affichage du premier graphique dans l'application Streamlit
+        with profiling.stage("Pression : affichage"):
+            chart_payload.plotly_chart(fig_pressure, use_container_width=True)
+
+
+
+        # ---
+
+
+        # === GRAPHIQUE 2 : POULS ===
+
+        def build_pulse():
+            # Ce graphique est plus direct car il n'y a qu'une seule variable à tracer.
+            if resolution is not None:
+                with profiling.stage("Pouls : agrégats"):
+                    fig_pulse = rollups.figure('synthese', ['Pouls (bpm)'], resolution, date_debut, date_fin,
+                                               colors={'Pouls (bpm)': 'green'}, title='Suivi de la fréquence cardiaque',
+                                               y_label='Pouls (battements par minute)')
+            else:
+                with profiling.stage("Pouls : figure"):
+                    fig_pulse = px.scatter(
+                        df_synthese, 
+                        x='Date-Heure', 
+                        y='Pouls (bpm)', 
+                        #markers=True, # Ajoute des points sur la ligne
+                        title='Suivi de la fréquence cardiaque',
+                        labels={
+                            "Date-Heure": "Date et Heure",
+                            "Pouls (bpm)": "Pouls (battements par minute)"
+                        }
+                    )
+            if show_trend:
+                with profiling.stage("Pouls : LOWESS"):
+                    trendlines.add_trendline(fig_pulse, 'synthese', 'Pouls (bpm)', start=date_debut, end=date_fin)
+
+            # On personnalise la couleur de la ligne pour la rendre distincte.
+            if resolution is None:
+                fig_pulse.update_traces(line_color='green')
+            bocpd.add_markers(fig_pulse, ruptures[ruptures['Mesure'] == 'Pouls (bpm)'], colors={'Pouls (bpm)': 'green'})
+            return fig_pulse
+
+        cle = ('main:pouls', storage.version('synthese'), rollups.state_version('synthese'),
+               bocpd.state_version('synthese'), date_debut, date_fin,
+               show_trend, show_trend and trendlines.ready('synthese', ['Pouls (bpm)'], date_debut, date_fin))
+        fig_pulse = figure_cache.get(cle, build_pulse, label='Pouls')
+
+        # Affichage du second graphique dans l'application Streamlit
+        with profiling.stage("Pouls : affichage"):
+            chart_payload.plotly_chart(fig_pulse, use_container_width=True)
+
+        regime_table(ruptures)
+
+
+    except FileNotFoundError:
+        st.error(
+            "❌ Le fichier `synthese.csv` n'a pas été trouvé. "
+            "Veuillez d'abord générer ce fichier en utilisant la page d'analyse de données."
+        )
+    except Exception as e:
+        st.error(f"Une erreur est survenue lors du chargement ou de l'affichage des données : {e}")
+    # Mesures d'un rerun limité à cette section (voir profiling.report)
+    profiling.report("main", fragment="Pression")
+
+
+@st.fragment
+def glucose_section(date_debut, date_fin):
+    # Contrôle propre à la section : le changer ne réexécute que ce fragment
+    show_trend = st.checkbox("Courbe de tendance (LOWESS)", value=True, key="trend_glycemie")
+
+    # --- Chargement des données ---
+    try:
+        # On essaie de lire le fichier CSV qui contient les données synthétisées
+        # (chargement partagé et mis en cache, la colonne 'Date-Heure' est déjà convertie en date)
+        resolution = rollups.choose_resolution('glycemie', date_debut, date_fin)
+        if resolution is None:
+            with profiling.stage("Chargement glycemie"):
+                df_glycemie = data_loader.load_range('glycemie', date_debut, date_fin)
+
+        st.success("Fichier `glycemie.csv` chargé avec succès.")
+        with profiling.stage("Ruptures glycemie"):
+            ruptures = bocpd.changepoints('glycemie', date_debut, date_fin)
+        #st.write("### Aperçu des données utilisées pour les graphiques :")
+        # Bouton de téléchargement
+        downloads.download_button('glycemie')
+
+
+        # --- Création des graphiques ---
+
+
+        # === GRAPHIQUE 1 : PRESSION SYSTOLIQUE ET DIASTOLIQUE ===
+
+
+        # Création de la figure avec Plotly Express. 
+
+        # Graphique partagé entre les sessions (voir figure_cache.py)
+        def build_glucose():
+            if resolution is not None:
+                with profiling.stage("Glycémie : agrégats"):
+                    fig_glycemie = rollups.figure('glycemie', ['Glycémie (mmol/L)'], resolution, date_debut, date_fin,
+                                                  title='Suivi de la Glycémie', y_label='Glycémie (mmol/L)')
+            else:
+                # Plage courte mais dense (capteur) : points bruts sous-échantillonnés (min/max)
+                df_plot = downsampling.downsample(df_glycemie, 'Date-Heure', 'Glycémie (mmol/L)', method='minmax')
+                with profiling.stage("Glycémie : figure"):
+                    fig_glycemie = px.scatter(
+                        df_plot, 
+                        x='Date-Heure', 
+                        y='Glycémie (mmol/L)', 
+                        title='Suivi de la Glycémie',
+                        labels={
+                            "Date-Heure": "Date et Heure",
+                            "Pression": "Pression (mmHg)",
+                            "Mesure": "Type de Mesure"
+                        },
+
+                    )
+            if show_trend:
+                with profiling.stage("Glycémie : LOWESS"):
+                    trendlines.add_trendline(fig_glycemie, 'glycemie', 'Glycémie (mmol/L)', start=date_debut, end=date_fin)
+            bocpd.add_markers(fig_glycemie, ruptures)
+            return fig_glycemie
+
+        cle = ('main:glycemie', storage.version('glycemie'), rollups.state_version('glycemie'),
+               bocpd.state_version('glycemie'), date_debut, date_fin,
+               show_trend, show_trend and trendlines.ready('glycemie', ['Glycémie (mmol/L)'], date_debut, date_fin))
+        fig_glycemie = figure_cache.get(cle, build_glucose, label='Glycémie')
+
+        # Affichage du premier graphique dans l'application Streamlit
+        with profiling.stage("Glycémie : affichage"):
+            chart_payload.plotly_chart(fig_glycemie, use_container_width=True)
+
+        regime_table(ruptures)
+
+
+
+    except FileNotFoundError:
+        st.error(
+            "❌ Le fichier `synthese.csv` n'a pas été trouvé. "
+            "Veuillez d'abord générer ce fichier en utilisant la page d'analyse de données."
+        )
+    except Exception as e:
+        st.error(f"Une erreur est survenue lors du chargement ou de l'affichage des données : {e}")
+    # Mesures d'un rerun limité à cette section (voir profiling.report)
+    profiling.report("main", fragment="Glycémie")
+
+
+@st.fragment
+def weight_section(date_debut, date_fin):
+    # Contrôle propre à la section : le changer ne réexécute que ce fragment
+    show_trend = st.checkbox("Courbe de tendance (LOWESS)", value=True, key="trend_poids")
+
+    # --- Chargement des données ---
+    try:
+        # On essaie de lire le fichier CSV qui contient les données synthétisées
+        # (chargement partagé et mis en cache, la colonne 'Date' est déjà convertie en date)
+        resolution = rollups.choose_resolution('poids', date_debut, date_fin)
+        if resolution is None:
+            with profiling.stage("Chargement poids"):
+                df_poids = data_loader.load_range('poids', date_debut, date_fin)
+
+        st.success("Fichier `poids.csv` chargé avec succès.")
+
+         # Bouton de téléchargement
+        downloads.download_button('poids')
+
+        # --- Création des graphiques ---
+
+
+        # Création de la figure avec Plotly Express. 
+
+        # Graphique partagé entre les sessions (voir figure_cache.py)
+        def build_weight():
+            if resolution is not None:
+                with profiling.stage("Poids : agrégats"):
+                    fig_poids = rollups.figure('poids', ['Poids_lbs'], resolution, date_debut, date_fin,
+                                               title='Suivi du poids', y_label='Poids (lbs)')
+            else:
+                with profiling.stage("Poids : figure"):
+                    fig_poids = px.scatter(
+                        df_poids, 
+                        x='Date', 
+                        y='Poids_lbs', 
+                        title='Suivi du poids',
+                        labels={
+                            "Date-Heure": "Date et Heure",
+                            "Pression": "Poids (lbs)",
+                            "Mesure": "Type de Mesure"
+                        },
+
+                    )
+            if show_trend:
+                with profiling.stage("Poids : LOWESS"):
+                    trendlines.add_trendline(fig_poids, 'poids', 'Poids_lbs', start=date_debut, end=date_fin)
+            return fig_poids
+
+        cle = ('main:poids', storage.version('poids'), rollups.state_version('poids'), date_debut, date_fin,
+               show_trend, show_trend and trendlines.ready('poids', ['Poids_lbs'], date_debut, date_fin))
+        fig_poids = figure_cache.get(cle, build_weight, label='Poids')
+
+        # Affichage du premier graphique dans l'application Streamlit
+        with profiling.stage("Poids : affichage"):
+            chart_payload.plotly_chart(fig_poids, use_container_width=True)
+
+
+
+    except FileNotFoundError:
+        st.error(
+            "❌ Le fichier `poids.csv` n'a pas été trouvé. "
+            "Veuillez d'abord générer ce fichier en utilisant la page d'analyse de données."
+        )
+    except Exception as e:
+        st.error(f"Une erreur est survenue lors du chargement ou de l'affichage des données : {e}")
+    # Mesures d'un rerun limité à cette section (voir profiling.report)
+    profiling.report("main", fragment="Poids")
 
-# --- SECTION PRESSION ---
-
-st.write("### Pression")
-
-# --- Chargement des données ---
-try:
-    # On essaie de lire le fichier CSV qui contient les données synthétisées
-    df_synthese = pd.read_csv('synthese.csv')
-    
-    # Il est crucial de convertir la colonne 'Date-Heure' en vrai format de date
-    # pour que Plotly puisse l'utiliser comme un axe temporel.
-    df_synthese['Date-Heure'] = pd.to_datetime(df_synthese['Date-Heure'])
-    
-    st.success("Fichier `synthese.csv` chargé avec succès.")
-    #st.write("### Aperçu des données utilisées pour les graphiques :")
-    #st.dataframe(df_synthese.head())
-    csv_data = df_synthese.to_csv(index=False).encode('utf-8')
-    st.download_button(label="📥 Télécharger synthese.csv", data=csv_data,
-                       file_name='synthese.csv', mime='text/csv')
-    
-   
-
-# --- Filtrage des données si une date est sélectionnée ---
-    if date_debut:
-        # Conversion en datetime pour comparaison
-        date_debut = pd.to_datetime(date_debut)
-        df_synthese = df_synthese[df_synthese['Date-Heure'] >= date_debut]
-
-    # --- Création des graphiques ---
-
-
-    # === GRAPHIQUE 1 : PRESSION SYSTOLIQUE ET DIASTOLIQUE ===
-    
-    # Pour tracer Systolique et Diastolique sur le même graphique avec des couleurs différentes,
-    # on transforme les données en format "long" avec la fonction melt de Pandas.
-    df_pressure = df_synthese.melt(
-        id_vars=['Date-Heure'], 
-        value_vars=['Systolique (mmHg)', 'Diastolique (mmHg)'],
-        var_name='Mesure', 
-        value_name='Pression'
-    )
-
-    # Création de la figure avec Plotly Express. 
-    # 'color="Mesure"' assigne automatiquement une couleur à 'Systolique' et une autre à 'Diastolique'.
-    fig_pressure = px.scatter(
-        df_pressure, 
-        x='Date-Heure', 
-        y='Pression', 
-        color='Mesure',
-        #markers=True, # Ajoute des points sur la ligne pour chaque mesure
-        trendline='lowess', # Ajoute automatiquement les courbes de tendance
-        title='Suivi de la Pression Artérielle (Systolique et Diastolique)',
-        labels={
-            "Date-Heure": "Date et Heure",
-            "Pression": "Pression (mmHg)",
-            "Mesure": "Type de Mesure"
-        },
-        color_discrete_map={
-            'Systolique (mmHg)': 'red',
-            'Diastolique (mmHg)': 'blue'
-        }
-    )
-    
-    # Affichage du premier graphique dans l'application Streamlit
-    st.plotly_chart(fig_pressure, use_container_width=True)
-
-
-
-    # ---
-
-
-    # === GRAPHIQUE 2 : POULS ===
-    
-    # Ce graphique est plus direct car il n'y a qu'une seule variable à tracer.
-    fig_pulse = px.scatter(
-        df_synthese, 
-        x='Date-Heure', 
-        y='Pouls (bpm)', 
-        #markers=True, # Ajoute des points sur la ligne
-        trendline='lowess', # Ajoute automatiquement les courbes de tendance
-        title='Suivi de la fréquence cardiaque',
-        labels={
-            "Date-Heure": "Date et Heure",
-            "Pouls (bpm)": "Pouls (battements par minute)"
-        }
-    )
-    
-    # On personnalise la couleur de la ligne pour la rendre distincte.
-    fig_pulse.update_traces(line_color='green')
-
-    # Affichage du second graphique dans l'application Streamlit
-    st.plotly_chart(fig_pulse, use_container_width=True)
-
-
-except FileNotFoundError:
-    st.error(
-        "❌ Le fichier `synthese.csv` n'a pas été trouvé. "
-        "Veuillez d'abord générer ce fichier en utilisant la page d'analyse de données."
-    )
-except Exception as e:
-    st.error(f"Une erreur est survenue lors du chargement ou de l'affichage des données : {e}")
 
+# --- SECTION PRESSION ---
+pressure_section(date_debut, date_fin)
 
 # --- SECTION GLYCÉMIE ---
+glucose_section(date_debut, date_fin)
+
+# --- SECTION POIDS ---
+weight_section(date_debut, date_fin)
 
-# --- Chargement des données ---
-try:
-    # On essaie de lire le fichier CSV qui contient les données synthétisées
-    df_glycemie = pd.read_csv('glycemie.csv')
-    
-    # Il est crucial de convertir la colonne 'Date-Heure' en vrai format de date
-    # pour que Plotly puisse l'utiliser comme un axe temporel.
-    df_glycemie['Date-Heure'] = pd.to_datetime(df_glycemie['Date-Heure'])
-    
-    st.success("Fichier `glycemie.csv` chargé avec succès.")
-    #st.write("### Aperçu des données utilisées pour les graphiques :")
-    # Bouton de téléchargement
-    csv_glyc_data = df_glycemie.to_csv(index=False).encode('utf-8')
-    st.download_button(label="📥 Télécharger glycemie.csv", data=csv_glyc_data,
-                       file_name='glycemie.csv', mime='text/csv')
-    
-    # --- Filtrage des données si une date est sélectionnée ---
-    if date_debut:
-        # Conversion en datetime pour comparaison
-        date_debut = pd.to_datetime(date_debut)
-        df_glycemie = df_glycemie[df_glycemie['Date-Heure'] >= date_debut]
-
-
-    # --- Création des graphiques ---
-
-
-    # === GRAPHIQUE 1 : PRESSION SYSTOLIQUE ET DIASTOLIQUE ===
-
-
-    # Création de la figure avec Plotly Express. 
-
-    fig_glycemie = px.scatter(
-        df_glycemie, 
-        x='Date-Heure', 
-        y='Glycémie (mmol/L)', 
-        trendline='lowess', # Ajoute automatiquement les courbes de tendance
-        title='Suivi de la Glycémie',
-        labels={
-            "Date-Heure": "Date et Heure",
-            "Pression": "Pression (mmHg)",
-            "Mesure": "Type de Mesure"
-        },
-        
-    )
-    
-    # Affichage du premier graphique dans l'application Streamlit
-    st.plotly_chart(fig_glycemie, use_container_width=True)
-
-    
-
-except FileNotFoundError:
-    st.error(
-        "❌ Le fichier `synthese.csv` n'a pas été trouvé. "
-        "Veuillez d'abord générer ce fichier en utilisant la page d'analyse de données."
-    )
-except Exception as e:
-    st.error(f"Une erreur est survenue lors du chargement ou de l'affichage des données : {e}")
-
-
-    # --- SECTION POIDS ---
-
-
-# --- Chargement des données ---
-try:
-    # On essaie de lire le fichier CSV qui contient les données synthétisées
-    df_poids = pd.read_csv('poids.csv')
-    
-    # Il est crucial de convertir la colonne 'Date' en vrai format de date
-    # pour que Plotly puisse l'utiliser comme un axe temporel.
-    df_poids['Date'] = pd.to_datetime(df_poids['Date'])
-    
-    st.success("Fichier `poids.csv` chargé avec succès.")
-
-     # Bouton de téléchargement
-    csv_poids_data = df_poids.to_csv(index=False).encode('utf-8')
-    st.download_button(label="📥 Télécharger poids.csv", data=csv_poids_data,
-                       file_name='poids.csv', mime='text/csv')
-
-    # --- Filtrage des données si une date est sélectionnée ---
-    if date_debut:
-        # Conversion en datetime pour comparaison
-        date_debut = pd.to_datetime(date_debut)
-        df_poids = df_poids[df_poids['Date'] >= date_debut]
-
-    # --- Création des graphiques ---
-
-
-    # Création de la figure avec Plotly Express. 
-
-    fig_poids = px.scatter(
-        df_poids, 
-        x='Date', 
-        y='Poids_lbs', 
-        trendline='lowess', # Ajoute automatiquement les courbes de tendance
-        title='Suivi du poids',
-        labels={
-            "Date-Heure": "Date et Heure",
-            "Pression": "Poids (lbs)",
-            "Mesure": "Type de Mesure"
-        },
-        
-    )
-    
-    # Affichage du premier graphique dans l'application Streamlit
-    st.plotly_chart(fig_poids, use_container_width=True)
-
-    
-
-except FileNotFoundError:
-    st.error(
-        "❌ Le fichier `poids.csv` n'a pas été trouvé. "
-        "Veuillez d'abord générer ce fichier en utilisant la page d'analyse de données."
-    )
-except Exception as e:
-    st.error(f"Une erreur est survenue lors du chargement ou de l'affichage des données : {e}")
 
+# --- Profilage (optionnel : ?profile=1 ou MYHEALTH_PROFILE=1) ---
+profiling.report("main")
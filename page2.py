@@ -1,65 +1,79 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
-import os
-from datetime import timedelta
+import chart_payload
+import data_loader
+import downloads
+import downsampling
+import figure_cache
+import importers
+import jobs
+import pipeline
+import storage
+import trendlines
 
 # --- Fonctions Utilitaires ---
 
-def process_and_save_data(df_processed, csv_path="blood.csv"):
+def process_and_save_data(df_processed, dataset="blood", policy="replace", key=None, reprocess=False):
     """
-    Traite et sauvegarde les données dans le fichier blood.csv.
+    Traite et sauvegarde les données dans le jeu de données blood (voir
+    pipeline.ingest). Les lignes sont fusionnées par date-heure : `policy`
+    décide du sort d'une mesure dont la date-heure existe déjà, et les mesures
+    identiques aux existantes sont ignorées. Les lignes déjà importées par un
+    export précédent sont écartées sans être traitées, sauf avec `reprocess`.
     """
-    df_processed["Date-Heure"] = pd.to_datetime(df_processed["Date-Heure"], errors='coerce')
-    df_processed.dropna(subset=["Date-Heure"], inplace=True)
-
-    if os.path.exists(csv_path):
-        df_existing = pd.read_csv(csv_path, parse_dates=["Date-Heure"])
-        df_combined = pd.concat([df_existing, df_processed], ignore_index=True)
-        df_combined.drop_duplicates(subset=["Date-Heure"], keep='last', inplace=True)
-        df_combined.sort_values(by="Date-Heure", inplace=True)
-        df_combined.to_csv(csv_path, index=False)
-        st.success(f"Données ajoutées avec succès à **{csv_path}** !")
-    else:
-        df_processed.sort_values(by="Date-Heure", inplace=True)
-        df_processed.to_csv(csv_path, index=False)
-        st.success(f"Le fichier **{csv_path}** a été créé avec vos données !")
-    
+    report = pipeline.ingest(dataset, df_processed, policy=policy, key=key, reprocess=reprocess)
+    st.success(f"**{dataset}** : {storage.format_report(report)}.")
+
+    # Les autres pages doivent relire les données mises à jour
+    data_loader.invalidate()
     st.session_state.processed = True
 
-def generate_synthesis_v2(input_path="blood.csv", output_path="synthese.csv"):
+def generate_synthesis_v2(source="blood", target="synthese", full=False):
     """
-    NOUVELLE LOGIQUE : Analyse blood.csv pour créer un fichier de synthèse.
+    NOUVELLE LOGIQUE : Analyse blood pour créer le jeu de données de synthèse.
     Identifie des groupes de mesures prises à moins de 30 minutes d'intervalle,
     puis conserve la ligne avec la valeur systolique la plus basse de chaque groupe.
-    """
-    if not os.path.exists(input_path):
-        st.error(f"Le fichier '{input_path}' est introuvable.")
-        return None
+    Par défaut, seuls les groupes touchés par les nouvelles mesures sont recalculés
+    (voir synthesis.update_synthesis) ; `full=True` recalcule tout l'historique.
 
-    df = pd.read_csv(input_path, parse_dates=["Date-Heure"])
-    if df.empty:
-        st.warning(f"Le fichier '{input_path}' est vide.")
+    Le calcul s'exécute en arrière-plan (voir jobs.py) : la tâche est mémorisée
+    dans la session, et son résultat est affiché au rerun qui suit sa fin.
+    """
+    if storage.version(source) == 0:
+        st.error(f"Le jeu de données '{source}' est introuvable.")
         return None
 
-    # S'assurer que les données sont triées par date pour que l'analyse soit correcte
-    df = df.sort_values(by="Date-Heure").reset_index(drop=True)
-
-    # Calculer la différence de temps entre une mesure et la précédente
-    time_diff = df["Date-Heure"].diff()
-
-    # Identifier le début de chaque nouveau groupe (écart > 30 mins)
-    # cumsum() crée un identifiant unique pour chaque groupe
-    group_ids = (time_diff > timedelta(minutes=30)).cumsum()
+    # Une même demande (mêmes versions des données) n'est calculée qu'une fois
+    key = (storage.version(source), storage.version(target), full)
+    jobs.submit(("synthese", source, target), key, jobs.synthesis_task, source, target, full, storage.DB_PATH,
+                label="Synthèse")
+    st.session_state.synthesis_job = (("synthese", source, target), key)
+    return synthesis_result()
 
-    # Appliquer la logique : pour chaque groupe, trouver l'index de la valeur systolique la plus basse
-    idx_to_keep = df.groupby(group_ids)['Systolique (mmHg)'].idxmin()
+def synthesis_result(target="synthese"):
+    """
+    Résultat de la synthèse lancée par cette session : None tant qu'elle est en
+    cours (un message l'indique), le jeu de synthèse une fois terminée.
+    """
+    state, updated = jobs.poll(*st.session_state.synthesis_job)
+    if state == "running":
+        st.info("⏳ Analyse en cours en arrière-plan : les résultats s'afficheront à la fin du calcul.")
+        return None
+    del st.session_state.synthesis_job
+    if state == "error":
+        st.error(f"L'analyse a échoué : {updated}")
+        return None
+    if updated is None:
+        st.info("Aucune nouvelle mesure depuis la dernière analyse : la synthèse est à jour.")
+    else:
+        st.info(f"{updated} lignes de synthèse recalculées.")
+        data_loader.invalidate()
 
-    # Créer le DataFrame de synthèse en utilisant ces index
-    df_synthese = df.loc[idx_to_keep]
+    df_synthese = data_loader.load_dataset(target) if data_loader.dataset_exists(target) else None
+    if df_synthese is None or df_synthese.empty:
+        st.warning(f"Le jeu de données '{target}' est vide.")
+        return None
 
-    df_synthese.to_csv(output_path, index=False)
-    
     return df_synthese
 
 # --- Configuration de la Page Streamlit ---
@@ -73,7 +87,8 @@ uploaded_file = st.file_uploader("Choisissez un fichier XLSX", type="xlsx")
 
 if uploaded_file is not None:
     try:
-        df_input = pd.read_excel(uploaded_file)
+        # Aperçu seulement : le fichier complet n'est lu qu'à la validation (voir importers.py)
+        df_input = importers.preview(uploaded_file)
         st.success("Fichier importé ! Voici un aperçu :")
         st.dataframe(df_input.head())
 
@@ -87,12 +102,22 @@ if uploaded_file is not None:
             col_diastolic = st.selectbox("Colonne Pression Diastolique (mmHg) :", available_columns)
             col_pulse = st.selectbox("Colonne Pouls (bpm) :", available_columns)
             col_notes = st.selectbox("Colonne Notes :", available_columns)
+            policy = st.selectbox("Mesures déjà présentes (même date-heure) :", list(storage.CONFLICT_POLICIES),
+                                  format_func=storage.CONFLICT_POLICIES.get)
+            reprocess = st.checkbox("Retraiter tout le fichier", value=False,
+                                    help="Avec « Garder » ou « Compléter », un fichier déjà importé est ignoré et "
+                                         "seules les lignes inédites d'un export cumulatif sont traitées. "
+                                         "« Remplacer » retraite toujours tout le fichier.")
             submit_button = st.form_submit_button(label="Valider et Enregistrer dans blood.csv")
 
         if submit_button:
-            df_processed = df_input[[col_datetime, col_systolic, col_diastolic, col_pulse, col_notes]].copy()
-            df_processed.columns = ["Date-Heure", "Systolique (mmHg)", "Diastolique (mmHg)", "Pouls (bpm)", "Notes"]
-            process_and_save_data(df_processed)
+            selected = [col_datetime, col_systolic, col_diastolic, col_pulse, col_notes]
+            # Un fichier déjà importé est reconnu par son empreinte, sans être relu (voir ledger.py)
+            cle = importers.ledger_key(uploaded_file, "blood", selected, policy, reprocess)
+            if cle is not None:
+                df_processed = importers.read_columns(uploaded_file, selected)[selected].copy()
+                df_processed.columns = ["Date-Heure", "Systolique (mmHg)", "Diastolique (mmHg)", "Pouls (bpm)", "Notes"]
+                process_and_save_data(df_processed, policy=policy, key=cle, reprocess=reprocess)
 
     except Exception as e:
         st.error(f"Une erreur est survenue : {e}")
@@ -101,14 +126,38 @@ if uploaded_file is not None:
 st.markdown("---")
 st.header("3. Graphique des Données Brutes (`blood.csv`)")
 
-if os.path.exists("blood.csv"):
-    df_raw = pd.read_csv("blood.csv", parse_dates=["Date-Heure"])
+if data_loader.dataset_exists("blood"):
+    df_raw = data_loader.load_dataset("blood")
     if not df_raw.empty:
-        fig_raw = px.line(df_raw, x="Date-Heure", y=["Systolique (mmHg)", "Diastolique (mmHg)", "Pouls (bpm)"],
-                          title="Évolution de Toutes les Mesures", markers=True,
-                          labels={"value": "Mesure", "Date-Heure": "Date et Heure"})
-        fig_raw.update_layout(legend_title_text='Indicateurs')
-        st.plotly_chart(fig_raw, use_container_width=True)
+        mesures = ["Systolique (mmHg)", "Diastolique (mmHg)", "Pouls (bpm)"]
+
+        # Période affichée : le sous-échantillonnage s'adapte à cette plage
+        debut, fin = df_raw["Date-Heure"].min().to_pydatetime(), df_raw["Date-Heure"].max().to_pydatetime()
+        if debut < fin:
+            periode = st.slider("Période affichée", min_value=debut, max_value=fin,
+                                value=(debut, fin), format="YYYY-MM-DD", key="raw_period")
+            df_raw = data_loader.slice_range(df_raw, "Date-Heure", *periode)
+        show_all = st.checkbox("Afficher toutes les mesures (sans sous-échantillonnage)", key="raw_show_all")
+
+        def build_raw():
+            # Seuls les points visuellement utiles sont envoyés au navigateur
+            df_plot = df_raw if show_all else downsampling.downsample(df_raw, "Date-Heure", mesures)
+            fig_raw = px.line(df_plot, x="Date-Heure", y=mesures,
+                              title="Évolution de Toutes les Mesures", markers=True,
+                              labels={"value": "Mesure", "Date-Heure": "Date et Heure"},
+                              render_mode=downsampling.render_mode(len(df_plot)))
+            # Nombre de points affichés, gardé avec le graphique pour la légende ci-dessous
+            fig_raw.update_layout(legend_title_text='Indicateurs', meta={"points": len(df_plot)})
+            return fig_raw
+
+        # Graphique partagé entre les sessions (voir figure_cache.py)
+        cle = ("page2:brutes", storage.version("blood"), df_raw["Date-Heure"].iloc[0], df_raw["Date-Heure"].iloc[-1],
+               show_all)
+        fig_raw = figure_cache.get(cle, build_raw, label="Mesures brutes")
+        chart_payload.plotly_chart(fig_raw, use_container_width=True)
+        affiches = fig_raw.layout.meta["points"]
+        if affiches < len(df_raw):
+            st.caption(f"{affiches} points affichés sur {len(df_raw)} mesures.")
     else:
         st.info("Le fichier `blood.csv` est vide.")
 else:
@@ -123,17 +172,22 @@ et pour chaque groupe, il ne conservera que la mesure avec la **pression systoli
 Le résultat sera sauvegardé dans `synthese.csv` et un nouveau graphique sera affiché.
 """)
 
-if os.path.exists("blood.csv"):
+if data_loader.dataset_exists("blood"):
+    full_synthesis = st.checkbox("Recalculer toute la synthèse", value=False,
+                                 help="Par défaut, seuls les groupes touchés par les nouvelles mesures sont recalculés.")
+    df_synthese = None
     if st.button("Lancer l'analyse et créer synthese.csv"):
-        with st.spinner("Analyse en cours..."):
-            # Utilisation de la nouvelle fonction
-            df_synthese = generate_synthesis_v2() 
-            
-            if df_synthese is not None:
-                st.success("Fichier `synthese.csv` généré avec succès !")
-                
-                # Sauvegarder les données dans la session pour les réafficher sans recalculer
-                st.session_state.df_synthese = df_synthese 
+        # Utilisation de la nouvelle fonction (calcul en arrière-plan, sans bloquer la page)
+        df_synthese = generate_synthesis_v2(full=full_synthesis)
+    elif "synthesis_job" in st.session_state:
+        # Analyse lancée à un rerun précédent : affichage du résultat dès qu'il est prêt
+        df_synthese = synthesis_result()
+
+    if df_synthese is not None:
+        st.success("Fichier `synthese.csv` généré avec succès !")
+
+        # Sauvegarder les données dans la session pour les réafficher sans recalculer
+        st.session_state.df_synthese = df_synthese 
                 
 # Afficher les résultats si la synthèse a été générée
 if 'df_synthese' in st.session_state:
@@ -143,9 +197,7 @@ if 'df_synthese' in st.session_state:
     st.dataframe(df_synthese)
     
     # Bouton de téléchargement
-    csv_data = df_synthese.to_csv(index=False).encode('utf-8')
-    st.download_button(label="📥 Télécharger synthese.csv", data=csv_data,
-                       file_name='synthese.csv', mime='text/csv')
+    downloads.download_button("synthese")
 
     #  # --- NOUVEAU GRAPHIQUE DE SYNTHESE ---
     # st.subheader("Graphique des Données de Synthèse")
@@ -155,45 +207,62 @@ if 'df_synthese' in st.session_state:
     # fig_synth.update_layout(legend_title_text='Indicateurs')
     # st.plotly_chart(fig_synth, use_container_width=True)
 
+    # Graphiques partagés entre les sessions (voir figure_cache.py), construits une fois par
+    # version de la synthèse (comme les courbes de tendance) à partir du jeu de données
+    # partagé de cette version, et non de la copie gardée dans la session.
+    version = storage.version("synthese")
+
     # === GRAPHIQUE 1 : PRESSION SYSTOLIQUE ET DIASTOLIQUE ===
-        
-    # Pour tracer plusieurs lignes (systolique, diastolique) avec Plotly Express,
-    # il est plus simple de "réorganiser" les données d'un format large à un format long.
-    df_pressure = df_synthese.melt(id_vars=['Date-Heure'], 
-                            value_vars=['Systolique (mmHg)', 'Diastolique (mmHg)'],
-                            var_name='Mesure', 
-                            value_name='Pression')
-
-    # Création du graphique de pression
-    fig_pressure = px.scatter(df_pressure, 
-                                x='Date-Heure', 
-                                y='Pression', 
-                                color='Mesure', # Crée une couleur par mesure (Systolique/Diastolique)
-                                title='Pression Artérielle avec Courbes de Tendance',
-                                labels={'Date-Heure': 'Date et Heure', 'Pression': 'Pression (mmHg)'},
-                                trendline='lowess', # Ajoute automatiquement les courbes de tendance
-                                color_discrete_map={ # Personnaliser les couleurs
-                                    'Systolique (mmHg)': 'red',
-                                    'Diastolique (mmHg)': 'blue'
-                                },
-                                trendline_color_override="pink" # Optionnel: pour que la ligne soit bien visible
-                                )
-                                
-
-    st.plotly_chart(fig_pressure, use_container_width=True)
+
+    def build_pressure():
+        # Pour tracer plusieurs lignes (systolique, diastolique) avec Plotly Express,
+        # il est plus simple de "réorganiser" les données d'un format large à un format long.
+        df_pressure = data_loader.load_dataset("synthese").melt(id_vars=['Date-Heure'], 
+                                value_vars=['Systolique (mmHg)', 'Diastolique (mmHg)'],
+                                var_name='Mesure', 
+                                value_name='Pression')
+
+        # Création du graphique de pression
+        fig_pressure = px.scatter(df_pressure, 
+                                    x='Date-Heure', 
+                                    y='Pression', 
+                                    color='Mesure', # Crée une couleur par mesure (Systolique/Diastolique)
+                                    title='Pression Artérielle avec Courbes de Tendance',
+                                    labels={'Date-Heure': 'Date et Heure', 'Pression': 'Pression (mmHg)'},
+                                    color_discrete_map={ # Personnaliser les couleurs
+                                        'Systolique (mmHg)': 'red',
+                                        'Diastolique (mmHg)': 'blue'
+                                    },
+                                    )
+
+        # Courbes de tendance précalculées et mises en cache (voir trendlines.py)
+        for mesure in ['Systolique (mmHg)', 'Diastolique (mmHg)']:
+            trendlines.add_trendline(fig_pressure, 'synthese', mesure, color="pink")
+        return fig_pressure
+
+    cle = ("page2:pression", version,
+           trendlines.ready('synthese', ['Systolique (mmHg)', 'Diastolique (mmHg)']))
+    fig_pressure = figure_cache.get(cle, build_pressure, label="Pression (synthèse)")
+
+    chart_payload.plotly_chart(fig_pressure, use_container_width=True)
 
 
     # === GRAPHIQUE 2 : POULS ===
 
-    # La création du graphique du pouls est directe
-    fig_pulse = px.scatter(df_synthese, 
-                            x='Date-Heure', 
-                            y='Pouls (bpm)', 
-                            title='Pouls avec Courbe de Tendance',
-                            labels={'Date-Heure': 'Date et Heure', 'Pouls (bpm)': 'Pouls (bpm)'},
-                            trendline='lowess') # Ajoute la courbe de tendance
+    def build_pulse():
+        # La création du graphique du pouls est directe
+        fig_pulse = px.scatter(data_loader.load_dataset("synthese"), 
+                                x='Date-Heure', 
+                                y='Pouls (bpm)', 
+                                title='Pouls avec Courbe de Tendance',
+                                labels={'Date-Heure': 'Date et Heure', 'Pouls (bpm)': 'Pouls (bpm)'})
+        trendlines.add_trendline(fig_pulse, 'synthese', 'Pouls (bpm)') # Ajoute la courbe de tendance
+
+        # Pour une meilleure lisibilité, on peut changer la couleur
+        fig_pulse.update_traces(marker=dict(color='green'))
+        return fig_pulse
 
-    # Pour une meilleure lisibilité, on peut changer la couleur
-    fig_pulse.update_traces(marker=dict(color='green'))
+    cle = ("page2:pouls", version, trendlines.ready('synthese', ['Pouls (bpm)']))
+    fig_pulse = figure_cache.get(cle, build_pulse, label="Pouls (synthèse)")
 
-    st.plotly_chart(fig_pulse, use_container_width=True)
+    chart_payload.plotly_chart(fig_pulse, use_container_width=True)
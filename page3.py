@@ -1,7 +1,16 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-import os
+import plotly.graph_objects as go
+import cgm
+import chart_payload
+import data_loader
+import downsampling
+import figure_cache
+import importers
+import pipeline
+import storage
+import trendlines
 
 # --- Configuration de la Page Streamlit ---
 st.set_page_config(page_title="Suivi de Glycémie", layout="wide")
@@ -21,7 +30,8 @@ uploaded_file = st.file_uploader(
 
 if uploaded_file is not None:
     try:
-        df_input = pd.read_csv(uploaded_file, dtype=str).fillna('')
+        # Aperçu seulement : le fichier complet n'est lu qu'à la validation (voir importers.py)
+        df_input = importers.preview(uploaded_file, dtype=str).fillna('')
         st.success("Fichier importé avec succès ! Voici un aperçu :")
         st.dataframe(df_input.head())
 
@@ -36,54 +46,35 @@ if uploaded_file is not None:
             col_glucose = st.selectbox("Colonne pour la Glycémie (mmol/L) :", available_columns)
             col_note1 = st.selectbox("Colonne pour la Note 1 :", available_columns)
             col_note2 = st.selectbox("Colonne pour la Note 2 :", available_columns)
+            policy = st.selectbox("Mesures déjà présentes (même date-heure) :", list(storage.CONFLICT_POLICIES),
+                                  format_func=storage.CONFLICT_POLICIES.get)
+            reprocess = st.checkbox("Retraiter tout le fichier", value=False,
+                                    help="Avec « Garder » ou « Compléter », un fichier déjà importé est ignoré et "
+                                         "seules les lignes inédites d'un export cumulatif sont traitées. "
+                                         "« Remplacer » retraite toujours tout le fichier.")
             submit_button = st.form_submit_button(label="Valider et Enregistrer les Données")
 
         if submit_button:
-            df_processed = df_input[[col_datetime, col_glucose, col_note1, col_note2]].copy()
-            df_processed.columns = ["Date-Heure", "Glycémie (mmol/L)", "Note-1", "Note-2"]
-
-            # --- MODIFICATION CLÉ : Remplacement manuel des noms de mois ---
-            
-            # 1. Définir les correspondances pour les mois
-            month_map = {
-                "janv.": "01", "févr.": "02", "mars": "03", "avr.": "04",
-                "mai": "05", "juin": "06", "juill.'": "07", "juill.": "07",
-                "août": "08", "sept.": "09", "oct.": "10", "nov.": "11", "déc.": "12"
-            }
-
-            # 2. Remplacer chaque abréviation de mois par son numéro
-            # On s'assure que la colonne est bien une chaîne de caractères pour utiliser .replace
-            date_series = df_processed["Date-Heure"].astype(str)
-            for month_str, month_num in month_map.items():
-                date_series = date_series.str.replace(month_str, month_num, regex=False)
-
-            # 3. Définir le nouveau format de date qui attend un numéro de mois (%m)
-            date_format_string = "%d %m %Y, %H h %M"
-
-            # 4. Convertir la colonne en datetime avec le format correct
-            df_processed["Date-Heure"] = pd.to_datetime(
-                date_series,
-                format=date_format_string,
-                errors='coerce'
-            )
-            # --- FIN DE LA MODIFICATION ---
-
-            df_processed.dropna(subset=["Date-Heure"], inplace=True)
-            
-            csv_path = "glycemie.csv"
-            if os.path.exists(csv_path):
-                df_existing = pd.read_csv(csv_path, parse_dates=["Date-Heure"])
-                df_combined = pd.concat([df_existing, df_processed], ignore_index=True)
-                df_combined.drop_duplicates(subset=["Date-Heure"], keep='last', inplace=True)
-                df_combined.sort_values(by="Date-Heure", inplace=True)
-                df_combined.to_csv(csv_path, index=False)
-                st.success(f"Données ajoutées avec succès au fichier **{csv_path}** !")
-            else:
-                df_processed.sort_values(by="Date-Heure", inplace=True)
-                df_processed.to_csv(csv_path, index=False)
-                st.success(f"Le fichier **{csv_path}** a été créé avec vos données !")
-            
-            st.session_state.processed = True
+            selected = [col_datetime, col_glucose, col_note1, col_note2]
+            # Un fichier déjà importé est reconnu par son empreinte, sans être relu (voir ledger.py)
+            cle = importers.ledger_key(uploaded_file, "glycemie", selected, policy, reprocess)
+            if cle is not None:
+                df_processed = importers.read_columns(uploaded_file, selected, dtype=str)[selected]
+                df_processed.columns = ["Date-Heure", "Glycémie (mmol/L)", "Note-1", "Note-2"]
+
+                # Conversion des dates au format `J MMM AAAA, HH "h" MM` en une passe vectorisée,
+                # puis fusion par date-heure : seules les mesures nouvelles ou modifiées sont écrites
+                # (voir pipeline.py). Dans un export cumulatif, seules les lignes inédites sont traitées.
+                report = pipeline.ingest("glycemie", df_processed, policy=policy, key=cle, reprocess=reprocess)
+                st.success(f"**glycemie** : {storage.format_report(report)}.")
+
+                # Agrégats par jour/semaine/mois et sommes horaires des périodes touchées
+                # (voir rollups.py et cgm.py)
+                pipeline.update_derived("glycemie")
+
+                # Les autres pages doivent relire les données mises à jour
+                data_loader.invalidate()
+                st.session_state.processed = True
 
     except Exception as e:
         st.error(f"Une erreur est survenue lors du traitement : {e}")
@@ -93,32 +84,61 @@ if uploaded_file is not None:
 st.markdown("---")
 st.header("3. Graphique de suivi de la glycémie")
 
-if os.path.exists("glycemie.csv"):
+if data_loader.dataset_exists("glycemie"):
     try:
-        df_final = pd.read_csv("glycemie.csv", parse_dates=["Date-Heure"])
+        df_final = data_loader.load_dataset("glycemie")
         if not df_final.empty and len(df_final) > 1: # Il faut au moins 2 points pour une tendance
             st.write("Graphique de la glycémie en fonction du temps, avec sa courbe de tendance.")
-            
-            # --- MODIFICATION CLÉ : Ajout de la courbe de tendance ---
-            fig = px.scatter(
-                df_final,
-                x="Date-Heure",
-                y="Glycémie (mmol/L)",
-                title="Évolution de la Glycémie avec Courbe de Tendance",
-                labels={"Date-Heure": "Date et Heure"},
-                trendline="lowess", # Ajoute une ligne de tendance (régression linéaire)
-                trendline_color_override="red" # Optionnel: pour que la ligne soit bien visible
-            )
-            
-            # On ajoute la ligne des points pour ne pas perdre la vue détaillée
-            fig.add_scatter(
-                x=df_final["Date-Heure"],
-                y=df_final["Glycémie (mmol/L)"],
-                mode='lines+markers',
-                name='Mesures'
-            )
-            
-            st.plotly_chart(fig, use_container_width=True)
+
+            # Période affichée : le sous-échantillonnage s'adapte à cette plage
+            debut, fin = df_final["Date-Heure"].min().to_pydatetime(), df_final["Date-Heure"].max().to_pydatetime()
+            periode = (debut, fin)
+            if debut < fin:
+                periode = st.slider("Période affichée", min_value=debut, max_value=fin,
+                                    value=(debut, fin), format="YYYY-MM-DD", key="glucose_period")
+            df_visible = data_loader.slice_range(df_final, "Date-Heure", *periode)
+            show_all = st.checkbox("Afficher toutes les mesures (sans sous-échantillonnage)", key="glucose_show_all")
+
+            def build_figure():
+                # Min/max par intervalle : les hypo- et hyperglycémies restent visibles
+                df_plot = df_visible if show_all else downsampling.downsample(
+                    df_visible, "Date-Heure", "Glycémie (mmol/L)", method="minmax")
+                webgl = downsampling.use_webgl(len(df_plot))
+
+                # --- MODIFICATION CLÉ : Ajout de la courbe de tendance ---
+                fig = px.scatter(
+                    df_plot,
+                    x="Date-Heure",
+                    y="Glycémie (mmol/L)",
+                    title="Évolution de la Glycémie avec Courbe de Tendance",
+                    labels={"Date-Heure": "Date et Heure"},
+                    render_mode=downsampling.render_mode(len(df_plot)),
+                )
+                # Courbe de tendance précalculée et mise en cache (voir trendlines.py)
+                trendlines.add_trendline(fig, "glycemie", "Glycémie (mmol/L)",
+                                         start=periode[0], end=periode[1], color="red")
+
+                # On ajoute la ligne des points pour ne pas perdre la vue détaillée
+                trace = go.Scattergl if webgl else go.Scatter
+                fig.add_trace(trace(
+                    x=df_plot["Date-Heure"],
+                    y=df_plot["Glycémie (mmol/L)"],
+                    mode='lines+markers',
+                    name='Mesures'
+                ))
+                # Nombre de points affichés, gardé avec le graphique pour la légende ci-dessous
+                fig.update_layout(meta={"points": len(df_plot)})
+                return fig
+
+            # Graphique partagé entre les sessions (voir figure_cache.py) : construit une fois
+            # par version des données, période et état de la courbe de tendance
+            cle = ("page3:glycemie", storage.version("glycemie"), periode, show_all,
+                   trendlines.ready("glycemie", ["Glycémie (mmol/L)"], start=periode[0], end=periode[1]))
+            fig = figure_cache.get(cle, build_figure, label="Glycémie")
+            chart_payload.plotly_chart(fig, use_container_width=True)
+            affiches = fig.layout.meta["points"]
+            if affiches < len(df_visible):
+                st.caption(f"{affiches} points affichés sur {len(df_visible)} mesures.")
             
             with st.expander("Afficher les données enregistrées dans glycemie.csv"):
                 st.dataframe(df_final)
@@ -130,4 +150,53 @@ if os.path.exists("glycemie.csv"):
     except Exception as e:
         st.error(f"Impossible d'afficher le graphique. Erreur : {e}")
 else:
-    st.info("Veuillez importer un fichier pour afficher le graphique.")
\ No newline at end of file
+    st.info("Veuillez importer un fichier pour afficher le graphique.")
+
+# --- Section 4: Indicateurs CGM ---
+st.markdown("---")
+st.header("4. Indicateurs de glycémie en continu (CGM)")
+
+if data_loader.dataset_exists("glycemie"):
+    # Indicateurs calculés sur les sommes horaires (voir cgm.py) : leur coût ne
+    # dépend pas du nombre de mesures, même sur plusieurs années de capteur.
+    periodes = {"14 derniers jours": 14, "30 derniers jours": 30, "90 derniers jours": 90,
+                "Tout l'historique": None}
+    choix = st.selectbox("Période analysée", list(periodes), key="cgm_period")
+    first, last = data_loader.time_bounds("glycemie")
+    debut = last - pd.Timedelta(days=periodes[choix]) if periodes[choix] else first
+
+    resume = cgm.summary(debut, last)
+    if resume is None:
+        st.info("Aucune mesure sur cette période.")
+    else:
+        col_tir, col_moy, col_gmi, col_cv = st.columns(4)
+        col_tir.metric(f"Temps dans la cible ({cgm.RANGES['Dans la cible']})", f"{resume['Plages']['Dans la cible']:.0f} %",
+                       help="Objectif : plus de 70 %.")
+        col_moy.metric("Glycémie moyenne", f"{resume['Moyenne']:.1f} mmol/L")
+        col_gmi.metric("GMI", f"{resume['GMI']:.1f} %", help="Indicateur de gestion du glucose (HbA1c estimée).")
+        col_cv.metric("Coefficient de variation", f"{resume['CV']:.0f} %", help="Glycémie stable : 36 % ou moins.")
+        st.caption(f"{resume['Mesures']} mesures, temps de capture {resume['Temps de capture']:.0f} %.")
+
+        # Temps passé dans chaque plage, en une barre empilée
+        fig_plages = go.Figure()
+        for plage, pourcentage in resume["Plages"].items():
+            fig_plages.add_trace(go.Bar(y=["Temps"], x=[pourcentage], orientation="h",
+                                        name=f"{plage} ({cgm.RANGES[plage]}) : {pourcentage:.1f} %",
+                                        marker_color=cgm.RANGE_COLORS[plage]))
+        fig_plages.update_layout(barmode="stack", height=220, title="Temps dans les plages",
+                                 xaxis=dict(range=[0, 100], title="%"), yaxis=dict(visible=False))
+        chart_payload.plotly_chart(fig_plages, use_container_width=True)
+
+        # Moyennes glissantes (une valeur par heure, sous-échantillonnées pour l'affichage)
+        moyennes = cgm.rolling_means(debut, last)
+        fenetres = list(cgm.ROLLING_WINDOWS)
+        moyennes_plot = downsampling.downsample(moyennes, "Heure", fenetres)
+        fig_moyennes = px.line(moyennes_plot, x="Heure", y=fenetres, title="Moyennes glissantes",
+                               labels={"value": "Glycémie (mmol/L)", "variable": "Fenêtre"},
+                               render_mode=downsampling.render_mode(len(moyennes_plot)))
+        chart_payload.plotly_chart(fig_moyennes, use_container_width=True)
+
+        # Profil ambulatoire de glucose sur les 14 derniers jours de la période
+        debut_agp = max(debut, last - pd.Timedelta(days=14))
+        chart_payload.plotly_chart(cgm.agp_figure(cgm.agp(debut_agp, last)), use_container_width=True)
+        st.caption(f"AGP du {debut_agp:%d/%m/%Y} au {last:%d/%m/%Y}.")
@@ -1,10 +1,14 @@
 import streamlit as st
 import pandas as pd
-import os
 import plotly.express as px
-import numpy as np
 from datetime import datetime
-import ruptures as rpt  # <-- pour la détection des ruptures
+import changepoints  # <-- pour la détection des ruptures
+import chart_payload
+import data_loader
+import importers
+import pipeline
+import profiling
+import storage
 
 st.title("📊 Suivi du Poids")
 
@@ -12,11 +16,8 @@ st.title("📊 Suivi du Poids")
 uploaded_file = st.file_uploader("📂 Importer un fichier CSV ou Excel", type=["csv", "xlsx"])
 
 if uploaded_file:
-    # Lire fichier
-    if uploaded_file.name.endswith(".csv"):
-        df = pd.read_csv(uploaded_file)
-    else:
-        df = pd.read_excel(uploaded_file)
+    # Aperçu seulement : le fichier complet n'est lu qu'à l'ajout (voir importers.py)
+    df = importers.preview(uploaded_file)
 
     st.write("Aperçu des données importées :")
     st.dataframe(df.head())
@@ -25,61 +26,90 @@ if uploaded_file:
     col_date = st.selectbox("📅 Sélectionner la colonne Date-Heure", df.columns)
     col_kg = st.selectbox("⚖️ Sélectionner la colonne Poids (kg)", df.columns)
     col_lbs = st.selectbox("⚖️ Sélectionner la colonne Poids (lbs)", df.columns)
+    policy = st.selectbox("Mesures déjà présentes (même date) :", list(storage.CONFLICT_POLICIES),
+                          format_func=storage.CONFLICT_POLICIES.get)
+    reprocess = st.checkbox("Retraiter tout le fichier", value=False,
+                            help="Avec « Garder » ou « Compléter », un fichier déjà importé est ignoré et "
+                                 "seules les lignes inédites d'un export cumulatif sont traitées. "
+                                 "« Remplacer » retraite toujours tout le fichier.")
 
     if st.button("✅ Ajouter au fichier poids.csv"):
-        new_data = df[[col_date, col_kg, col_lbs]].copy()
-        new_data[col_date] = pd.to_datetime(new_data[col_date], errors="coerce")
-        new_data = new_data.dropna()
+        selected = [col_date, col_kg, col_lbs]
+        # Un fichier déjà importé est reconnu par son empreinte, sans être relu (voir ledger.py)
+        cle = importers.ledger_key(uploaded_file, "poids", selected, policy, reprocess)
+        if cle is not None:
+            new_data = importers.read_columns(uploaded_file, selected)[selected].copy()
+
+            # Renommer les colonnes
+            new_data.columns = ["Date", "Poids_kg", "Poids_lbs"]
+
+            # Conversion des dates et fusion par date (voir pipeline.ingest) : une mesure
+            # réimportée avec un autre formatage des décimales n'est pas un doublon, et
+            # seules les lignes nouvelles ou modifiées sont écrites
+            report = pipeline.ingest("poids", new_data, policy=policy, key=cle, reprocess=reprocess)
+            pipeline.update_derived("poids")  # agrégats des périodes touchées
+            data_loader.invalidate()
+            st.success(f"✅ poids : {storage.format_report(report)}")
 
-        # Renommer les colonnes
-        new_data.columns = ["Date", "Poids_kg", "Poids_lbs"]
+# --- Graphique ---
 
-        # Ajouter au fichier existant ou créer
-        if os.path.exists("poids.csv"):
-            existing = pd.read_csv("poids.csv", parse_dates=["Date"])
-            combined = pd.concat([existing, new_data]).drop_duplicates().sort_values("Date")
-        else:
-            combined = new_data
+@st.cache_data(show_spinner=False, max_entries=16)
+def base_figure(version, y_col, unit, start, end):
+    """Nuage de points et droite OLS du poids sur [start, end], pour une version des données."""
+    data = data_loader.load_range("poids", start, end)
+    return px.scatter(data, x="Date", y=y_col, title=f"Évolution du poids ({unit})", trendline="ols")
 
-        combined.to_csv("poids.csv", index=False)
-        st.success("✅ Données mises à jour dans poids.csv")
-
-# --- Graphique ---
-if os.path.exists("poids.csv"):
-    data = pd.read_csv("poids.csv", parse_dates=["Date"]).sort_values("Date")
 
+# Le graphique et ses contrôles (unité, période, sensibilité, étiquette) forment un
+# fragment : les modifier ne réexécute que le graphique, pas l'importation au-dessus.
+@st.fragment
+def weight_chart():
     unit = st.radio("Unité d'affichage :", ["kg", "lbs"])
     y_col = "Poids_kg" if unit == "kg" else "Poids_lbs"
 
-    # --- Sélection date de début ---
-    min_date = data["Date"].min().date()
-    max_date = data["Date"].max().date()
-    start_date = st.date_input("📅 Date de début du graphique", value=min_date, min_value=min_date, max_value=max_date)
+    # --- Sélection de la période ---
+    # Les bornes sont lues aux extrémités de l'index, sans charger l'historique
+    first, last = data_loader.time_bounds("poids")
+    min_date, max_date = first.date(), last.date()
+    col_start, col_end = st.columns(2)
+    start_date = col_start.date_input("📅 Date de début du graphique", value=min_date, min_value=min_date, max_value=max_date)
+    end_date = col_end.date_input("📅 Date de fin du graphique", value=max_date, min_value=min_date, max_value=max_date)
+    start, end = data_loader.day_bounds(min(start_date, end_date), max(start_date, end_date))
 
-    # Filtrer les données à partir de la date choisie
-    data = data[data["Date"] >= pd.to_datetime(start_date)]
+    # Seule la période choisie est lue dans la base (déjà triée par date)
+    with profiling.stage("Chargement poids"):
+        data = data_loader.load_range("poids", start, end)
 
-    # Graphique principal
-    fig = px.scatter(data, x="Date", y=y_col, title=f"Évolution du poids ({unit})", trendline="ols")
+    # Graphique principal (droite OLS comprise), mis en cache par version et par période :
+    # les autres contrôles du graphique ne le reconstruisent pas
+    with profiling.stage("Figure (OLS)"):
+        fig = base_figure(storage.version("poids"), y_col, unit, start, end)  # copie propre à ce rerun
 
     # --- Détection des ruptures avec ruptures ---
     signal = data[y_col].values
 
     if len(signal) > 5:  # éviter erreur si trop peu de points
-        pen = st.slider("Sensibilité détection de tendance (pen)", 1, 20, 5)
-        model = rpt.Pelt(model="rbf").fit(signal)
-        breakpoints = model.predict(pen=pen)
-
-        # Ajouter segments de tendance
-        for i in range(len(breakpoints)-1):
-            start, end = (0 if i == 0 else breakpoints[i-1]), breakpoints[i]
-            seg_x = data["Date"].iloc[start:end]
-            seg_y = data[y_col].iloc[start:end]
+        pen = st.slider("Sensibilité détection de tendance (pen)", changepoints.PENALTIES[0], changepoints.PENALTIES[-1], 5)
+        cost_model = st.selectbox("Modèle de détection", list(changepoints.MODELS), format_func=changepoints.MODELS.get)
+        daily = st.checkbox("Utiliser la moyenne quotidienne (longs historiques)")
+
+        # Ruptures calculées une seule fois pour toutes les valeurs de pen, puis mises en cache :
+        # le curseur ne fait plus qu'une lecture. Les droites de tous les segments sont
+        # ajustées en une passe et tracées dans une seule trace.
+        with profiling.stage("Ruptures (Pelt) et tendances"):
+            trend = changepoints.piecewise_trend(
+                "poids", y_col, pen, start=start, end=end, model=cost_model, daily=daily)
+        # La détection s'exécute en arrière-plan (voir jobs.py) : le graphique s'affiche
+        # sans attendre, et les tendances apparaissent dès que le calcul est terminé.
+        if trend is None:
+            st.info("⏳ Détection des ruptures en cours...")
+        else:
+            segments, trend_x, trend_y = trend
+            fig.add_scatter(x=trend_x, y=trend_y, mode="lines", name="Tendances par segment",
+                            connectgaps=False)
 
-            if len(seg_x) > 1:
-                coef = np.polyfit(range(len(seg_x)), seg_y, 1)
-                trend_line = np.poly1d(coef)(range(len(seg_x)))
-                fig.add_scatter(x=seg_x, y=trend_line, mode="lines", name=f"Tendance {i+1}")
+            with st.expander("Afficher les tendances par segment"):
+                st.dataframe(segments.rename(columns={"Pente (/semaine)": f"Pente ({unit}/semaine)"}))
 
     # --- Ajouter des étiquettes personnalisées ---
     st.subheader("📝 Ajouter une étiquette")
@@ -97,4 +127,15 @@ if os.path.exists("poids.csv"):
             ay=-40
         )
 
-    st.plotly_chart(fig, use_container_width=True)
+    with profiling.stage("Affichage"):
+        chart_payload.plotly_chart(fig, use_container_width=True)
+
+    # Mesures d'un rerun limité au graphique (voir profiling.report)
+    profiling.report("poids", fragment="Graphique")
+
+
+if data_loader.dataset_exists("poids"):
+    weight_chart()
+
+# --- Profilage (optionnel : ?profile=1 ou MYHEALTH_PROFILE=1) ---
+profiling.report("poids")
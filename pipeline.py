@@ -0,0 +1,374 @@
+"""
+Chaîne de traitement sans interface : importation des exports, synthèse,
+agrégats et indicateurs CGM. Les pages Streamlit l'utilisent pour un fichier
+à la fois ; la ligne de commande traite tout un répertoire d'exports, en
+parallèle sur tous les cœurs :
+
+    python -m pipeline exports/ --workers 8
+
+Les colonnes des exports d'appareils, qui ne portent pas les noms du stockage,
+sont associées comme dans le formulaire des pages, avec un fichier JSON (voir
+load_columns) :
+
+    python -m pipeline exports/ --columns colonnes.json
+
+Relancer la commande sur les mêmes fichiers ne modifie rien : les mesures
+identiques aux mesures enregistrées sont ignorées (voir storage.upsert) et les
+données dérivées ne sont recalculées que pour les périodes touchées. Avec les
+politiques "keep" et "fill", un fichier déjà importé est de plus reconnu sans
+être relu, et seules les lignes inédites d'un export cumulatif sont traitées
+(voir ledger.py).
+"""
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import pandas as pd
+
+import bocpd
+import cgm
+import date_parsing
+import ledger
+import rollups
+import storage
+import synthesis
+
+# --- Préparation des exports ---
+# Chaque source convertit ses dates et écarte les lignes inutilisables, avant la
+# fusion dans le stockage.
+
+def prepare_blood(df):
+    """Export du tensiomètre : dates dans un format reconnu par pandas (ou français)."""
+    df = df.copy()
+    df["Date-Heure"] = date_parsing.parse_datetimes(df["Date-Heure"])
+    return df.dropna(subset=["Date-Heure"])
+
+
+def prepare_glucose(df):
+    """Export du lecteur de glycémie : tout en texte, dates au format `J MMM AAAA, HH "h" MM`."""
+    df = df.fillna("")
+    df["Date-Heure"] = date_parsing.parse_french_datetimes(df["Date-Heure"])
+    return df.dropna(subset=["Date-Heure"])
+
+
+def prepare_weight(df):
+    """Export de la balance : une pesée sans date ou sans poids n'est pas gardée."""
+    df = df.copy()
+    df["Date"] = date_parsing.parse_datetimes(df["Date"])
+    return df.dropna()
+
+
+PREPARE = {
+    "blood": prepare_blood,
+    "glycemie": prepare_glucose,
+    "poids": prepare_weight,
+}
+
+# Extensions des fichiers d'export reconnus
+EXTENSIONS = (".csv", ".xlsx")
+
+
+def detect_dataset(columns):
+    """
+    Jeu de données d'un export d'après ses colonnes : la colonne de date et
+    toutes les colonnes de mesure (les notes sont facultatives). None si aucun.
+    """
+    columns = set(columns)
+    for name in PREPARE:
+        dataset = storage.DATASETS[name]
+        required = {dataset["time_col"]} | {col for col, sql_type in dataset["columns"].items() if sql_type != "TEXT"}
+        if required <= columns:
+            return name
+    return None
+
+
+def load_columns(path):
+    """
+    Lit un fichier d'association des colonnes (JSON), comme le formulaire des
+    pages : pour chaque jeu de données, la colonne de l'export associée à
+    chaque colonne du stockage.
+
+        {"glycemie": {"Date-Heure": "Horodatage", "Glycémie (mmol/L)": "Glucose",
+                      "Note-1": "Repas", "Note-2": "Notes"}}
+    """
+    with open(path, encoding="utf-8") as f:
+        columns = json.load(f)
+    for name, mapping in columns.items():
+        if name not in PREPARE:
+            raise ValueError(f"jeu de données inconnu dans {path} : {name}")
+        unknown = set(mapping) - {storage.DATASETS[name]["time_col"], *storage.DATASETS[name]["columns"]}
+        if unknown:
+            raise ValueError(f"colonnes inconnues pour {name} dans {path} : {', '.join(sorted(unknown))}")
+    return columns
+
+
+def map_columns(df, columns, dataset=None):
+    """
+    Renomme les colonnes d'un export d'après `columns` (voir load_columns), pour
+    `dataset` ou, s'il n'est pas donné, pour le premier jeu de données dont
+    toutes les colonnes associées sont présentes. Retourne (jeu de données ou
+    None, colonnes renommées) ; un export sans association est retourné tel quel.
+    """
+    present = set(map(str, df.columns))
+    for name in ([dataset] if dataset else columns):
+        mapping = columns.get(name)
+        if mapping and set(mapping.values()) <= present:
+            # Une même colonne de l'export peut être associée à plusieurs colonnes du stockage
+            df = df.rename(columns=str)
+            return name, pd.DataFrame({target: df[source] for target, source in mapping.items()})
+    return dataset, df
+
+
+def read_export(path, dataset=None, columns=None):
+    """
+    Lit un fichier d'export (CSV ou XLSX). Retourne (jeu de données, colonnes du
+    stockage en valeurs brutes, avant préparation). Les CSV sont lus en texte :
+    les mesures sont converties à l'écriture, selon le type de chaque colonne.
+    Les colonnes sont d'abord renommées d'après `columns` (voir map_columns).
+    """
+    if path.lower().endswith(".csv"):
+        df = pd.read_csv(path, dtype=str)
+    else:
+        df = pd.read_excel(path, engine="openpyxl")
+    if columns:
+        dataset, df = map_columns(df, columns, dataset)
+    name = dataset or detect_dataset(df.columns)
+    if name is None:
+        raise ValueError(f"colonnes non reconnues : {', '.join(map(str, df.columns))} "
+                         "(associez-les avec --columns)")
+    dataset_columns = [storage.DATASETS[name]["time_col"], *storage.DATASETS[name]["columns"]]
+    return name, df[[col for col in dataset_columns if col in df.columns]]
+
+
+def _split_known(name, df, reprocess=False, db_path=None):
+    """(lignes à traiter, blocs à enregistrer, lignes écartées) : voir ledger.new_rows."""
+    if reprocess:
+        return df, ledger.block_digests(df)[0], 0
+    return ledger.new_rows(name, df, db_path=db_path)
+
+
+def _save(name, prepared, pending, known, rows, policy, key, db_path):
+    if len(prepared):
+        report = storage.upsert(name, prepared, policy=policy, db_path=db_path)
+    else:
+        report = {"inserted": 0, "updated": 0, "skipped": 0}
+    ledger.record(name, pending, key=key, rows=rows, db_path=db_path)
+    report["skipped"] += known
+    report["known"] = known
+    return report
+
+
+def ingest(name, df, policy="replace", db_path=None, key=None, reprocess=False):
+    """
+    Prépare les lignes d'un export (colonnes déjà nommées comme dans le stockage)
+    et les fusionne dans le jeu de données `name`. Les blocs de lignes déjà
+    importés sont écartés avant la préparation (voir ledger.py), sauf avec
+    `reprocess=True` ; `key` (voir ledger.file_key) enregistre le fichier.
+
+    Retourne le rapport de storage.upsert (lignes ajoutées, modifiées, ignorées),
+    avec "known" : lignes ignorées parce que déjà importées, sans être relues.
+    Avec la politique "replace", toutes les lignes sont traitées (voir ledger.consulted).
+    """
+    reprocess = reprocess or not ledger.consulted(policy)
+    rows = len(df)
+    df, pending, known = _split_known(name, df, reprocess, db_path)
+    return _save(name, PREPARE[name](df), pending, known, rows, policy, key, db_path)
+
+
+# --- Données dérivées ---
+
+def synthesize(source="blood", target="synthese", full=False, db_path=None):
+    """
+    Synthèse incrémentale, puis agrégats et détection des ruptures en ligne de
+    `target`. Retourne le nombre de lignes recalculées.
+    """
+    updated = synthesis.update_synthesis(source, target, full=full, db_path=db_path)
+    if updated is None:
+        return None
+    rollups.update_rollups(target, full=full, db_path=db_path)
+    bocpd.update(target, full=full, db_path=db_path)
+    return len(updated)
+
+
+def _rollups_glucose(full=False, db_path=None):
+    return rollups.update_rollups("glycemie", full=full, db_path=db_path)
+
+
+def _changepoints_glucose(full=False, db_path=None):
+    return bocpd.update("glycemie", full=full, db_path=db_path)
+
+
+def _rollups_weight(full=False, db_path=None):
+    return rollups.update_rollups("poids", full=full, db_path=db_path)
+
+
+# Mises à jour à faire après une importation, par jeu de données source :
+# (libellé, fonction, unité du nombre retourné par la fonction)
+DERIVED = {
+    "blood": [("Synthèse et agrégats synthese", synthesize, "lignes de synthèse recalculées")],
+    "glycemie": [("Agrégats glycemie", _rollups_glucose, "périodes recalculées"),
+                 ("Sommes horaires CGM", cgm.update_hourly, "heures recalculées"),
+                 ("Ruptures en ligne glycemie", _changepoints_glucose, "jours traités")],
+    "poids": [("Agrégats poids", _rollups_weight, "périodes recalculées")],
+}
+UNITS = {label: unit for steps in DERIVED.values() for label, _, unit in steps}
+
+
+def update_derived(name, full=False, db_path=None):
+    """
+    Met à jour les données dérivées de `name` (voir DERIVED). Retourne
+    {libellé: résultat}, le résultat étant None si rien n'avait changé.
+    """
+    return {label: func(full=full, db_path=db_path) for label, func, _ in DERIVED[name]}
+
+
+# --- Traitement d'un répertoire d'exports ---
+
+def find_exports(paths):
+    """Fichiers d'export (CSV, XLSX) des chemins donnés, répertoires parcourus récursivement, triés."""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                found += [os.path.join(root, f) for f in files if f.lower().endswith(EXTENSIONS)]
+        else:
+            found.append(path)
+    return sorted(found)
+
+
+def _read_new(path, dataset=None, reprocess=False, db_path=None, columns=None):
+    """Lecture d'un export dans un processus du pool : seules les lignes inédites sont préparées."""
+    name, df = read_export(path, dataset, columns)
+    rows = len(df)
+    df, pending, known = _split_known(name, df, reprocess, db_path)
+    return name, PREPARE[name](df), pending, known, rows
+
+
+def _pool(workers):
+    return concurrent.futures.ProcessPoolExecutor(max_workers=workers,
+                                                  mp_context=multiprocessing.get_context("spawn"))
+
+
+def run(paths, workers=None, policy="replace", dataset=None, full=False, reprocess=False, db_path=None,
+        columns=None):
+    """
+    Importe tous les exports de `paths` puis met à jour les données dérivées.
+    Les colonnes des exports sont associées à celles du stockage d'après
+    `columns` (voir load_columns) ou, à défaut, reconnues à leur nom.
+
+    Un fichier déjà importé (même empreinte, même politique) est ignoré sans
+    être lu, et seules les lignes inédites des autres sont préparées (voir
+    ledger.py) ; `reprocess=True` ou la politique "replace" retraitent tout.
+    La lecture et la conversion des dates (le plus coûteux) se font en
+    parallèle, un fichier par processus. Les écritures se font ensuite dans
+    l'ordre des fichiers : avec la politique "replace", le dernier fichier
+    gagne, quel que soit l'ordre de fin des lectures. Les mises à jour dérivées des différents
+    jeux de données s'exécutent elles aussi en parallèle (leurs écritures sont
+    sérialisées par le verrou du stockage).
+
+    Retourne un dict : "files" (une ligne par fichier), "derived" (résultat de
+    chaque mise à jour), "errors" (nombre de fichiers en échec), "seconds".
+    """
+    started = time.perf_counter()
+    reprocess = reprocess or not ledger.consulted(policy)
+    exports = find_exports(paths)
+    files = []
+    with _pool(workers) as pool:
+        futures = {}
+        for path in exports:
+            entry = {"file": path}
+            try:
+                # Un même fichier associé autrement n'est pas le même import
+                association = [json.dumps(columns, sort_keys=True, ensure_ascii=False)] if columns else ()
+                entry["key"] = ledger.file_key(ledger.file_digest(path), association, policy=policy)
+                previous = None if reprocess else ledger.imported_file(entry["key"], db_path=db_path)
+            except Exception as e:
+                entry["error"] = str(e)
+            else:
+                if previous is not None and dataset in (None, previous["dataset"]):
+                    entry.update(dataset=previous["dataset"], imported_at=previous["imported_at"])
+                else:
+                    futures[path] = pool.submit(_read_new, path, dataset, reprocess, db_path, columns)
+            files.append(entry)
+
+        for entry in files:
+            future = futures.get(entry["file"])
+            if future is None:
+                continue
+            try:
+                name, df, pending, known, rows = future.result()
+                entry.update(dataset=name, **_save(name, df, pending, known, rows, policy, entry["key"], db_path))
+            except Exception as e:  # un fichier illisible n'arrête pas les autres
+                entry["error"] = str(e)
+
+        # Jeux de données à tenir à jour : ceux qui existent (les mises à jour sont
+        # incrémentales, elles ne coûtent rien si rien n'a changé)
+        sources = [name for name in DERIVED if storage.version(name, db_path=db_path) > 0]
+        tasks = [(label, pool.submit(func, full=full, db_path=db_path))
+                 for name in sources for label, func, _ in DERIVED[name]]
+        derived = {label: future.result() for label, future in tasks}
+
+    return {
+        "files": files,
+        "derived": derived,
+        "errors": sum("error" in f for f in files),
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def format_summary(result):
+    """Résumé texte du résultat de run()."""
+    lines = []
+    totals = {"inserted": 0, "updated": 0, "skipped": 0, "known": 0}
+    for entry in result["files"]:
+        if "error" in entry:
+            lines.append(f"ÉCHEC {entry['file']} : {entry['error']}")
+            continue
+        if "imported_at" in entry:
+            lines.append(f"{entry['file']} -> {entry['dataset']} : déjà importé le {entry['imported_at']}, ignoré")
+            continue
+        for key in totals:
+            totals[key] += entry[key]
+        lines.append(f"{entry['file']} -> {entry['dataset']} : {storage.format_report(entry)}")
+    for label, value in result["derived"].items():
+        lines.append(f"{label} : {'à jour' if value is None else f'{value} {UNITS[label]}'}")
+    already = sum("imported_at" in f for f in result["files"])
+    lines.append(f"{len(result['files'])} fichiers ({already} déjà importés, {result['errors']} en échec), "
+                 f"{storage.format_report(totals)}, en {result['seconds']:.1f} s")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importe des exports MyHealth, puis met à jour synthèse et agrégats.")
+    parser.add_argument("paths", nargs="+", help="fichiers ou répertoires d'exports (CSV, XLSX)")
+    parser.add_argument("--workers", type=int, default=None, help="nombre de processus (par défaut, un par cœur)")
+    parser.add_argument("--policy", choices=list(storage.CONFLICT_POLICIES), default="replace",
+                        help="sort d'une mesure déjà enregistrée (même date-heure)")
+    parser.add_argument("--dataset", choices=list(PREPARE), default=None,
+                        help="jeu de données de tous les fichiers (par défaut, reconnu d'après les colonnes)")
+    parser.add_argument("--columns", default=None, metavar="FICHIER",
+                        help="association des colonnes des exports à celles du stockage (JSON, "
+                             "voir load_columns)")
+    parser.add_argument("--full", action="store_true", help="recalculer toutes les données dérivées")
+    parser.add_argument("--reprocess", action="store_true",
+                        help="retraiter les fichiers et les lignes déjà importés (voir ledger.py ; "
+                             "toujours le cas avec --policy replace)")
+    parser.add_argument("--db", default=None, help=f"base de données (par défaut {storage.DB_PATH})")
+    args = parser.parse_args(argv)
+
+    try:
+        columns = load_columns(args.columns) if args.columns else None
+    except (OSError, ValueError) as e:
+        parser.error(f"--columns : {e}")
+    result = run(args.paths, workers=args.workers, policy=args.policy, dataset=args.dataset,
+                 full=args.full, reprocess=args.reprocess, db_path=args.db, columns=columns)
+    print(format_summary(result))
+    return 1 if result["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
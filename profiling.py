@@ -0,0 +1,154 @@
+import contextlib
+import datetime
+import json
+import os
+import threading
+import time
+import tracemalloc
+import streamlit as st
+
+# --- Activation ---
+# Le profilage est désactivé par défaut. Il s'active avec la variable d'environnement
+# MYHEALTH_PROFILE=1 ou avec le paramètre d'URL ?profile=1.
+ENV_VAR = "MYHEALTH_PROFILE"
+QUERY_PARAM = "profile"
+# Fichier où chaque rerun profilé est ajouté sous forme d'une ligne JSON
+LOG_PATH = os.environ.get("MYHEALTH_PROFILE_LOG", "profiling.jsonl")
+
+_log_lock = threading.Lock()
+_trace_lock = threading.Lock()
+_active = 0  # étapes en cours (toutes sessions) : le suivi mémoire s'arrête avec la dernière
+_SESSION_KEY = "_profiling_stages"
+_counters = {}  # nom -> fonction qui décrit un compteur du processus (voir register)
+
+
+def enabled():
+    """Indique si le profilage est activé pour ce rerun."""
+    if os.environ.get(ENV_VAR, "") not in ("", "0"):
+        return True
+    try:
+        return st.query_params.get(QUERY_PARAM, "0") not in ("", "0")
+    except Exception:  # hors d'une session Streamlit
+        return False
+
+
+def _stages():
+    return st.session_state.setdefault(_SESSION_KEY, [])
+
+
+@contextlib.contextmanager
+def stage(name):
+    """
+    Mesure la durée et la mémoire allouée d'une étape :
+
+        with profiling.stage("lecture synthese"):
+            df = data_loader.load_dataset("synthese")
+
+    Sans effet (et sans coût) si le profilage est désactivé.
+
+    Le suivi mémoire (tracemalloc) porte sur tout le processus : il démarre avec
+    la première étape en cours et s'arrête avec la dernière. La mémoire allouée
+    est donc approximative si d'autres sessions calculent en même temps. Le pic
+    n'est mesuré que pour une étape commencée seule (ni imbriquée, ni
+    concurrente) : les autres ne remettent pas le pic à zéro.
+    """
+    global _active
+    if not enabled():
+        yield
+        return
+
+    with _trace_lock:
+        alone = _active == 0
+        _active += 1
+        if alone:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        mem_before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        with _trace_lock:
+            current, peak = tracemalloc.get_traced_memory()
+            _active -= 1
+            if _active == 0:
+                tracemalloc.stop()
+        _stages().append({
+            "stage": name,
+            "seconds": duration,
+            "allocated_mb": (current - mem_before) / 1e6,
+            "peak_mb": (peak - mem_before) / 1e6 if alone else None,
+        })
+
+
+def record(name, **values):
+    """Ajoute une mesure libre (compteur, taille...) au rerun en cours."""
+    if enabled():
+        _stages().append({"stage": name, **values})
+
+
+def register(name, describe):
+    """
+    Ajoute au panneau de profilage un compteur partagé par tout le processus
+    (ex. succès/échecs d'un cache) : `describe()` retourne le texte affiché.
+    """
+    _counters[name] = describe
+
+
+def _fragment_rerun():
+    """Indique si le rerun en cours ne réexécute qu'un fragment (et non toute la page)."""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx()
+    except Exception:  # hors d'une session Streamlit
+        return False
+    return bool(ctx is not None and ctx.fragment_ids_this_run)
+
+
+def report(page, fragment=None):
+    """
+    À appeler à la fin d'une page : affiche le détail du rerun dans la barre
+    latérale et l'ajoute au journal JSON lines, puis remet les mesures à zéro.
+
+    À appeler aussi à la fin de chaque fragment, avec son nom (`fragment`) : si
+    seul le fragment a été réexécuté, ses mesures sont affichées dans le
+    fragment (il ne peut pas écrire dans la barre latérale) et journalisées
+    séparément. Lors d'un rerun complet, cet appel est sans effet : les mesures
+    du fragment font partie du rapport de la page.
+    """
+    if not enabled():
+        return
+    if fragment is not None and not _fragment_rerun():
+        return
+    stages = st.session_state.pop(_SESSION_KEY, [])
+    total = sum(s.get("seconds", 0.0) for s in stages)
+
+    if fragment is None:
+        panel = st.sidebar.expander(f"⏱️ Profilage ({total:.3f} s)", expanded=False)
+    else:
+        panel = st.expander(f"⏱️ Profilage : {fragment} ({total:.3f} s)", expanded=False)
+    with panel:
+        for s in stages:
+            if "seconds" in s:
+                peak = f"pic {s['peak_mb']:.1f} Mo" if s.get("peak_mb") is not None else "pic non mesuré"
+                st.write(f"**{s['stage']}** : {s['seconds'] * 1000:.1f} ms, "
+                         f"≈ {s['allocated_mb']:+.1f} Mo ({peak})")
+            else:
+                details = ", ".join(f"{k} = {v}" for k, v in s.items() if k != "stage")
+                st.write(f"**{s['stage']}** : {details}")
+        for name, describe in _counters.items():
+            st.caption(f"{name} : {describe()}")
+        st.caption("Mémoire : valeurs approximatives, mesurées pour tout le processus.")
+
+    entry = {
+        "time": datetime.datetime.now().isoformat(timespec="milliseconds"),
+        "page": page,
+        "fragment": fragment,
+        "total_seconds": total,
+        "stages": stages,
+        "counters": {name: describe() for name, describe in _counters.items()},
+    }
+    with _log_lock, open(LOG_PATH, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
@@ -0,0 +1,215 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+import storage
+
+# --- Agrégats par période ---
+# Pour chaque mesure et chaque période du calendrier (jour, semaine, mois), la
+# table `rollups` conserve count/mean/min/max/p10/p90. Ils sont mis à jour à
+# chaque importation, seulement pour les périodes touchées par les nouvelles données.
+
+# Mesures agrégées par jeu de données
+METRICS = {
+    "synthese": ["Systolique (mmHg)", "Diastolique (mmHg)", "Pouls (bpm)"],
+    "glycemie": ["Glycémie (mmol/L)"],
+    "poids": ["Poids_kg", "Poids_lbs"],
+}
+
+# Résolutions, de la plus fine à la plus grossière : fréquence pandas des périodes
+RESOLUTIONS = {
+    "day": "D",
+    "week": "W-SUN",  # semaines du lundi au dimanche
+    "month": "M",
+}
+
+# Libellés des résolutions dans les titres des graphiques
+LABELS = {"day": "jour", "week": "semaine", "month": "mois"}
+
+# Nombre de mesures en dessous duquel le graphique affiche les points bruts
+RAW_MAX_POINTS = 2000
+# Nombre minimal de périodes pour qu'une résolution « remplisse » le graphique
+MIN_BUCKETS = 120
+
+
+def bucket_start(times, resolution):
+    """Début de la période (jour, semaine ou mois) qui contient chaque date."""
+    times = pd.to_datetime(pd.Series(times))
+    return times.dt.to_period(RESOLUTIONS[resolution]).dt.start_time
+
+
+def bucket_end(times, resolution):
+    """Fin (incluse, à la nanoseconde près) de la période qui contient chaque date."""
+    times = pd.to_datetime(pd.Series(times))
+    return times.dt.to_period(RESOLUTIONS[resolution]).dt.end_time
+
+
+def compute(df, time_col, metrics, resolution):
+    """
+    Agrège les mesures `metrics` de `df` par période. Retourne un tableau long :
+    bucket (début de la période), metric, puis les statistiques de storage.ROLLUP_STATS.
+    """
+    buckets = bucket_start(df[time_col], resolution).to_numpy()
+    frames = []
+    for metric in metrics:
+        grouped = pd.Series(pd.to_numeric(df[metric], errors="coerce").to_numpy(), index=buckets).dropna()
+        grouped = grouped.groupby(level=0)
+        stats = pd.DataFrame({
+            "count": grouped.count(),
+            "mean": grouped.mean(),
+            "min": grouped.min(),
+            "max": grouped.max(),
+            "p10": grouped.quantile(0.1),
+            "p90": grouped.quantile(0.9),
+        })
+        stats.index.name = "bucket"
+        frames.append(stats.reset_index().assign(metric=metric))
+    if not frames:
+        return pd.DataFrame(columns=["bucket", "metric", *storage.ROLLUP_STATS])
+    return pd.concat(frames, ignore_index=True)
+
+
+def _watermark_key(name):
+    return f"rollups:{name}"
+
+
+def update_rollups(name, full=False, db_path=None):
+    """
+    Met à jour les agrégats du jeu de données `name`.
+
+    Comme pour la synthèse, un filigrane enregistre la dernière version déjà
+    agrégée : seules les périodes qui contiennent des écritures postérieures
+    sont recalculées (en relisant uniquement ces périodes). `full=True` (ou une
+    première mise à jour) recalcule tout l'historique.
+
+    Retourne le nombre de périodes recalculées, ou None si rien n'a changé.
+    """
+    with storage.write_lock(db_path):
+        current = storage.version(name, db_path=db_path)
+        watermark = int(storage.get_meta(_watermark_key(name), 0, db_path=db_path))
+        if current == watermark and not full:
+            return None
+
+        if full or watermark == 0:
+            changed = (None, None)
+        else:
+            changed = storage.changes_since(name, watermark, until_version=current, db_path=db_path)
+            if changed is None:
+                storage.set_meta(_watermark_key(name), current, db_path=db_path)
+                return None
+
+        # Plage de chaque résolution : les périodes entières qui contiennent les changements
+        ranges = {}
+        for resolution in RESOLUTIONS:
+            start, end = changed
+            start = bucket_start([start], resolution).iloc[0] if start is not None else None
+            end = bucket_end([end], resolution).iloc[0] if end is not None else None
+            ranges[resolution] = (start, end)
+        starts = [start for start, _ in ranges.values() if start is not None]
+        ends = [end for _, end in ranges.values() if end is not None]
+        df = storage.read(name, start=min(starts) if starts else None, end=max(ends) if ends else None,
+                          db_path=db_path)
+
+        time_col = storage.DATASETS[name]["time_col"]
+        recomputed = 0
+        for resolution, (start, end) in ranges.items():
+            times = df[time_col].to_numpy()
+            lo = times.searchsorted(np.datetime64(start), side="left") if start is not None else 0
+            hi = times.searchsorted(np.datetime64(end), side="right") if end is not None else len(df)
+            rollup = compute(df.iloc[lo:hi], time_col, METRICS[name], resolution)
+            storage.replace_rollups(name, resolution, rollup, start=start, end=end, db_path=db_path)
+            recomputed += len(rollup)
+        storage.set_meta(_watermark_key(name), current, db_path=db_path)
+        return recomputed
+
+
+def state_version(name, db_path=None):
+    """Version de `name` déjà agrégée (0 si jamais)."""
+    return int(storage.get_meta(_watermark_key(name), 0, db_path=db_path))
+
+
+def catch_up(name):
+    """
+    Rattrape les agrégats de `name` à l'affichage, seulement si aucune écriture
+    n'est en cours : sinon la table actuelle est servie telle quelle, et
+    l'importation en cours mettra les agrégats à jour (voir pipeline.update_derived).
+    """
+    if state_version(name) == storage.version(name):
+        return
+    with storage.try_write_lock() as acquired:
+        if acquired:
+            update_rollups(name)
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _cached_rollup(name, version, metric, resolution, start, end):
+    """Agrégats mis en cache entre les sessions, par version déjà agrégée."""
+    return storage.read_rollups(name, metric, resolution, start=start, end=end)
+
+
+def load(name, metric, resolution, start=None, end=None):
+    """
+    Agrégats `resolution` de la mesure `metric` pour les périodes qui recoupent
+    [start, end]. Les agrégats en retard sur les données sont rattrapés si
+    aucune écriture n'est en cours (voir catch_up).
+    """
+    catch_up(name)
+    start = bucket_start([start], resolution).iloc[0] if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+    return _cached_rollup(name, state_version(name), metric, resolution, start, end)
+
+
+def choose_resolution(name, start=None, end=None):
+    """
+    Résolution à afficher pour la plage [start, end] : None (points bruts) s'il y
+    a peu de mesures, sinon la résolution la plus grossière qui donne encore au
+    moins MIN_BUCKETS périodes. Si même les jours n'en donnent pas assez (plage
+    courte mais très dense), retourne None : les points bruts sont alors
+    sous-échantillonnés par la page.
+    """
+    if storage.count(name, start, end) <= RAW_MAX_POINTS:
+        return None
+    first, last = storage.time_bounds(name)
+    start = max(pd.Timestamp(start), first) if start is not None else first
+    end = min(pd.Timestamp(end), last) if end is not None else last
+    for resolution in reversed(list(RESOLUTIONS)):
+        periods = pd.period_range(start, end, freq=RESOLUTIONS[resolution])
+        if len(periods) >= MIN_BUCKETS:
+            return resolution
+    return None
+
+
+def add_band(fig, rollup, name, color=None):
+    """
+    Ajoute à `fig` la moyenne de chaque période (ligne et points) et une bande
+    entre les 10e et 90e centiles, au lieu d'un point par mesure.
+    """
+    color = color or "#636efa"
+    fig.add_trace(go.Scatter(x=rollup["bucket"], y=rollup["p90"], mode="lines", line_width=0,
+                             line_color=color, showlegend=False, hoverinfo="skip", legendgroup=name))
+    fig.add_trace(go.Scatter(x=rollup["bucket"], y=rollup["p10"], mode="lines", line_width=0,
+                             line_color=color, fill="tonexty", opacity=0.2, name=f"{name} (p10–p90)",
+                             hoverinfo="skip", legendgroup=name))
+    fig.add_trace(go.Scatter(
+        x=rollup["bucket"], y=rollup["mean"], mode="lines+markers", name=name, line_color=color,
+        marker_size=4, legendgroup=name,
+        customdata=rollup[["count", "min", "max", "p10", "p90"]].to_numpy(),
+        hovertemplate=("%{x|%Y-%m-%d}<br>moyenne %{y:.1f}<br>p10–p90 %{customdata[3]:.1f}–%{customdata[4]:.1f}"
+                       "<br>min–max %{customdata[1]:.1f}–%{customdata[2]:.1f}<br>%{customdata[0]} mesures"
+                       "<extra></extra>"),
+    ))
+    return fig
+
+
+def figure(name, metrics, resolution, start=None, end=None, colors=None, title=None, y_label=None):
+    """
+    Graphique des agrégats de `metrics` (une moyenne et une bande par mesure),
+    pour la plage [start, end] à la résolution `resolution`.
+    """
+    colors = colors or {}
+    fig = go.Figure()
+    for metric in metrics:
+        add_band(fig, load(name, metric, resolution, start, end), metric, colors.get(metric))
+    fig.update_layout(title=f"{title} (moyenne par {LABELS[resolution]})" if title else None,
+                      xaxis_title="Date", yaxis_title=y_label)
+    return fig
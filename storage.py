@@ -0,0 +1,708 @@
+import contextlib
+import datetime
+import os
+import sqlite3
+import tempfile
+import threading
+import pandas as pd
+
+try:
+    import fcntl  # verrou de fichier entre processus (Linux, macOS)
+except ImportError:  # pragma: no cover - Windows : verrou entre threads seulement
+    fcntl = None
+
+# --- Emplacement de la base de données ---
+# Toutes les mesures sont stockées dans une base SQLite unique. Les fichiers CSV
+# ne servent plus qu'à l'exportation (et à la migration des anciennes données).
+DB_PATH = os.environ.get("MYHEALTH_DB", "myhealth.db")
+
+# --- Schéma des jeux de données ---
+# Chaque table est indexée par l'horodatage (colonne `ts`, en nanosecondes depuis
+# l'époque Unix) : c'est la clé primaire, les lignes sont donc stockées triées.
+DATASETS = {
+    "blood": {
+        "csv": "blood.csv",
+        "time_col": "Date-Heure",
+        "columns": {
+            "Systolique (mmHg)": "INTEGER",
+            "Diastolique (mmHg)": "INTEGER",
+            "Pouls (bpm)": "INTEGER",
+            "Notes": "TEXT",
+        },
+    },
+    "synthese": {
+        "csv": "synthese.csv",
+        "time_col": "Date-Heure",
+        "columns": {
+            "Systolique (mmHg)": "INTEGER",
+            "Diastolique (mmHg)": "INTEGER",
+            "Pouls (bpm)": "INTEGER",
+            "Notes": "TEXT",
+        },
+    },
+    "glycemie": {
+        "csv": "glycemie.csv",
+        "time_col": "Date-Heure",
+        "columns": {
+            "Glycémie (mmol/L)": "REAL",
+            "Note-1": "TEXT",
+            "Note-2": "TEXT",
+        },
+    },
+    # Sommes horaires de la glycémie, calculées à partir de "glycemie" (voir cgm.py)
+    "glycemie_horaire": {
+        "csv": "glycemie_horaire.csv",
+        "time_col": "Heure",
+        "columns": {
+            "Mesures": "INTEGER",
+            "Somme": "REAL",
+            "Somme des carrés": "REAL",
+            "Très bas": "INTEGER",
+            "Bas": "INTEGER",
+            "Dans la cible": "INTEGER",
+            "Haut": "INTEGER",
+            "Très haut": "INTEGER",
+        },
+    },
+    "poids": {
+        "csv": "poids.csv",
+        "time_col": "Date",
+        "columns": {
+            "Poids_kg": "REAL",
+            "Poids_lbs": "REAL",
+        },
+    },
+}
+
+# Statistiques conservées pour chaque période dans la table des agrégats
+ROLLUP_STATS = {
+    "count": "INTEGER",
+    "mean": "REAL",
+    "min": "REAL",
+    "max": "REAL",
+    "p10": "REAL",
+    "p90": "REAL",
+}
+
+# --- Conflits à l'écriture ---
+# Que faire d'une ligne importée dont l'horodatage existe déjà :
+CONFLICT_POLICIES = {
+    "replace": "Remplacer les mesures existantes",
+    "keep": "Garder les mesures existantes",
+    "fill": "Compléter seulement les valeurs manquantes",
+}
+# Décimales comparées pour les colonnes REAL : une même mesure réimportée avec un
+# autre formatage des décimales (72.5 / 72.50 / 72.4999999) n'est pas une modification.
+REAL_DECIMALS = 6
+
+# --- Instantanés ---
+# Copies datées de la base, conservées dans un sous-répertoire à côté de celle-ci.
+# Au plus un instantané par intervalle, pris après une écriture.
+SNAPSHOT_DIR = "snapshots"
+SNAPSHOT_INTERVAL = datetime.timedelta(hours=24)
+SNAPSHOT_KEEP = 7
+
+# Bases dont le schéma a déjà été créé/migré par ce processus
+_initialized = set()
+
+# Verrou d'écriture : un seul écrivain à la fois (threads de ce processus et autres
+# processus via un fichier .lock). Les lecteurs ne le prennent jamais : en mode WAL,
+# ils lisent la dernière version validée sans attendre les écritures en cours. Les
+# rattrapages faits à l'affichage n'essaient de le prendre que sans attendre (voir try_write_lock).
+_thread_lock = threading.RLock()
+_lock_state = threading.local()
+
+
+# --- Fonctions Utilitaires ---
+
+def _quote(name):
+    """Protège un nom de colonne (espaces, parenthèses, accents) pour SQLite."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _to_ns(series):
+    """Convertit une colonne de dates en entiers (nanosecondes depuis l'époque)."""
+    return pd.to_datetime(series).dt.as_unit("ns").astype("int64")
+
+
+def _from_ns(values):
+    """Convertit des entiers (nanosecondes depuis l'époque) en dates."""
+    return pd.to_datetime(values, unit="ns")
+
+
+def _to_sql_values(series, sql_type):
+    """
+    Prépare une colonne pour sqlite3 : types Python natifs, None pour les valeurs
+    manquantes, valeurs numériques converties pour respecter le type de la colonne.
+    """
+    if sql_type in ("INTEGER", "REAL"):
+        series = pd.to_numeric(series, errors="coerce")
+    else:
+        series = series.where(series.isna(), series.astype(str))
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+def _range_clause(start=None, end=None, column="ts", equals=None):
+    """
+    Clause WHERE (et ses paramètres) pour une plage de dates incluse sur `column`,
+    avec d'éventuelles conditions d'égalité supplémentaires ({colonne: valeur}).
+    """
+    clauses, params = [], []
+    for col, value in (equals or {}).items():
+        clauses.append(f"{col} = ?")
+        params.append(value)
+    if start is not None:
+        clauses.append(f"{column} >= ?")
+        params.append(int(pd.Timestamp(start).as_unit("ns").value))
+    if end is not None:
+        clauses.append(f"{column} <= ?")
+        params.append(int(pd.Timestamp(end).as_unit("ns").value))
+    return (f" WHERE {' AND '.join(clauses)}" if clauses else ""), params
+
+
+def _create_schema(con):
+    for name, dataset in DATASETS.items():
+        columns = ", ".join(f"{_quote(col)} {sql_type}" for col, sql_type in dataset["columns"].items())
+        con.execute(f"CREATE TABLE IF NOT EXISTS {_quote(name)} (ts INTEGER PRIMARY KEY, {columns})")
+    # Version de chaque jeu de données, incrémentée à chaque écriture
+    con.execute("CREATE TABLE IF NOT EXISTS versions (dataset TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+    # Journal des écritures : plage de dates touchée par chaque version
+    con.execute(
+        "CREATE TABLE IF NOT EXISTS changes ("
+        "dataset TEXT NOT NULL, version INTEGER NOT NULL, min_ts INTEGER, max_ts INTEGER, "
+        "PRIMARY KEY (dataset, version))"
+    )
+    con.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+    # Agrégats par période (jour, semaine, mois) de chaque mesure, voir rollups.py
+    con.execute(
+        "CREATE TABLE IF NOT EXISTS rollups ("
+        "dataset TEXT NOT NULL, metric TEXT NOT NULL, resolution TEXT NOT NULL, bucket INTEGER NOT NULL, "
+        + ", ".join(f"{stat} {sql_type}" for stat, sql_type in ROLLUP_STATS.items())
+        + ", PRIMARY KEY (dataset, resolution, metric, bucket))"
+    )
+    # Ruptures détectées en ligne dans chaque mesure, voir bocpd.py
+    con.execute(
+        "CREATE TABLE IF NOT EXISTS changepoints ("
+        "dataset TEXT NOT NULL, metric TEXT NOT NULL, ts INTEGER NOT NULL, before REAL, after REAL, "
+        "PRIMARY KEY (dataset, metric, ts))"
+    )
+    # Registre des importations : fichiers et blocs de lignes déjà importés, voir ledger.py
+    con.execute(
+        "CREATE TABLE IF NOT EXISTS ingested_files ("
+        "key TEXT PRIMARY KEY, dataset TEXT NOT NULL, rows INTEGER, imported_at TEXT)"
+    )
+    con.execute(
+        "CREATE TABLE IF NOT EXISTS ingested_blocks ("
+        "dataset TEXT NOT NULL, digest INTEGER NOT NULL, PRIMARY KEY (dataset, digest)) WITHOUT ROWID"
+    )
+
+
+def _migrate_legacy_csv(con, db_path):
+    """
+    Importe une seule fois les anciens fichiers CSV (blood.csv, poids.csv, ...)
+    présents dans le même répertoire que la base.
+    """
+    for name, dataset in DATASETS.items():
+        key = f"migrated:{name}"
+        if con.execute("SELECT 1 FROM meta WHERE key = ?", (key,)).fetchone():
+            continue
+        csv_path = os.path.join(os.path.dirname(db_path), dataset["csv"])
+        if os.path.exists(csv_path):
+            df = pd.read_csv(csv_path)
+            df[dataset["time_col"]] = pd.to_datetime(df[dataset["time_col"]], errors="coerce")
+            df = df.dropna(subset=[dataset["time_col"]])
+            _write(con, name, df)
+        con.execute("INSERT INTO meta (key, value) VALUES (?, '1')", (key,))
+
+
+@contextlib.contextmanager
+def write_lock(db_path=None):
+    """
+    Verrou exclusif des écritures sur la base. Réentrant dans un même thread :
+    une fonction qui vérifie puis écrit (ex. le filigrane de la synthèse) peut
+    le prendre autour des deux.
+    """
+    db_path = db_path or DB_PATH
+    depth = getattr(_lock_state, "depth", 0)
+    with _thread_lock:
+        if depth > 0 or fcntl is None:
+            _lock_state.depth = depth + 1
+            try:
+                yield
+            finally:
+                _lock_state.depth = depth
+            return
+        with open(db_path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            _lock_state.depth = 1
+            try:
+                yield
+            finally:
+                _lock_state.depth = 0
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+@contextlib.contextmanager
+def try_write_lock(db_path=None):
+    """
+    Comme write_lock, mais sans attendre : produit True si le verrou est obtenu,
+    False s'il est déjà pris (par un autre thread ou un autre processus). Pour
+    les rattrapages faits à l'affichage, qui ne doivent jamais bloquer une page
+    derrière une importation :
+
+        with storage.try_write_lock() as acquired:
+            if acquired:
+                ...
+    """
+    db_path = db_path or DB_PATH
+    if getattr(_lock_state, "depth", 0) > 0:
+        with write_lock(db_path):  # déjà détenu par ce thread
+            yield True
+        return
+    if not _thread_lock.acquire(blocking=False):
+        yield False
+        return
+    if fcntl is None:
+        try:
+            with write_lock(db_path):
+                yield True
+        finally:
+            _thread_lock.release()
+        return
+    lock_file = open(db_path + ".lock", "a")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        # Pris par un autre processus : le verrou des threads est rendu avant de
+        # produire False, les écrivains de ce processus n'attendent pas l'appelant
+        lock_file.close()
+        _thread_lock.release()
+        yield False
+        return
+    _lock_state.depth = 1
+    try:
+        yield True
+    finally:
+        _lock_state.depth = 0
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
+        _thread_lock.release()
+
+
+def connect(db_path=None):
+    """
+    Ouvre une connexion à la base (une connexion par appel : Streamlit sert
+    chaque session sur son propre thread). Le schéma est créé au premier accès.
+    """
+    db_path = db_path or DB_PATH
+    if db_path not in _initialized:
+        with write_lock(db_path):
+            con = sqlite3.connect(db_path, timeout=30)
+            con.execute("PRAGMA journal_mode=WAL")
+            with con:
+                _create_schema(con)
+                _migrate_legacy_csv(con, db_path)
+            con.close()
+            _initialized.add(db_path)
+    return sqlite3.connect(db_path, timeout=30)
+
+
+@contextlib.contextmanager
+def transaction(db_path=None):
+    """
+    Transaction d'écriture : verrou d'écriture, BEGIN IMMEDIATE, puis COMMIT
+    (ou ROLLBACK en cas d'erreur). Tout ou rien : un lecteur voit l'état avant
+    ou après l'écriture, jamais un état intermédiaire.
+    """
+    with write_lock(db_path):
+        con = connect(db_path)
+        con.isolation_level = None
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                yield con
+            except BaseException:
+                con.execute("ROLLBACK")
+                raise
+            con.execute("COMMIT")
+        finally:
+            con.close()
+
+
+def _bump_version(con, name, min_ts, max_ts):
+    con.execute(
+        "INSERT INTO versions (dataset, version) VALUES (?, 1) "
+        "ON CONFLICT(dataset) DO UPDATE SET version = version + 1",
+        (name,),
+    )
+    new_version = con.execute("SELECT version FROM versions WHERE dataset = ?", (name,)).fetchone()[0]
+    con.execute(
+        "INSERT INTO changes (dataset, version, min_ts, max_ts) VALUES (?, ?, ?, ?)",
+        (name, new_version, min_ts, max_ts),
+    )
+    return new_version
+
+
+def _write(con, name, df, bump=True):
+    dataset = DATASETS[name]
+    columns = list(dataset["columns"])
+    ts = _to_ns(df[dataset["time_col"]])
+    values = [_to_sql_values(df[col], dataset["columns"][col]) if col in df else [None] * len(df)
+              for col in columns]
+    rows = list(zip(ts.tolist(), *values))
+
+    # Insertion ou remplacement ligne par ligne sur la clé `ts` : le coût dépend du
+    # nombre de nouvelles lignes, pas de la taille de l'historique.
+    quoted = [_quote(col) for col in columns]
+    updates = ", ".join(f"{col} = excluded.{col}" for col in quoted)
+    con.executemany(
+        f"INSERT INTO {_quote(name)} (ts, {', '.join(quoted)}) "
+        f"VALUES ({', '.join('?' * (len(columns) + 1))}) "
+        f"ON CONFLICT(ts) DO UPDATE SET {updates}",
+        rows,
+    )
+    if not rows:
+        return 0, None, None
+    min_ts, max_ts = int(ts.min()), int(ts.max())
+    if bump:
+        _bump_version(con, name, min_ts, max_ts)
+    return len(rows), min_ts, max_ts
+
+
+def _same(name, col, left, right):
+    """Condition SQL : la colonne `col` a la même valeur dans `left` et `right`."""
+    col = _quote(col)
+    if DATASETS[name]["columns"][col[1:-1]] == "REAL":
+        return f"round({left}.{col}, {REAL_DECIMALS}) IS round({right}.{col}, {REAL_DECIMALS})"
+    return f"{left}.{col} IS {right}.{col}"
+
+
+def _upsert(con, name, df, policy):
+    """
+    Fusionne `df` dans la table par clé `ts`. Le lot est d'abord chargé dans une
+    table temporaire, puis comparé aux lignes existantes par jointure sur la clé
+    primaire : le coût dépend du nombre de lignes importées (recherches dans
+    l'index), pas de la taille de l'historique. Seules les lignes nouvelles ou
+    réellement modifiées selon `policy` sont écrites.
+    """
+    if policy not in CONFLICT_POLICIES:
+        raise ValueError(f"Politique de conflit inconnue : {policy!r}")
+    dataset = DATASETS[name]
+    columns = list(dataset["columns"])
+    quoted = [_quote(col) for col in columns]
+    table = _quote(name)
+    ts = _to_ns(df[dataset["time_col"]])
+    values = [_to_sql_values(df[col], dataset["columns"][col]) if col in df else [None] * len(df)
+              for col in columns]
+    rows = list(zip(ts.tolist(), *values))
+
+    # Lot sans doublons (pour un même horodatage, la dernière ligne du lot gagne)
+    con.execute("DROP TABLE IF EXISTS temp._batch")
+    con.execute(f"CREATE TEMP TABLE _batch (ts INTEGER PRIMARY KEY, {', '.join(quoted)})")
+    con.executemany(f"INSERT OR REPLACE INTO _batch VALUES ({', '.join('?' * (len(columns) + 1))})", rows)
+    batch_rows = con.execute("SELECT COUNT(*) FROM _batch").fetchone()[0]
+
+    # Lignes existantes à ignorer selon la politique
+    if policy == "keep":
+        unchanged = "1"
+    elif policy == "replace":
+        unchanged = " AND ".join(_same(name, col, "t", "b") for col in columns)
+    else:  # "fill" : rien à compléter si aucune valeur manquante ne reçoit une valeur
+        unchanged = "NOT (" + " OR ".join(
+            f"(t.{col} IS NULL AND b.{col} IS NOT NULL)" for col in quoted) + ")"
+    skipped = con.execute(
+        f"DELETE FROM _batch WHERE ts IN (SELECT b.ts FROM _batch b JOIN {table} t ON t.ts = b.ts "
+        f"WHERE {unchanged})"
+    ).rowcount
+    updated = con.execute(f"SELECT COUNT(*) FROM _batch b JOIN {table} t ON t.ts = b.ts").fetchone()[0]
+    min_ts, max_ts = con.execute("SELECT MIN(ts), MAX(ts) FROM _batch").fetchone()
+
+    if policy == "fill":
+        updates = ", ".join(f"{col} = coalesce({table}.{col}, excluded.{col})" for col in quoted)
+    else:
+        updates = ", ".join(f"{col} = excluded.{col}" for col in quoted)
+    # "WHERE true" : lève l'ambiguïté de syntaxe entre SELECT ... ON CONFLICT et une jointure
+    con.execute(f"INSERT INTO {table} (ts, {', '.join(quoted)}) SELECT * FROM _batch WHERE true "
+                f"ON CONFLICT(ts) DO UPDATE SET {updates}")
+    con.execute("DROP TABLE temp._batch")
+
+    report = {
+        "inserted": batch_rows - skipped - updated,
+        "updated": updated,
+        "skipped": skipped + len(rows) - batch_rows,  # doublons du lot compris
+    }
+    if min_ts is not None:
+        _bump_version(con, name, min_ts, max_ts)
+    return report
+
+
+# --- API du stockage ---
+
+def upsert(name, df, policy="replace", db_path=None):
+    """
+    Fusionne les lignes de `df` dans le jeu de données `name` par horodatage.
+    `policy` (voir CONFLICT_POLICIES) décide du sort d'une ligne dont
+    l'horodatage existe déjà. Une ligne identique à l'existante est ignorée :
+    réimporter un export déjà importé ne change ni les données ni leur version.
+
+    Retourne un dict : nombre de lignes "inserted" (ajoutées), "updated"
+    (modifiées) et "skipped" (ignorées).
+    """
+    with transaction(db_path) as con:
+        report = _upsert(con, name, df, policy)
+    if report["inserted"] or report["updated"]:
+        maybe_snapshot(db_path)
+    return report
+
+
+def write(name, df, db_path=None):
+    """
+    Ajoute les lignes de `df` au jeu de données `name`. Une ligne dont
+    l'horodatage existe déjà remplace l'ancienne (la dernière gagne).
+    Retourne le nombre de lignes ajoutées ou modifiées.
+    """
+    report = upsert(name, df, db_path=db_path)
+    return report["inserted"] + report["updated"]
+
+
+def format_report(report):
+    """Résumé d'un rapport de upsert() (ou de pipeline.ingest) pour l'interface."""
+    text = (f"{report['inserted']} mesures ajoutées, {report['updated']} modifiées, "
+            f"{report['skipped']} ignorées (déjà présentes)")
+    if report.get("known"):
+        text += f", dont {report['known']} reconnues sans relecture"
+    return text
+
+
+def replace_range(name, df, start=None, end=None, db_path=None):
+    """
+    Remplace toutes les lignes du jeu de données comprises entre `start` et `end`
+    (inclus, None = pas de borne) par les lignes de `df`.
+    Retourne le nombre de lignes écrites.
+    """
+    where, params = _range_clause(start, end)
+    start_ns = params[0] if start is not None else None
+    end_ns = params[-1] if end is not None else None
+
+    with transaction(db_path) as con:
+        deleted = con.execute(f"DELETE FROM {_quote(name)}{where}", params).rowcount
+        written, min_ts, max_ts = _write(con, name, df, bump=False)
+        if deleted or written:
+            bounds = [t for t in (start_ns, min_ts) if t is not None]
+            lower = min(bounds) if bounds else None
+            bounds = [t for t in (end_ns, max_ts) if t is not None]
+            upper = max(bounds) if bounds else None
+            _bump_version(con, name, lower, upper)
+    return written
+
+
+def read(name, start=None, end=None, db_path=None):
+    """
+    Lit le jeu de données, trié par date, avec sa colonne de date convertie.
+    `start` et `end` (inclus) limitent la lecture à une plage de dates : la date
+    est la clé primaire de la table (index B-tree), seules les pages de la plage
+    sont lues, quelle que soit la taille de l'historique.
+    """
+    dataset = DATASETS[name]
+    columns = ", ".join(_quote(col) for col in dataset["columns"])
+    where, params = _range_clause(start, end)
+    con = connect(db_path)
+    try:
+        df = pd.read_sql_query(f"SELECT ts, {columns} FROM {_quote(name)}{where} ORDER BY ts", con, params=params)
+    finally:
+        con.close()
+    df.insert(0, dataset["time_col"], _from_ns(df.pop("ts")))
+    return df
+
+
+def neighbour_time(name, ts, before=True, db_path=None):
+    """
+    Date de la mesure qui précède (ou suit) strictement `ts`, ou None.
+    Recherche indexée : coût logarithmique quelle que soit la taille de l'historique.
+    """
+    query = "SELECT MAX(ts) FROM {} WHERE ts < ?" if before else "SELECT MIN(ts) FROM {} WHERE ts > ?"
+    con = connect(db_path)
+    try:
+        row = con.execute(query.format(_quote(name)), (int(pd.Timestamp(ts).as_unit("ns").value),)).fetchone()
+    finally:
+        con.close()
+    return _from_ns(row[0]) if row[0] is not None else None
+
+
+def count(name, start=None, end=None, db_path=None):
+    """Nombre de mesures dans la plage [start, end], compté sur l'index de la date."""
+    where, params = _range_clause(start, end)
+    con = connect(db_path)
+    try:
+        return con.execute(f"SELECT COUNT(*) FROM {_quote(name)}{where}", params).fetchone()[0]
+    finally:
+        con.close()
+
+
+def replace_rollups(name, resolution, df, start=None, end=None, db_path=None):
+    """
+    Remplace les agrégats `resolution` de `name` dont la période commence dans
+    [start, end] par ceux de `df` (colonnes bucket, metric et ROLLUP_STATS).
+    """
+    where, params = _range_clause(start, end, column="bucket", equals={"dataset": name, "resolution": resolution})
+    stats = list(ROLLUP_STATS)
+    rows = zip(
+        [name] * len(df), df["metric"].tolist(), [resolution] * len(df), _to_ns(df["bucket"]).tolist(),
+        *(_to_sql_values(df[stat], ROLLUP_STATS[stat]) for stat in stats),
+    )
+    with transaction(db_path) as con:
+        con.execute(f"DELETE FROM rollups{where}", params)
+        con.executemany(
+            f"INSERT INTO rollups (dataset, metric, resolution, bucket, {', '.join(stats)}) "
+            f"VALUES ({', '.join('?' * (4 + len(stats)))})",
+            rows,
+        )
+
+
+def read_rollups(name, metric, resolution, start=None, end=None, db_path=None):
+    """Agrégats `resolution` de la mesure `metric`, triés par période."""
+    where, params = _range_clause(start, end, column="bucket",
+                                  equals={"dataset": name, "resolution": resolution, "metric": metric})
+    con = connect(db_path)
+    try:
+        df = pd.read_sql_query(f"SELECT bucket, {', '.join(ROLLUP_STATS)} FROM rollups{where} ORDER BY bucket",
+                               con, params=params)
+    finally:
+        con.close()
+    df["bucket"] = _from_ns(df["bucket"])
+    return df
+
+
+def read_changepoints(name, start=None, end=None, db_path=None):
+    """Ruptures de `name` (voir bocpd.py) dont le nouveau régime commence dans [start, end], triées par date."""
+    where, params = _range_clause(start, end, equals={"dataset": name})
+    con = connect(db_path)
+    try:
+        df = pd.read_sql_query(f"SELECT metric, ts, before, after FROM changepoints{where} ORDER BY ts",
+                               con, params=params)
+    finally:
+        con.close()
+    df["ts"] = _from_ns(df["ts"])
+    return df
+
+
+def time_bounds(name, db_path=None):
+    """
+    Première et dernière date du jeu de données (ou (None, None) s'il est vide),
+    lues aux deux extrémités de l'index sans parcourir la table.
+    """
+    con = connect(db_path)
+    try:
+        # Deux sous-requêtes : SQLite ne lit l'extrémité de l'index que pour un MIN ou un MAX seul
+        table = _quote(name)
+        first, last = con.execute(f"SELECT (SELECT MIN(ts) FROM {table}), (SELECT MAX(ts) FROM {table})").fetchone()
+    finally:
+        con.close()
+    if first is None:
+        return None, None
+    return _from_ns(first), _from_ns(last)
+
+
+def version(name, db_path=None):
+    """Version du jeu de données (0 s'il n'a jamais été écrit)."""
+    con = connect(db_path)
+    try:
+        row = con.execute("SELECT version FROM versions WHERE dataset = ?", (name,)).fetchone()
+    finally:
+        con.close()
+    return row[0] if row else 0
+
+
+def changes_since(name, since_version, until_version=None, db_path=None):
+    """
+    Plage de dates (min, max) touchée par les écritures postérieures à
+    `since_version` (jusqu'à `until_version` incluse), ou None si rien n'a changé.
+    """
+    query = "SELECT MIN(min_ts), MAX(max_ts), COUNT(*) FROM changes WHERE dataset = ? AND version > ?"
+    params = [name, since_version]
+    if until_version is not None:
+        query += " AND version <= ?"
+        params.append(until_version)
+    con = connect(db_path)
+    try:
+        row = con.execute(query, params).fetchone()
+    finally:
+        con.close()
+    if not row[2]:
+        return None
+    return (_from_ns(row[0]) if row[0] is not None else None,
+            _from_ns(row[1]) if row[1] is not None else None)
+
+
+def get_meta(key, default=None, db_path=None):
+    con = connect(db_path)
+    try:
+        row = con.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    finally:
+        con.close()
+    return row[0] if row else default
+
+
+def set_meta(key, value, db_path=None):
+    with transaction(db_path) as con:
+        con.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, str(value)),
+        )
+
+
+# --- Instantanés ---
+
+def _snapshot_dir(db_path):
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), SNAPSHOT_DIR)
+
+
+def list_snapshots(db_path=None):
+    """Instantanés existants, du plus ancien au plus récent."""
+    directory = _snapshot_dir(db_path or DB_PATH)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.join(directory, f) for f in os.listdir(directory) if f.endswith(".db"))
+
+
+def snapshot(db_path=None):
+    """
+    Copie cohérente de la base (API de sauvegarde SQLite, sans bloquer les
+    écrivains) dans SNAPSHOT_DIR, publiée par renommage atomique. Seuls les
+    SNAPSHOT_KEEP derniers instantanés sont conservés. Retourne le chemin créé.
+    """
+    db_path = db_path or DB_PATH
+    directory = _snapshot_dir(db_path)
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    base = os.path.splitext(os.path.basename(db_path))[0]
+    target = os.path.join(directory, f"{base}-{stamp}.db")
+
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".db", dir=directory)
+    os.close(fd)
+    source = connect(db_path)
+    try:
+        destination = sqlite3.connect(tmp_path)
+        try:
+            source.backup(destination)
+        finally:
+            destination.close()
+        os.replace(tmp_path, target)
+    finally:
+        source.close()
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp_path)
+
+    for old in list_snapshots(db_path)[:-SNAPSHOT_KEEP]:
+        os.remove(old)
+    set_meta("last_snapshot", datetime.datetime.now().isoformat(), db_path=db_path)
+    return target
+
+
+def maybe_snapshot(db_path=None):
+    """Prend un instantané si le dernier date de plus de SNAPSHOT_INTERVAL."""
+    with write_lock(db_path):  # un seul instantané même si plusieurs écrivains terminent ensemble
+        last = get_meta("last_snapshot", db_path=db_path)
+        if last is None or datetime.datetime.now() - datetime.datetime.fromisoformat(last) >= SNAPSHOT_INTERVAL:
+            return snapshot(db_path)
+    return None
@@ -6,9 +6,8 @@ import streamlit as st
 ##)
 
 import streamlit as st
-import pandas as pd
-import numpy as np
-import time
+import jobs
+import warmup
 
 
 # Define the pages
@@ -22,3 +21,9 @@ pg = st.navigation([main_page, page_2, page_3,page_4])
 
 # Run the selected page
 pg.run()
+
+# Calculs en arrière-plan de cette session (la page est réexécutée à leur fin)
+jobs.status_panel()
+
+# Bibliothèques d'analyse préchargées en arrière-plan, après l'affichage de la page
+warmup.start()
@@ -0,0 +1,87 @@
+from datetime import timedelta
+import storage
+
+# Deux mesures séparées de plus de 30 minutes appartiennent à des groupes différents
+GROUP_GAP = timedelta(minutes=30)
+
+
+def select_lowest_systolic(df):
+    """
+    Identifie des groupes de mesures prises à moins de 30 minutes d'intervalle,
+    puis conserve la ligne avec la valeur systolique la plus basse de chaque groupe.
+    `df` doit être trié par "Date-Heure".
+    """
+    df = df.reset_index(drop=True)
+
+    # Calculer la différence de temps entre une mesure et la précédente
+    time_diff = df["Date-Heure"].diff()
+
+    # Identifier le début de chaque nouveau groupe (écart > 30 mins)
+    # cumsum() crée un identifiant unique pour chaque groupe
+    group_ids = (time_diff > GROUP_GAP).cumsum()
+
+    # Appliquer la logique : pour chaque groupe, trouver l'index de la valeur systolique la plus basse
+    idx_to_keep = df.groupby(group_ids)['Systolique (mmHg)'].idxmin()
+
+    # Créer le DataFrame de synthèse en utilisant ces index
+    return df.loc[idx_to_keep]
+
+
+def _group_bound(source, ts, before, db_path=None):
+    """
+    Remonte (ou descend) de mesure en mesure tant que l'écart reste inférieur à
+    30 minutes : retourne la première (ou dernière) date du groupe contenant `ts`.
+    """
+    while True:
+        neighbour = storage.neighbour_time(source, ts, before=before, db_path=db_path)
+        if neighbour is None or abs(ts - neighbour) > GROUP_GAP:
+            return ts
+        ts = neighbour
+
+
+def _watermark_key(source, target):
+    return f"synthesis_watermark:{source}:{target}"
+
+
+def update_synthesis(source="blood", target="synthese", full=False, db_path=None):
+    """
+    Met à jour la synthèse de `source` dans `target`.
+
+    Le filigrane (watermark) enregistre la dernière version de `source` déjà
+    synthétisée. En mode incrémental, seuls les groupes touchés par les écritures
+    postérieures au filigrane sont recalculés, puis remplacés dans `target` ;
+    les autres lignes de la synthèse ne sont ni relues ni réécrites.
+    `full=True` (ou une première synthèse) recalcule tout l'historique.
+
+    Retourne les lignes de synthèse recalculées, ou None si rien n'a changé.
+    """
+    key = _watermark_key(source, target)
+    while True:
+        # Lecture et calcul sans verrou : les importations ne l'attendent pas
+        current = storage.version(source, db_path=db_path)
+        watermark = int(storage.get_meta(key, 0, db_path=db_path))
+
+        if full or watermark == 0 or storage.version(target, db_path=db_path) == 0:
+            start = end = None
+        else:
+            changed = storage.changes_since(source, watermark, until_version=current, db_path=db_path)
+            if changed is None:
+                return None
+            start, end = changed
+            if start is not None:
+                start = _group_bound(source, start, before=True, db_path=db_path)
+            if end is not None:
+                end = _group_bound(source, end, before=False, db_path=db_path)
+
+        df = storage.read(source, start=start, end=end, db_path=db_path)
+        df_synthese = select_lowest_systolic(df) if not df.empty else df
+
+        # Seuls le remplacement et le filigrane sont faits sous le verrou, après avoir
+        # vérifié que ni `source` (une importation) ni le filigrane (une autre synthèse)
+        # n'ont changé depuis la lecture ; sinon, le calcul est refait.
+        with storage.write_lock(db_path):
+            if (storage.version(source, db_path=db_path) == current
+                    and int(storage.get_meta(key, 0, db_path=db_path)) == watermark):
+                storage.replace_range(target, df_synthese, start=start, end=end, db_path=db_path)
+                storage.set_meta(key, current, db_path=db_path)
+                return df_synthese
@@ -0,0 +1,12 @@
+import os
+import sys
+import pytest
+
+# Les modules de l'application sont à la racine du dépôt
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Base SQLite vide, propre à chaque test."""
+    return str(tmp_path / "myhealth.db")
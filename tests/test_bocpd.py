@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+import bocpd
+import storage
+
+# Niveaux de glycémie planifiés : (premier jour, niveau en mmol/L)
+REGIMES = [("2024-01-01", 6.0), ("2024-04-15", 9.0), ("2024-08-01", 6.5)]
+END = "2024-11-30"
+
+
+def glucose(seed=0):
+    """Quatre mesures par jour autour du niveau de chaque régime."""
+    rng = np.random.default_rng(seed)
+    days = pd.date_range(REGIMES[0][0], END, freq="D")
+    level = pd.Series(np.nan, index=days)
+    for start, value in REGIMES:
+        level[start:] = value
+    times = np.concatenate([days + pd.Timedelta(hours=h) for h in (7, 12, 17, 22)])
+    order = np.argsort(times)
+    values = np.tile(level.to_numpy(), 4)[order] + rng.normal(0, 0.6, len(times))
+    return pd.DataFrame({"Date-Heure": times[order], "Glycémie (mmol/L)": values.round(1),
+                         "Note-1": "", "Note-2": ""})
+
+
+def test_detects_planted_level_shifts(db_path):
+    storage.upsert("glycemie", glucose(), db_path=db_path)
+    assert bocpd.update("glycemie", db_path=db_path) > 0
+    found = storage.read_changepoints("glycemie", db_path=db_path)
+    assert len(found) == len(REGIMES) - 1
+    for (_, before), (start, after), (_, point) in zip(REGIMES, REGIMES[1:], found.iterrows()):
+        assert abs(point["ts"] - pd.Timestamp(start)) <= pd.Timedelta(days=3)
+        assert abs(point["before"] - before) < 0.5 and abs(point["after"] - after) < 0.5
+
+
+def test_monthly_updates_match_full_update(tmp_path):
+    incremental, full = str(tmp_path / "incremental.db"), str(tmp_path / "full.db")
+    df = glucose(1)
+    for _, month in df.groupby(df["Date-Heure"].dt.to_period("M")):
+        storage.upsert("glycemie", month, db_path=incremental)
+        bocpd.update("glycemie", db_path=incremental)
+    storage.upsert("glycemie", df, db_path=full)
+    bocpd.update("glycemie", db_path=full)
+
+    tm.assert_frame_equal(storage.read_changepoints("glycemie", db_path=incremental),
+                          storage.read_changepoints("glycemie", db_path=full))
+    assert bocpd._load_states("glycemie", db_path=incremental) == bocpd._load_states("glycemie", db_path=full)
+    assert bocpd.update("glycemie", db_path=incremental) is None
+
+
+def test_correction_before_processed_days_restarts(tmp_path):
+    corrected, fresh = str(tmp_path / "corrected.db"), str(tmp_path / "fresh.db")
+    df = glucose(2)
+    storage.upsert("glycemie", df, db_path=corrected)
+    bocpd.update("glycemie", db_path=corrected)
+
+    # Correction de la première mesure : le détecteur repart du début
+    fix = df.iloc[:1].assign(**{"Glycémie (mmol/L)": 6.2})
+    storage.upsert("glycemie", fix, policy="replace", db_path=corrected)
+    bocpd.update("glycemie", db_path=corrected)
+    storage.upsert("glycemie", pd.concat([fix, df.iloc[1:]]), db_path=fresh)
+    bocpd.update("glycemie", db_path=fresh)
+    tm.assert_frame_equal(storage.read_changepoints("glycemie", db_path=corrected),
+                          storage.read_changepoints("glycemie", db_path=fresh))
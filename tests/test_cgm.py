@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import pytest
+import cgm
+import storage
+
+
+def readings(times, values):
+    return pd.DataFrame({"Date-Heure": pd.to_datetime(times), cgm.VALUE_COL: values, "Note-1": "", "Note-2": ""})
+
+
+def sensor(start="2024-01-01", days=60, seed=0):
+    """Une mesure toutes les 5 minutes, avec quelques trous."""
+    rng = np.random.default_rng(seed)
+    times = pd.date_range(start, periods=days * 288, freq="5min")
+    times = times[rng.random(len(times)) > 0.05]
+    return readings(times, rng.normal(7.5, 2.5, len(times)).clip(2, 20).round(1))
+
+
+@pytest.fixture
+def default_db(db_path, monkeypatch):
+    """Base temporaire utilisée par les fonctions d'affichage (sans db_path)."""
+    monkeypatch.setattr(storage, "DB_PATH", db_path)
+    cgm._cached_hourly.clear()
+    return db_path
+
+
+def test_incremental_hourly_sums_match_full_recompute(tmp_path):
+    incremental, full = str(tmp_path / "incremental.db"), str(tmp_path / "full.db")
+    df = sensor()
+    late = readings(["2024-01-10 08:02", "2024-02-01 23:59"], [25.0, 2.5])  # dans des heures déjà résumées
+    batches = [month for _, month in df.groupby(df["Date-Heure"].dt.to_period("M"))] + [late]
+    for batch in batches:
+        storage.upsert("glycemie", batch, db_path=incremental)
+        assert cgm.update_hourly(db_path=incremental) > 0
+    assert cgm.update_hourly(db_path=incremental) is None
+
+    for batch in batches:
+        storage.upsert("glycemie", batch, db_path=full)
+    cgm.update_hourly(full=True, db_path=full)
+    expected = storage.read(cgm.HOURLY, db_path=full)
+    assert expected["Mesures"].sum() == len(df) + len(late)
+    pd.testing.assert_frame_equal(storage.read(cgm.HOURLY, db_path=incremental), expected)
+
+
+def test_hourly_catches_up_at_display(default_db):
+    storage.upsert("glycemie", sensor(days=2), db_path=default_db)
+    sums = cgm.hourly()
+    assert len(sums) == 48
+    pd.testing.assert_frame_equal(sums, cgm.hourly_sums(storage.read("glycemie", db_path=default_db)))
+
+
+def test_summary_range_percentages_on_boundaries(default_db):
+    values = [2.9, 3.0, 3.8, 3.9, 10.0, 10.1, 13.9, 14.0]
+    times = pd.date_range("2024-01-01 08:00", periods=len(values), freq="5min")
+    storage.upsert("glycemie", readings(times, values), db_path=default_db)
+
+    summary = cgm.summary()
+    assert summary["Plages"] == {"Très bas": 12.5, "Bas": 25.0, "Dans la cible": 25.0,
+                                 "Haut": 25.0, "Très haut": 12.5}
+    assert summary["Mesures"] == 8
+    assert summary["Moyenne"] == pytest.approx(np.mean(values))
+    assert summary["Écart-type"] == pytest.approx(np.std(values, ddof=1))
+    assert summary["CV"] == pytest.approx(100 * np.std(values, ddof=1) / np.mean(values))
+    assert summary["Temps de capture"] == pytest.approx(100 * 8 / 12)  # 8 mesures sur 12 attendues en une heure
+
+
+def test_rolling_means_match_raw_readings(default_db):
+    df = sensor(days=20, seed=1)
+    storage.upsert("glycemie", df, db_path=default_db)
+    means = cgm.rolling_means(start="2024-01-15").set_index("Heure")
+    assert means.index[0] == pd.Timestamp("2024-01-15")
+
+    hours = df["Date-Heure"].dt.floor("h")
+    for label, window in cgm.ROLLING_WINDOWS.items():
+        for hour in [pd.Timestamp("2024-01-15 00:00"), means.index[-1]]:
+            inside = (hours > hour - pd.Timedelta(window)) & (hours <= hour)
+            assert means.loc[hour, label] == pytest.approx(df.loc[inside, cgm.VALUE_COL].mean())
+
+
+def test_agp_percentiles_by_time_of_day(default_db):
+    days = pd.date_range("2024-01-01", periods=11, freq="D")
+    morning = np.arange(4.0, 15.0)
+    storage.upsert("glycemie", pd.concat([
+        readings(days + pd.Timedelta(hours=8, minutes=5), morning),
+        readings(days + pd.Timedelta(hours=20), 6.0),
+    ]), db_path=default_db)
+
+    profile = cgm.agp().set_index("Heure du jour")
+    assert list(profile.index) == [pd.Timestamp("2000-01-01 08:00"), pd.Timestamp("2000-01-01 20:00")]
+    for p in cgm.AGP_PERCENTILES:
+        assert profile.loc["2000-01-01 08:00", f"p{p}"] == pytest.approx(np.percentile(morning, p))
+        assert profile.loc["2000-01-01 20:00", f"p{p}"] == 6.0
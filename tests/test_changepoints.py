@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+import ruptures as rpt
+import changepoints
+
+
+def piecewise_signal(seed, n=240):
+    """Signal par morceaux : niveaux et écarts-types tirés au hasard entre 4 ruptures."""
+    rng = np.random.default_rng(seed)
+    bounds = np.r_[0, np.sort(rng.choice(np.arange(10, n - 10), 4, replace=False)), n]
+    levels, scales = rng.normal(0, 5, len(bounds) - 1), rng.uniform(0.5, 3, len(bounds) - 1)
+    return np.concatenate([rng.normal(level, scale, end - start)
+                           for level, scale, start, end in zip(levels, scales, bounds[:-1], bounds[1:])])
+
+
+@pytest.mark.parametrize("model", ["l2", "normal"])
+@pytest.mark.parametrize("seed", range(5))
+def test_pelt_cumsum_matches_ruptures(model, seed):
+    signal = piecewise_signal(seed)
+    algo = rpt.Pelt(model=model, min_size=changepoints.MIN_SIZE, jump=changepoints.JUMP).fit(signal)
+    for pen in changepoints.PENALTIES:
+        assert changepoints.pelt_cumsum(signal, pen, model=model) == algo.predict(pen=pen), pen
+
+
+def test_pelt_cumsum_short_signal():
+    assert changepoints.pelt_cumsum(np.array([1.0, 2.0, 3.0]), 5) == [3]
+
+
+def test_breakpoint_indices():
+    dates = ["2024-01-01", "2024-01-02", "2024-01-03", "2024-01-04"]
+    assert changepoints.breakpoint_indices(dates, ["2024-01-01", "2024-01-03", "2024-01-03"]) == [2, 4]
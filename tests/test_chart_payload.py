@@ -0,0 +1,56 @@
+import base64
+import json
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+import chart_payload
+
+
+def decode(values):
+    """Tableau binaire d'une trace de la spécification JSON, comme le lit plotly.js."""
+    return np.frombuffer(base64.b64decode(values["bdata"]), dtype=values["dtype"])
+
+
+def sent(fig):
+    """Traces de la spécification envoyée au navigateur."""
+    return json.loads(pio.to_json(chart_payload.compact(fig), validate=False))
+
+
+def test_dates_and_values_round_trip_with_gaps():
+    dates = pd.Series([pd.Timestamp("2024-10-01 08:15:00.123"), pd.Timestamp("2024-10-01 12:00"), pd.NaT,
+                       pd.Timestamp("2024-10-02 07:30:59")])
+    values = np.array([7.25, np.nan, 6.1, 123.456])
+    spec = sent(go.Figure(go.Scatter(x=dates, y=values)))
+
+    trace = spec["data"][0]
+    assert spec["layout"]["xaxis"]["type"] == "date"
+    x, y = decode(trace["x"]), decode(trace["y"])
+    assert x.dtype == np.float64 and y.dtype == np.float32
+    # Dates sans fuseau : millisecondes depuis l'époque, lues telles quelles (pas de décalage UTC)
+    assert np.isnan(x[2])
+    assert list(pd.to_datetime(x[[0, 1, 3]], unit="ms")) == list(dates.iloc[[0, 1, 3]])
+    assert np.isnan(y[1])
+    np.testing.assert_allclose(y[[0, 2, 3]], values[[0, 2, 3]], rtol=1e-6)
+
+
+def test_integer_and_object_values_become_float32():
+    dates = pd.date_range("2024-01-01", periods=3, freq="D")
+    fig = go.Figure([go.Scatter(x=dates, y=np.array([120, 135, 128])),
+                     go.Scatter(x=dates.to_pydatetime(), y=np.array([72, None, 70.5], dtype=object), xaxis="x2")],
+                    layout={"xaxis2": {"anchor": "y", "overlaying": "x"}})
+    spec = sent(fig)
+    assert spec["layout"]["xaxis2"]["type"] == "date"
+    for trace, expected in zip(spec["data"], ([120, 135, 128], [72, np.nan, 70.5])):
+        assert list(pd.to_datetime(decode(trace["x"]), unit="ms")) == list(dates)
+        np.testing.assert_array_equal(decode(trace["y"]), np.array(expected, dtype="float32"))
+
+
+def test_text_values_and_cached_figures_are_left_as_is():
+    fig = go.Figure(go.Scatter(x=["a", "b"], y=["bas", "haut"]))
+    spec = sent(fig)
+    assert spec["data"][0]["x"] == ["a", "b"] and spec["data"][0]["y"] == ["bas", "haut"]
+
+    dates = pd.date_range("2024-01-01", periods=2, freq="D")
+    cached = pio.from_json(pio.to_json(chart_payload.compact(go.Figure(go.Scatter(x=dates, y=[1.0, 2.0])))))
+    assert sent(cached)["data"] == sent(go.Figure(go.Scatter(x=dates, y=[1.0, 2.0])))["data"]
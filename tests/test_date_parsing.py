@@ -0,0 +1,61 @@
+import pandas as pd
+import date_parsing
+
+# Abréviations des exports du lecteur de glycémie, telles que remplacées par l'ancienne page
+BASELINE_MONTHS = {
+    "janv.": "01", "févr.": "02", "mars": "03", "avr.": "04",
+    "mai": "05", "juin": "06", "juill.'": "07", "juill.": "07",
+    "août": "08", "sept.": "09", "oct.": "10", "nov.": "11", "déc.": "12",
+}
+
+
+def baseline(series):
+    """Conversion d'origine : remplacement des noms de mois, puis pd.to_datetime avec un format fixe."""
+    text = series.astype(str)
+    for month, number in BASELINE_MONTHS.items():
+        text = text.str.replace(month, number, regex=False)
+    return pd.to_datetime(text, format="%d %m %Y, %H h %M", errors="coerce").astype("datetime64[ns]")
+
+
+def test_matches_baseline_for_every_month():
+    values = pd.Series([f"{day} {month} 2025, {hour} h {minute:02d}"
+                        for month in BASELINE_MONTHS
+                        for day, hour, minute in [(3, 9, 51), (28, 23, 5), (1, 0, 0)]])
+    parsed = date_parsing.parse_french_datetimes(values)
+    assert parsed.notna().all()
+    pd.testing.assert_series_equal(parsed, baseline(values), check_names=False)
+
+
+def test_one_digit_day_and_hour():
+    values = pd.Series(["3 sept. 2025, 9 h 51", "03 sept. 2025, 09 h 51", "7 févr. 2024, 0 h 5"])
+    parsed = date_parsing.parse_french_datetimes(values)
+    assert list(parsed) == [pd.Timestamp("2025-09-03 09:51"), pd.Timestamp("2025-09-03 09:51"),
+                            pd.Timestamp("2024-02-07 00:05")]
+    pd.testing.assert_series_equal(parsed, baseline(values), check_names=False)
+
+
+def test_full_and_unaccented_month_names():
+    values = pd.Series(["14 février 2024, 12 h 00", "14 fevr. 2024, 12 h 00", "1 août 2024, 8 h 30",
+                        "1 aout 2024, 8 h 30", "24 décembre 2023, 18 h 45", "24 dec. 2023, 18 h 45"])
+    parsed = date_parsing.parse_french_datetimes(values)
+    assert list(parsed[::2]) == list(parsed[1::2]) == [pd.Timestamp("2024-02-14 12:00"),
+                                                        pd.Timestamp("2024-08-01 08:30"),
+                                                        pd.Timestamp("2023-12-24 18:45")]
+
+
+def test_unparseable_values_become_nat():
+    values = pd.Series(["", "n/a", "32 janv. 2025, 10 h 00", "3 foo 2025, 10 h 00", "3 sept. 2025, 24 h 00",
+                        "3 sept. 2025, 10 h 60", "3 sept. 2025", "3 sept. 2025, 10 h 00"], index=range(10, 18))
+    parsed = date_parsing.parse_french_datetimes(values)
+    assert list(parsed.index) == list(values.index)
+    assert parsed.isna().tolist() == [True] * 7 + [False]
+    assert parsed.isna().tolist() == baseline(values).isna().tolist()
+
+
+def test_parse_datetimes_falls_back_to_french_format():
+    values = pd.Series(["2024-03-01 08:15", "3 sept. 2025, 9 h 51", None, "pas une date", "2024-03-01 08:15"])
+    parsed = date_parsing.parse_datetimes(values)
+    assert parsed.dtype == "datetime64[ns]"
+    assert parsed.tolist()[:2] == [pd.Timestamp("2024-03-01 08:15"), pd.Timestamp("2025-09-03 09:51")]
+    assert parsed.isna().tolist() == [False, False, True, True, False]
+    assert parsed.iloc[4] == parsed.iloc[0]
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+import downsampling
+
+
+def series(n=20_000, seed=0):
+    """Marche aléatoire sur des dates irrégulières, avec quelques pics et des valeurs manquantes."""
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp("2024-01-01") + pd.to_timedelta(np.cumsum(rng.integers(1, 600, n)), unit="s")
+    y = np.cumsum(rng.normal(0, 1, n))
+    y[rng.choice(n, 10, replace=False)] += rng.choice([-50, 50], 10)
+    y[rng.choice(n, 200, replace=False)] = np.nan
+    return pd.DataFrame({"Date": dates, "Valeur": y, "Autre": -y})
+
+
+@pytest.mark.parametrize("n_out", [3, 100, 2000])
+def test_lttb_keeps_ends_and_threshold(n_out):
+    df = series().dropna()
+    x, y = downsampling._to_numeric(df["Date"]), df["Valeur"].to_numpy()
+    indices = downsampling.lttb_indices(x, y, n_out)
+    assert len(indices) == n_out
+    assert indices[0] == 0 and indices[-1] == len(x) - 1
+    assert (np.diff(indices) > 0).all()
+
+
+def test_lttb_small_inputs_are_unchanged():
+    x = np.arange(10.0)
+    assert list(downsampling.lttb_indices(x, x, 10)) == list(range(10))
+    assert list(downsampling.lttb_indices(x, x, 2)) == list(range(10))
+
+
+def test_minmax_keeps_extrema_of_each_bucket():
+    df = series().dropna()
+    x, y = downsampling._to_numeric(df["Date"]), df["Valeur"].to_numpy()
+    n_buckets = 50
+    indices = downsampling.minmax_indices(x, y, n_buckets)
+    assert len(indices) <= 2 * n_buckets
+
+    buckets = np.minimum(((x - x[0]) / (x[-1] - x[0]) * n_buckets).astype(int), n_buckets - 1)
+    kept = pd.Series(y[indices], index=buckets[indices]).groupby(level=0)
+    by_bucket = pd.Series(y, index=buckets).groupby(level=0)
+    pd.testing.assert_series_equal(kept.min(), by_bucket.min())
+    pd.testing.assert_series_equal(kept.max(), by_bucket.max())
+
+
+@pytest.mark.parametrize("method", ["lttb", "minmax"])
+def test_downsample_merges_series_within_threshold(method):
+    df = series()
+    n_out = 1000
+    out = downsampling.downsample(df, "Date", ["Valeur", "Autre"], n_out=n_out, method=method)
+    # Au plus n_out points par série ; les points des deux séries sont réunis
+    assert len(out) <= 2 * n_out
+    assert out["Date"].is_monotonic_increasing
+    for col in ["Valeur", "Autre"]:
+        valid, kept = df[col].dropna(), out[col].dropna()
+        if method == "lttb":
+            assert kept.index[0] == valid.index[0] and kept.index[-1] == valid.index[-1]
+        else:
+            assert kept.max() == valid.max() and kept.min() == valid.min()
+
+
+def test_downsample_single_series_respects_threshold():
+    df = series()
+    for method in ["lttb", "minmax"]:
+        assert len(downsampling.downsample(df, "Date", "Valeur", n_out=500, method=method)) <= 500
+    short = df.iloc[:100]
+    assert downsampling.downsample(short, "Date", "Valeur", n_out=500) is short
+
+
+def test_render_mode_switches_above_webgl_threshold():
+    threshold = downsampling.WEBGL_THRESHOLD
+    assert downsampling.render_mode(threshold) == "svg"
+    assert downsampling.render_mode(threshold + 1) == "webgl"
+    assert not downsampling.use_webgl(0)
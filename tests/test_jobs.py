@@ -0,0 +1,31 @@
+import os
+import sys
+import types
+import jobs
+
+
+def test_pool_workers_do_not_rerun_the_page(tmp_path, monkeypatch):
+    marker = tmp_path / "ran"
+    page = tmp_path / "page.py"
+    page.write_text(f"open({str(marker)!r}, 'w').close()\n")
+    # Module __main__ d'une page Streamlit : un processus "spawn" le réexécuterait
+    main = types.ModuleType("__main__")
+    main.__file__ = str(page)
+    monkeypatch.setitem(sys.modules, "__main__", main)
+    monkeypatch.setattr(jobs, "_executor", None)
+    monkeypatch.setattr(jobs, "MAX_WORKERS", 1)
+
+    try:
+        assert jobs._pool().submit(os.getpid).result(timeout=60) != os.getpid()
+    finally:
+        jobs._executor.shutdown()
+    assert not marker.exists()
+    assert sys.modules["__main__"] is main
+
+
+def test_neutral_main_keeps_a_page_set_meanwhile(monkeypatch):
+    monkeypatch.setitem(sys.modules, "__main__", types.ModuleType("__main__"))
+    rerun = types.ModuleType("__main__")
+    with jobs._neutral_main():
+        sys.modules["__main__"] = rerun  # rerun d'une autre session pendant le lancement
+    assert sys.modules["__main__"] is rerun
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import ledger
+import pipeline
+import storage
+
+
+def export(days, kg=70.0, start="2024-01-01"):
+    """Export brut de la balance (valeurs en texte, comme un CSV lu par pipeline.read_export)."""
+    dates = pd.date_range(start, periods=days, freq="D")
+    kg = np.broadcast_to(kg, days)
+    return pd.DataFrame({"Date": dates.strftime("%Y-%m-%d %H:%M"),
+                         "Poids_kg": [f"{k:.1f}" for k in kg],
+                         "Poids_lbs": [f"{k * 2.20462:.1f}" for k in kg]})
+
+
+def test_blocks_end_on_boundary_rows():
+    df = export(2000, kg=np.linspace(60, 90, 2000))
+    digests, block_of_row = ledger.block_digests(df)
+    rows = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    boundaries = np.flatnonzero(rows % ledger.BLOCK_ROWS == 0)
+    # Une ligne frontière est la dernière de son bloc ; les blocs se suivent
+    assert (np.diff(block_of_row) >= 0).all()
+    last_of_block = np.flatnonzero(np.diff(block_of_row))
+    assert list(last_of_block) == [i for i in boundaries if i < len(df) - 1]
+    assert len(digests) == block_of_row[-1] + 1
+
+
+def test_block_digests_stable_when_rows_added_around():
+    df = export(2000, kg=np.linspace(60, 90, 2000))
+    digests = set(ledger.block_digests(df)[0])
+    before = export(100, kg=55.0, start="2023-01-01")
+    after = export(100, kg=95.0, start="2030-01-01")
+    extended = set(ledger.block_digests(pd.concat([before, df, after], ignore_index=True))[0])
+    # Seuls les blocs touchant les lignes ajoutées changent
+    assert len(digests - extended) <= 2
+    assert ledger.block_digests(df.iloc[:0])[0] == []
+
+
+def test_new_rows_skips_recorded_blocks(db_path):
+    df = export(1000, kg=np.linspace(60, 90, 1000))
+    rows, pending, known = ledger.new_rows("poids", df, db_path=db_path)
+    assert len(rows) == len(df) and known == 0
+    ledger.record("poids", pending, db_path=db_path)
+
+    cumulative = pd.concat([df, export(30, kg=80.0, start="2030-01-01")], ignore_index=True)
+    rows, pending, known = ledger.new_rows("poids", cumulative, db_path=db_path)
+    assert known > 0 and known + len(rows) == len(cumulative)
+    assert set(rows.index) >= set(range(len(df), len(cumulative)))
+
+
+def test_file_key_depends_on_policy_and_columns():
+    digest = "0" * 64
+    assert ledger.file_key(digest) == digest
+    keys = {ledger.file_key(digest, ["poids"], policy=policy) for policy in storage.CONFLICT_POLICIES}
+    assert len(keys) == len(storage.CONFLICT_POLICIES)
+    assert ledger.file_key(digest, ["poids", "A"], "keep") != ledger.file_key(digest, ["poids", "B"], "keep")
+    assert ledger.consulted("keep") and ledger.consulted("fill") and not ledger.consulted("replace")
+
+
+def weights(db_path):
+    return storage.read("poids", db_path=db_path)["Poids_kg"].tolist()
+
+
+def test_reimport_with_replace_overwrites_later_file(db_path):
+    a, b = export(200, kg=70.0), export(200, kg=80.0)
+    key_a, key_b = ledger.file_key("a", policy="replace"), ledger.file_key("b", policy="replace")
+    pipeline.ingest("poids", a, policy="replace", key=key_a, db_path=db_path)
+    pipeline.ingest("poids", b, policy="replace", key=key_b, db_path=db_path)
+    assert weights(db_path) == [80.0] * 200
+
+    report = pipeline.ingest("poids", a, policy="replace", key=key_a, db_path=db_path)
+    assert report["known"] == 0 and report["updated"] == 200
+    assert weights(db_path) == [70.0] * 200
+
+
+def test_reimport_with_keep_skips_known_blocks(db_path):
+    a = export(200, kg=70.0)
+    report = pipeline.ingest("poids", a, policy="keep", key=ledger.file_key("a", policy="keep"), db_path=db_path)
+    assert report["inserted"] == 200
+    assert ledger.imported_file(ledger.file_key("a", policy="keep"), db_path=db_path)["rows"] == 200
+
+    report = pipeline.ingest("poids", a, policy="keep", db_path=db_path)
+    assert report == {"inserted": 0, "updated": 0, "skipped": 200, "known": 200}
@@ -0,0 +1,43 @@
+import os
+import pandas as pd
+import pytest
+from streamlit.testing.v1 import AppTest
+import jobs
+import storage
+
+PAGE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "page2.py")
+
+
+@pytest.fixture
+def page(db_path, monkeypatch):
+    """Page 2 sur une base temporaire, avec une synthèse terminée sans nouvelle ligne."""
+    monkeypatch.setattr(storage, "DB_PATH", db_path)
+    monkeypatch.setattr(jobs, "poll", lambda group, key: ("done", None))
+    storage.upsert("blood", pd.DataFrame({
+        "Date-Heure": pd.to_datetime(["2024-01-01 08:00"]),
+        "Systolique (mmHg)": [120], "Diastolique (mmHg)": [80], "Pouls (bpm)": [60], "Notes": [""],
+    }), db_path=db_path)
+    app = AppTest.from_file(PAGE, default_timeout=30)
+    app.session_state["synthesis_job"] = (("synthese", "blood", "synthese"), (1, 0, False))
+    return app
+
+
+def warnings(app):
+    return [w.value for w in app.warning]
+
+
+def test_synthesis_never_written_warns(page):
+    page.run()
+    assert not page.exception
+    assert "Le jeu de données 'synthese' est vide." in warnings(page)
+
+
+def test_empty_synthesis_warns(page, db_path):
+    # Synthèse déjà écrite, puis vidée
+    storage.upsert("synthese", storage.read("blood", db_path=db_path), db_path=db_path)
+    storage.replace_range("synthese", pd.DataFrame({"Date-Heure": pd.to_datetime([])}), db_path=db_path)
+    assert storage.version("synthese", db_path=db_path) > 0
+    page.run()
+    assert not page.exception
+    assert "Le jeu de données 'synthese' est vide." in warnings(page)
+    assert "df_synthese" not in page.session_state
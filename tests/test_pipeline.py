@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import pytest
+import pipeline
+import storage
+
+MONTHS = ["janv.", "févr.", "mars", "avr.", "mai", "juin", "juil.", "août", "sept.", "oct.", "nov.", "déc."]
+# Export du lecteur de glycémie, avec ses propres noms de colonnes
+COLUMNS = {"glycemie": {"Date-Heure": "Horodatage", "Glycémie (mmol/L)": "Glucose",
+                        "Note-1": "Repas", "Note-2": "Notes"}}
+
+
+def glucose_export(path, times, seed=0):
+    rng = np.random.default_rng(seed)
+    pd.DataFrame({
+        "Horodatage": [f"{t.day} {MONTHS[t.month - 1]} {t.year}, {t.hour:02d} h {t.minute:02d}" for t in times],
+        "Glucose": rng.normal(7, 1.5, len(times)).round(1),
+        "Repas": "", "Notes": "",
+    }).to_csv(path, index=False)
+
+
+def weight_export(path, days):
+    dates = pd.date_range("2024-01-01 07:00", periods=days, freq="D")
+    kg = np.linspace(80, 78, days).round(1)
+    pd.DataFrame({"Date": dates.strftime("%Y-%m-%d %H:%M"), "Poids_kg": kg, "Poids_lbs": (kg * 2.20462).round(1)}
+                 ).to_csv(path, index=False)
+
+
+JANUARY = pd.date_range("2024-01-01", "2024-01-31 23:59", freq="15min")
+FEBRUARY = pd.date_range("2024-02-01", "2024-02-29 23:59", freq="15min")
+
+
+@pytest.fixture
+def exports(tmp_path):
+    folder = tmp_path / "exports"
+    folder.mkdir()
+    glucose_export(folder / "glycemie.csv", JANUARY)
+    weight_export(folder / "poids.csv", 30)
+    return folder
+
+
+def by_dataset(result):
+    return {entry["dataset"]: entry for entry in result["files"]}
+
+
+def test_detect_and_map_columns():
+    assert pipeline.detect_dataset(["Date", "Poids_kg", "Poids_lbs"]) == "poids"
+    assert pipeline.detect_dataset(["Date-Heure", "Glycémie (mmol/L)"]) == "glycemie"  # notes facultatives
+    assert pipeline.detect_dataset(["Horodatage", "Glucose"]) is None
+
+    df = pd.DataFrame({"Horodatage": ["1 janv. 2024, 08 h 00"], "Glucose": [6.1], "Repas": [""], "Notes": [""]})
+    name, mapped = pipeline.map_columns(df, COLUMNS)
+    assert name == "glycemie"
+    assert list(mapped.columns) == ["Date-Heure", "Glycémie (mmol/L)", "Note-1", "Note-2"]
+    name, unmapped = pipeline.map_columns(df.drop(columns="Glucose"), COLUMNS)
+    assert name is None and list(unmapped.columns) == ["Horodatage", "Repas", "Notes"]
+
+
+@pytest.mark.parametrize("policy", ["keep", "fill"])
+def test_run_then_rerun_skips_imported_files(exports, db_path, policy):
+    result = pipeline.run([str(exports)], workers=1, policy=policy, db_path=db_path, columns=COLUMNS)
+    files = by_dataset(result)
+    assert result["errors"] == 0
+    assert files["glycemie"]["inserted"] == len(JANUARY)
+    assert files["poids"]["inserted"] == 30
+    assert result["derived"]["Sommes horaires CGM"] == 31 * 24
+    summary = pipeline.format_summary(result)
+    assert f"{exports / 'poids.csv'} -> poids : 30 mesures ajoutées, 0 modifiées, 0 ignorées" in summary
+    assert "Sommes horaires CGM : 744 heures recalculées" in summary
+
+    versions = {name: storage.version(name, db_path=db_path) for name in storage.DATASETS}
+    rerun = pipeline.run([str(exports)], workers=1, policy=policy, db_path=db_path, columns=COLUMNS)
+    assert all("imported_at" in entry for entry in rerun["files"])
+    assert all(value is None for value in rerun["derived"].values())
+    assert {name: storage.version(name, db_path=db_path) for name in storage.DATASETS} == versions
+    summary = pipeline.format_summary(rerun)
+    assert f"{exports / 'glycemie.csv'} -> glycemie : déjà importé le" in summary
+    assert "Sommes horaires CGM : à jour" in summary
+    assert "2 fichiers (2 déjà importés, 0 en échec)" in summary
+
+
+@pytest.mark.parametrize("policy", ["keep", "fill"])
+def test_cumulative_export_only_processes_new_blocks(exports, db_path, policy):
+    pipeline.run([str(exports)], workers=1, policy=policy, db_path=db_path, columns=COLUMNS)
+    # Nouvel export du lecteur : janvier à nouveau, puis février
+    cumulative = exports.parent / "cumulatif.csv"
+    glucose_export(cumulative, JANUARY)
+    february = exports.parent / "fevrier.csv"
+    glucose_export(february, FEBRUARY, seed=1)
+    pd.concat([pd.read_csv(cumulative, dtype=str), pd.read_csv(february, dtype=str)]).to_csv(cumulative, index=False)
+
+    result = pipeline.run([str(cumulative)], workers=1, policy=policy, db_path=db_path, columns=COLUMNS)
+    entry = by_dataset(result)["glycemie"]
+    assert entry["inserted"] == len(FEBRUARY) and entry["updated"] == 0
+    assert entry["known"] > 0.9 * len(JANUARY)
+    assert entry["skipped"] == len(JANUARY)
+    assert "reconnues sans relecture" in pipeline.format_summary(result)
+
+
+def test_replace_reprocesses_and_unreadable_file_is_reported(exports, db_path):
+    pipeline.run([str(exports)], workers=1, db_path=db_path, columns=COLUMNS)
+    (exports / "inconnu.csv").write_text("a,b\n1,2\n")
+    result = pipeline.run([str(exports)], workers=1, db_path=db_path, columns=COLUMNS)
+    files = {entry["file"].rsplit("/", 1)[-1]: entry for entry in result["files"]}
+    assert result["errors"] == 1 and "colonnes non reconnues" in files["inconnu.csv"]["error"]
+    assert files["glycemie.csv"]["known"] == 0 and files["glycemie.csv"]["skipped"] == len(JANUARY)
+    assert "ÉCHEC" in pipeline.format_summary(result)
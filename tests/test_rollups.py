@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+import rollups
+import storage
+
+METRIC = "Glycémie (mmol/L)"
+# Résolution -> règle de resample équivalente (périodes étiquetées par leur début)
+RESAMPLE = {"day": {"rule": "D"},
+            "week": {"rule": "W-MON", "label": "left", "closed": "left"},
+            "month": {"rule": "MS"}}
+
+
+def glucose(start="2024-01-01", periods=800, freq="3h", seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({"Date-Heure": pd.date_range(start, periods=periods, freq=freq),
+                         METRIC: rng.normal(7, 1.5, periods).round(1), "Note-1": "", "Note-2": ""})
+
+
+def expected(df, resolution):
+    """Agrégats calculés directement par resample sur les mesures brutes."""
+    grouped = df.set_index("Date-Heure")[METRIC].resample(**RESAMPLE[resolution])
+    stats = pd.DataFrame({"count": grouped.count(), "mean": grouped.mean(), "min": grouped.min(),
+                          "max": grouped.max(), "p10": grouped.quantile(0.1), "p90": grouped.quantile(0.9)})
+    stats = stats[stats["count"] > 0].rename_axis("bucket").reset_index()
+    return stats.astype({"count": "int64"})
+
+
+def stored(resolution, db_path):
+    return storage.read_rollups("glycemie", METRIC, resolution, db_path=db_path)
+
+
+@pytest.mark.parametrize("resolution", list(rollups.RESOLUTIONS))
+def test_rollups_match_resample_of_raw_rows(db_path, resolution):
+    df = glucose()
+    storage.upsert("glycemie", df, db_path=db_path)
+    assert rollups.update_rollups("glycemie", db_path=db_path) > 0
+    pd.testing.assert_frame_equal(stored(resolution, db_path), expected(df, resolution), check_dtype=False)
+
+
+def test_late_write_recomputes_only_its_buckets(db_path):
+    df = glucose()
+    storage.upsert("glycemie", df, db_path=db_path)
+    rollups.update_rollups("glycemie", db_path=db_path)
+    before = {resolution: stored(resolution, db_path) for resolution in rollups.RESOLUTIONS}
+
+    late = pd.DataFrame({"Date-Heure": [pd.Timestamp("2024-02-14 10:30")], METRIC: [25.0],
+                         "Note-1": "", "Note-2": ""})
+    storage.upsert("glycemie", late, db_path=db_path)
+    # Un jour, une semaine et un mois recalculés
+    assert rollups.update_rollups("glycemie", db_path=db_path) == 3
+    assert rollups.update_rollups("glycemie", db_path=db_path) is None
+
+    both = pd.concat([df, late]).sort_values("Date-Heure")
+    touched = {"day": "2024-02-14", "week": "2024-02-12", "month": "2024-02-01"}
+    for resolution, bucket in touched.items():
+        after = stored(resolution, db_path)
+        pd.testing.assert_frame_equal(after, expected(both, resolution), check_dtype=False)
+        changed = after.compare(before[resolution])
+        assert list(after.loc[changed.index, "bucket"]) == [pd.Timestamp(bucket)]
+
+
+@pytest.fixture
+def daily(db_path, monkeypatch):
+    """Une mesure par jour pendant onze ans, dans la base par défaut."""
+    monkeypatch.setattr(storage, "DB_PATH", db_path)
+    monkeypatch.setattr(rollups, "RAW_MAX_POINTS", 10)
+    storage.upsert("glycemie", glucose("2014-01-01", periods=4018, freq="D"), db_path=db_path)
+
+
+@pytest.mark.parametrize("start, end, resolution", [
+    ("2014-01-01", "2023-12-31", "month"),  # 120 mois
+    ("2014-01-01", "2023-11-30", "week"),   # 119 mois
+    ("2020-01-06", "2022-04-18", "week"),   # 120 semaines
+    ("2020-01-06", "2022-04-17", "day"),    # 119 semaines
+    ("2020-01-01", "2020-04-29", "day"),    # 120 jours
+    ("2020-01-01", "2020-04-28", None),     # 119 jours : points bruts sous-échantillonnés
+    ("2020-01-01", "2020-01-05", None),     # peu de mesures : points bruts
+    (None, None, "month"),
+])
+def test_choose_resolution_at_span_thresholds(daily, start, end, resolution):
+    assert rollups.choose_resolution("glycemie", start, end) == resolution
@@ -0,0 +1,139 @@
+import threading
+import pandas as pd
+import pytest
+import storage
+
+
+def weights(days, kg, start="2024-01-01"):
+    dates = pd.date_range(start, periods=days, freq="D")
+    return pd.DataFrame({"Date": dates, "Poids_kg": kg, "Poids_lbs": [k * 2.20462 for k in kg]})
+
+
+def test_read_returns_rows_sorted_by_date(db_path):
+    df = weights(3, [70.0, 71.0, 72.0]).iloc[[2, 0, 1]]
+    storage.write("poids", df, db_path=db_path)
+    stored = storage.read("poids", db_path=db_path)
+    assert stored["Date"].tolist() == list(pd.date_range("2024-01-01", periods=3, freq="D"))
+    assert stored["Poids_kg"].tolist() == [70.0, 71.0, 72.0]
+
+
+def test_rewritten_timestamp_replaces_the_row(db_path):
+    storage.write("poids", weights(2, [70.0, 71.0]), db_path=db_path)
+    storage.write("poids", weights(1, [69.5], start="2024-01-02"), db_path=db_path)
+    assert storage.read("poids", db_path=db_path)["Poids_kg"].tolist() == [70.0, 69.5]
+
+
+def test_each_write_bumps_the_version_and_records_its_range(db_path):
+    assert storage.version("poids", db_path=db_path) == 0
+    storage.write("poids", weights(3, [70.0, 71.0, 72.0]), db_path=db_path)
+    storage.write("poids", weights(1, [73.0], start="2024-01-10"), db_path=db_path)
+    assert storage.version("poids", db_path=db_path) == 2
+    assert storage.changes_since("poids", 1, db_path=db_path) == (pd.Timestamp("2024-01-10"),) * 2
+    assert storage.changes_since("poids", 0, db_path=db_path) == (pd.Timestamp("2024-01-01"),
+                                                                  pd.Timestamp("2024-01-10"))
+    assert storage.changes_since("poids", 2, db_path=db_path) is None
+
+
+def test_replace_range_swaps_only_the_range(db_path):
+    storage.write("poids", weights(5, [70.0] * 5), db_path=db_path)
+    storage.replace_range("poids", weights(1, [75.0], start="2024-01-03"),
+                          start="2024-01-02", end="2024-01-04", db_path=db_path)
+    stored = storage.read("poids", db_path=db_path)
+    assert stored["Date"].dt.day.tolist() == [1, 3, 5]
+    assert stored["Poids_kg"].tolist() == [70.0, 75.0, 70.0]
+    assert storage.changes_since("poids", 1, db_path=db_path) == (pd.Timestamp("2024-01-02"),
+                                                                  pd.Timestamp("2024-01-04"))
+
+
+def test_meta_values_are_stored_as_text(db_path):
+    assert storage.get_meta("watermark", "0", db_path=db_path) == "0"
+    storage.set_meta("watermark", 12, db_path=db_path)
+    assert storage.get_meta("watermark", db_path=db_path) == "12"
+
+
+def test_insert_then_identical_reimport_is_skipped(db_path):
+    df = weights(3, [70.0, 71.0, 72.0])
+    assert storage.upsert("poids", df, db_path=db_path) == {"inserted": 3, "updated": 0, "skipped": 0}
+    version = storage.version("poids", db_path=db_path)
+    assert version == 1
+
+    assert storage.upsert("poids", df, db_path=db_path) == {"inserted": 0, "updated": 0, "skipped": 3}
+    assert storage.version("poids", db_path=db_path) == version
+    assert storage.changes_since("poids", version, db_path=db_path) is None
+
+
+def test_real_values_compared_at_fixed_decimals(db_path):
+    storage.upsert("poids", weights(1, [72.5]), db_path=db_path)
+    report = storage.upsert("poids", weights(1, [72.5 + 1e-9]), db_path=db_path)
+    assert report == {"inserted": 0, "updated": 0, "skipped": 1}
+
+
+def test_replace_updates_changed_rows_and_records_their_range(db_path):
+    storage.upsert("poids", weights(5, [70.0] * 5), db_path=db_path)
+    changed = weights(5, [70.0, 70.0, 75.0, 76.0, 70.0])
+    report = storage.upsert("poids", changed, policy="replace", db_path=db_path)
+    assert report == {"inserted": 0, "updated": 2, "skipped": 3}
+    assert storage.version("poids", db_path=db_path) == 2
+    assert storage.changes_since("poids", 1, db_path=db_path) == (pd.Timestamp("2024-01-03"),
+                                                                  pd.Timestamp("2024-01-04"))
+    assert storage.read("poids", db_path=db_path)["Poids_kg"].tolist() == [70.0, 70.0, 75.0, 76.0, 70.0]
+
+
+def test_keep_ignores_conflicts_but_inserts_new_rows(db_path):
+    storage.upsert("poids", weights(2, [70.0, 71.0]), db_path=db_path)
+    report = storage.upsert("poids", weights(3, [80.0, 81.0, 82.0]), policy="keep", db_path=db_path)
+    assert report == {"inserted": 1, "updated": 0, "skipped": 2}
+    assert storage.read("poids", db_path=db_path)["Poids_kg"].tolist() == [70.0, 71.0, 82.0]
+    assert storage.changes_since("poids", 1, db_path=db_path) == (pd.Timestamp("2024-01-03"),) * 2
+
+
+def test_fill_completes_only_missing_values(db_path):
+    first = weights(2, [70.0, 71.0])
+    first.loc[1, "Poids_lbs"] = None
+    storage.upsert("poids", first, db_path=db_path)
+
+    report = storage.upsert("poids", weights(2, [80.0, 81.0]), policy="fill", db_path=db_path)
+    assert report == {"inserted": 0, "updated": 1, "skipped": 1}
+    stored = storage.read("poids", db_path=db_path)
+    assert stored["Poids_kg"].tolist() == [70.0, 71.0]
+    assert stored["Poids_lbs"].iloc[1] == pytest.approx(81.0 * 2.20462)
+
+
+def test_duplicate_timestamps_in_a_batch_keep_the_last_row(db_path):
+    df = pd.concat([weights(1, [70.0]), weights(1, [71.0])], ignore_index=True)
+    report = storage.upsert("poids", df, db_path=db_path)
+    assert report == {"inserted": 1, "updated": 0, "skipped": 1}
+    assert storage.read("poids", db_path=db_path)["Poids_kg"].tolist() == [71.0]
+
+
+def test_unknown_policy_is_rejected(db_path):
+    with pytest.raises(ValueError):
+        storage.upsert("poids", weights(1, [70.0]), policy="merge", db_path=db_path)
+    assert storage.version("poids", db_path=db_path) == 0
+
+
+def probe_thread_lock():
+    """Le verrou des threads d'écriture est-il libre ? (le rend aussitôt)"""
+    if not storage._thread_lock.acquire(blocking=False):
+        return False
+    storage._thread_lock.release()
+    return True
+
+
+def test_contended_try_write_lock_leaves_the_thread_lock_free(db_path):
+    fcntl = pytest.importorskip("fcntl")
+    other = open(db_path + ".lock", "a")  # autre description de fichier : comme un autre processus
+    fcntl.flock(other, fcntl.LOCK_EX)
+    try:
+        with storage.try_write_lock(db_path) as acquired:
+            assert not acquired
+            free = []
+            thread = threading.Thread(target=lambda: free.append(probe_thread_lock()))
+            thread.start()
+            thread.join()
+            assert free == [True]
+    finally:
+        fcntl.flock(other, fcntl.LOCK_UN)
+        other.close()
+    with storage.try_write_lock(db_path) as acquired:
+        assert acquired
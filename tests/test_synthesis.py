@@ -0,0 +1,84 @@
+import threading
+import numpy as np
+import pandas as pd
+import storage
+import synthesis
+
+
+def readings(times, seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Date-Heure": pd.to_datetime(times),
+        "Systolique (mmHg)": rng.integers(100, 160, len(times)),
+        "Diastolique (mmHg)": rng.integers(60, 100, len(times)),
+        "Pouls (bpm)": rng.integers(50, 90, len(times)),
+        "Notes": "",
+    })
+
+
+def batches():
+    """Séances de 2 à 3 mesures, puis des ajouts qui prolongent, relient ou précèdent des groupes existants."""
+    sessions = pd.date_range("2024-01-01 08:00", periods=40, freq="12h")
+    first = np.concatenate([sessions, sessions + pd.Timedelta(minutes=5), sessions[::3] + pd.Timedelta(minutes=12)])
+    return [
+        readings(np.sort(first), 1),
+        readings(sessions[-5:] + pd.Timedelta(days=5), 2),             # nouvelles séances à la fin
+        readings(sessions[10:12] + pd.Timedelta(minutes=25), 3),       # prolongent deux groupes existants
+        readings([sessions[20] + pd.Timedelta(hours=6, minutes=i) for i in (0, 20, 40)] +
+                 [sessions[20] + pd.Timedelta(minutes=35)], 4),         # relie deux groupes à une nouvelle séance
+        readings(sessions[:2] - pd.Timedelta(days=3), 5),               # avant le début de l'historique
+        readings(sessions[30:31], 6).assign(**{"Systolique (mmHg)": 90}),  # correction d'une mesure existante
+    ]
+
+
+def test_incremental_synthesis_matches_full_recompute(tmp_path):
+    incremental, full = str(tmp_path / "incremental.db"), str(tmp_path / "full.db")
+    for batch in batches():
+        storage.write("blood", batch, db_path=incremental)
+        storage.write("blood", batch, db_path=full)
+        assert synthesis.update_synthesis(db_path=incremental) is not None
+    synthesis.update_synthesis(full=True, db_path=full)
+
+    expected = storage.read("synthese", db_path=full)
+    assert len(expected) > 0
+    pd.testing.assert_frame_equal(storage.read("synthese", db_path=incremental), expected)
+
+
+def test_no_change_since_watermark_returns_none(db_path):
+    storage.write("blood", batches()[0], db_path=db_path)
+    synthesis.update_synthesis(db_path=db_path)
+    version = storage.version("synthese", db_path=db_path)
+
+    assert synthesis.update_synthesis(db_path=db_path) is None
+    assert storage.version("synthese", db_path=db_path) == version
+
+
+def test_keeps_lowest_systolic_of_each_group():
+    df = pd.DataFrame({
+        "Date-Heure": pd.to_datetime(["2024-01-01 08:00", "2024-01-01 08:20", "2024-01-01 08:45",
+                                      "2024-01-01 20:00"]),
+        "Systolique (mmHg)": [130, 120, 125, 140],
+    })
+    kept = synthesis.select_lowest_systolic(df)
+    assert kept["Systolique (mmHg)"].tolist() == [120, 140]
+
+
+def test_import_during_synthesis_is_not_blocked_and_is_included(db_path, monkeypatch):
+    storage.upsert("blood", batches()[0], db_path=db_path)
+    late = batches()[1]
+    select = synthesis.select_lowest_systolic
+
+    def select_during_import(df):
+        # Importation depuis un autre thread pendant le calcul : elle ne doit pas attendre
+        if storage.version("blood", db_path=db_path) == 1:
+            writer = threading.Thread(target=storage.upsert, args=("blood", late), kwargs={"db_path": db_path})
+            writer.start()
+            writer.join(timeout=10)
+            assert not writer.is_alive()
+        return select(df)
+
+    monkeypatch.setattr(synthesis, "select_lowest_systolic", select_during_import)
+    synthesis.update_synthesis(db_path=db_path)
+    assert storage.get_meta(synthesis._watermark_key("blood", "synthese"), db_path=db_path) == "2"
+    expected = select(storage.read("blood", db_path=db_path)).reset_index(drop=True)
+    pd.testing.assert_frame_equal(storage.read("synthese", db_path=db_path), expected)
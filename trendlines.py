@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+import jobs
+import storage
+
+# --- Paramètres des courbes de tendance ---
+# Même fraction de lissage que `trendline='lowess'` de plotly express
+DEFAULT_FRAC = 2 / 3
+# Au-delà de ce nombre de points, le mode "auto" passe en mode approché
+FAST_THRESHOLD = 2000
+# Nombre d'intervalles de temps utilisés par le mode approché
+FAST_BINS = 500
+
+
+def _to_seconds(dates):
+    """Convertit des dates en secondes depuis l'époque (abscisse numérique)."""
+    return pd.to_datetime(dates).to_numpy(dtype="datetime64[ns]").astype("int64") / 1e9
+
+
+def lowess_curve(dates, values, frac=DEFAULT_FRAC, mode="auto"):
+    """
+    Calcule une courbe de tendance LOWESS.
+
+    mode="exact" : LOWESS complète sur tous les points (comme plotly express).
+    mode="fast"  : les points sont d'abord moyennés par intervalle de temps
+                   (FAST_BINS intervalles), puis la LOWESS est ajustée sur ces
+                   moyennes avec `delta` = 1 % de l'étendue : le coût ne dépend
+                   presque plus du nombre de mesures.
+    mode="auto"  : "exact" jusqu'à FAST_THRESHOLD points, "fast" au-delà.
+
+    Retourne un tuple (dates, valeurs lissées) trié par date.
+    """
+    x = _to_seconds(dates)
+    y = np.asarray(values, dtype=float)
+    keep = ~np.isnan(y)
+    x, y = x[keep], y[keep]
+    if len(x) < 2:
+        return pd.to_datetime(x * 1e9), y
+
+    if mode == "auto":
+        mode = "fast" if len(x) > FAST_THRESHOLD else "exact"
+
+    delta = 0.0
+    if mode == "fast":
+        if len(x) > FAST_BINS:
+            # Moyenne des points dans chaque intervalle de temps non vide
+            edges = np.linspace(x.min(), x.max(), FAST_BINS + 1)
+            bins = np.clip(np.searchsorted(edges, x, side="right") - 1, 0, FAST_BINS - 1)
+            counts = np.bincount(bins, minlength=FAST_BINS)
+            filled = counts > 0
+            x = np.bincount(bins, weights=x, minlength=FAST_BINS)[filled] / counts[filled]
+            y = np.bincount(bins, weights=y, minlength=FAST_BINS)[filled] / counts[filled]
+        delta = 0.01 * (x.max() - x.min())
+
+    from statsmodels.nonparametric.smoothers_lowess import lowess  # chargé au premier besoin (voir warmup.py)
+    fitted = lowess(y, x, frac=frac, delta=delta, return_sorted=True)
+    return pd.to_datetime(fitted[:, 0] * 1e9), fitted[:, 1]
+
+
+def compute_curve(name, y_col, start, end, frac, mode, db_path=None):
+    """
+    Lit la plage [start, end] du jeu de données et calcule sa courbe de tendance.
+    Exécutée dans un processus du pool de tâches (voir jobs.py).
+    """
+    df = storage.read(name, start=start, end=end, db_path=db_path)
+    time_col = storage.DATASETS[name]["time_col"]
+    return lowess_curve(df[time_col], df[y_col], frac=frac, mode=mode)
+
+
+def _group(name, y_col, start, end, frac, mode):
+    """Groupe de la tâche de calcul de la courbe (voir jobs.py)."""
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+    return ("lowess", name, y_col, start, end, frac, mode)
+
+
+def trendline(name, y_col, start=None, end=None, frac=DEFAULT_FRAC, mode="auto"):
+    """
+    Courbe de tendance (dates, valeurs) de la colonne `y_col` du jeu de données `name`.
+
+    Le calcul s'exécute en arrière-plan et son résultat est partagé entre les
+    sessions (une courbe par version des données, plage et paramètres). Pendant
+    un nouveau calcul, retourne la dernière courbe terminée (ou None).
+    """
+    group = _group(name, y_col, start, end, frac, mode)
+    start, end = group[3], group[4]
+    curve, _ = jobs.run(group, storage.version(name),
+                        compute_curve, name, y_col, start, end, frac, mode, storage.DB_PATH,
+                        label=f"Tendance {y_col}")
+    return curve
+
+
+def ready(name, y_cols, start=None, end=None, frac=DEFAULT_FRAC, mode="auto"):
+    """
+    Indique si les courbes de tendance des colonnes `y_cols` sont calculées pour
+    la version actuelle des données (sans lancer de calcul). À mettre dans la clé
+    d'un graphique mis en cache (voir figure_cache.py) : il est reconstruit quand
+    les tendances en cours de calcul sont prêtes.
+    """
+    version = storage.version(name)
+    return all(jobs.poll(_group(name, y_col, start, end, frac, mode), version)[0] == "done"
+               for y_col in y_cols)
+
+
+def add_trendline(fig, name, y_col, start=None, end=None, color=None, frac=DEFAULT_FRAC, mode="auto"):
+    """
+    Ajoute à `fig` la courbe de tendance précalculée (au lieu de demander
+    à plotly express de réajuster la LOWESS à chaque affichage). Rien n'est
+    ajouté tant qu'aucune courbe n'a encore été calculée.
+    """
+    curve = trendline(name, y_col, start=start, end=end, frac=frac, mode=mode)
+    if curve is None:
+        return fig
+    dates, values = curve
+    fig.add_scatter(x=dates, y=values, mode="lines", name=f"Tendance {y_col}",
+                    line_color=color, showlegend=False)
+    return fig
@@ -0,0 +1,74 @@
+import importlib
+import os
+import threading
+import time
+
+# --- Préchargement des bibliothèques lourdes ---
+# statsmodels, ruptures et scipy ne sont importés qu'au premier besoin (courbes de
+# tendance, détection des ruptures, droite OLS du poids) : ouvrir une page ne
+# paie plus leur chargement. Une fois la première page affichée, ceux utilisés
+# par le processus Streamlit sont préchargés dans un thread en arrière-plan, et
+# les processus du pool de tâches (voir jobs.py) sont lancés et préchargent ceux
+# des calculs qu'ils exécutent : le premier graphique qui en a besoin n'attend
+# pas non plus. Désactivable avec MYHEALTH_WARMUP=0.
+ENV_VAR = "MYHEALTH_WARMUP"
+
+# Modules préchargés dans le processus Streamlit, dans l'ordre
+HEAVY_MODULES = [
+    "statsmodels.api",                             # trendline="ols" de plotly express (page Poids)
+    "scipy.special",                               # bocpd.py (rattrapage à l'affichage)
+]
+
+# Modules préchargés par chaque processus du pool de tâches, dans l'ordre
+WORKER_MODULES = [
+    "statsmodels.nonparametric.smoothers_lowess",  # trendlines.compute_curve
+    "ruptures",                                    # changepoints.compute_path
+    "scipy.special",                               # bocpd.py (synthesis_task)
+]
+
+_lock = threading.Lock()
+_thread = None
+timings = {}  # module -> durée de l'import (en secondes)
+
+
+def enabled():
+    """Indique si le préchargement est activé."""
+    return os.environ.get(ENV_VAR, "1") not in ("", "0")
+
+
+def _preload(modules=HEAVY_MODULES):
+    for name in modules:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError:  # bibliothèque absente : l'erreur apparaîtra à la première utilisation
+            continue
+        timings[name] = time.perf_counter() - start
+
+
+def init_worker():
+    """Initialisation de chaque processus du pool de tâches : précharge WORKER_MODULES."""
+    if enabled():
+        _preload(WORKER_MODULES)
+
+
+def worker_timings():
+    """Tâche vide (voir jobs.warm_pool) : durées des imports du processus qui l'exécute."""
+    return dict(timings)
+
+
+def start():
+    """
+    À appeler après l'affichage de la page : lance le préchargement et les
+    processus du pool de tâches une seule fois par processus (les appels
+    suivants sont sans effet).
+    """
+    global _thread
+    if not enabled():
+        return
+    with _lock:
+        if _thread is None:
+            import jobs  # jobs importe ce module (init_worker)
+            jobs.warm_pool()
+            _thread = threading.Thread(target=_preload, name="myhealth-warmup", daemon=True)
+            _thread.start()